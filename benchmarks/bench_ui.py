@@ -0,0 +1,383 @@
+"""
+Headless benchmark harness for the Universal Plugin Manager hot paths.
+
+Drives UniversalPluginManager's background animation (update_particles,
+update_bands, update_pulse and a full frame-clock frame), apply_ui_settings
+and, on the tk backend, the composited render mode and refresh_plugin_list.
+Randomness is seeded; each case reports per-frame time, Tk calls per frame
+and allocations per frame. Before timing anything it checks that LF, CRLF
+and CR files come back byte for byte after a load and save, and that files
+with mixed line endings are flagged.
+
+Two backends:
+  stub  - no display needed; the canvas and root are recording stubs, so
+          Tk calls are counted but not executed (composite rendering and
+          refresh_plugin_list are skipped because they need real Tk objects)
+  tk    - a real Tk root (needs $DISPLAY, e.g. `xvfb-run python ...`);
+          Tk calls are counted through a proxy and idle redraws are
+          included in the frame time
+
+Examples:
+  python benchmarks/bench_ui.py --particles 60 250 500
+  python benchmarks/bench_ui.py --backend tk --plugins 10 100 --save results.json
+  python benchmarks/bench_ui.py --save-baseline
+  python benchmarks/bench_ui.py --baseline benchmarks/baseline.json --max-regression 25
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+import universal_plugin_manager as upm
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+
+class RecordingCanvas:
+    """Stand-in for tk.Canvas that counts calls instead of drawing."""
+    def __init__(self):
+        self.calls = 0
+        self._next_id = 1
+
+    def _new_item(self, *args, **kwargs):
+        self.calls += 1
+        item = self._next_id
+        self._next_id += 1
+        return item
+
+    create_oval = create_rectangle = create_image = create_line = _new_item
+
+    def winfo_rgb(self, color):
+        self.calls += 1
+        color = color.lstrip('#')
+        if len(color) != 6:
+            return (0, 65535, 65535)
+        return tuple(int(color[i:i + 2], 16) * 257 for i in (0, 2, 4))
+
+    def __getattr__(self, name):
+        # coords, itemconfigure, configure, delete, tag_lower, ...
+        def call(*args, **kwargs):
+            self.calls += 1
+        return call
+
+
+class StubRoot(RecordingCanvas):
+    """Stand-in for the Tk root: timers are recorded but never fire."""
+    def after(self, ms, func=None, *args):
+        self.calls += 1
+        return f"after#{self.calls}"
+
+
+class CountingTk:
+    """Proxy around a tkapp object that counts Tcl calls."""
+    def __init__(self, tkapp):
+        self._tkapp = tkapp
+        self.calls = 0
+
+    def call(self, *args):
+        self.calls += 1
+        return self._tkapp.call(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._tkapp, name)
+
+
+def write_fixture(workdir, plugin_count):
+    """Settings and dummy plugins for a run inside a scratch directory."""
+    plugins_dir = workdir / "plugins"
+    plugins_dir.mkdir(exist_ok=True)
+    for i in range(plugin_count):
+        (plugins_dir / f"bench_plugin_{i:04d}.py").write_text(
+            f'"""\nBenchmark plugin {i}\n"""\n\nclass Plugin:\n'
+            f'    def __init__(self, parent_frame, app):\n'
+            f'        self.tab_name = "Bench {i}"\n',
+            encoding='utf-8')
+    settings = {'advanced': {'pause_when_hidden': False}}
+    (workdir / "settings.json").write_text(json.dumps(settings), encoding='utf-8')
+
+
+def build_stub_app(particles, seed):
+    app = upm.UniversalPluginManager.__new__(upm.UniversalPluginManager)
+    app.root = StubRoot()
+    app.settings_manager = upm.SettingsManager()
+    app.settings = app.settings_manager.load_settings()
+    app.settings['ui']['particle_count'] = particles
+    app.plugin_manager = upm.PluginManager()
+    app.active_plugins = {}
+    app.init_animation_state(seed=seed)
+    app.main_canvas = RecordingCanvas()
+    app.start_background_animations()
+    app.frame_clock.stop()
+
+    def tk_calls():
+        return app.main_canvas.calls + app.root.calls
+    return app, tk_calls, lambda: None
+
+
+def build_tk_app(particles, seed):
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        raise SystemExit(f"tk backend needs a display (try xvfb-run): {e}")
+    counter = CountingTk(root.tk)
+    root.tk = counter
+    app = upm.UniversalPluginManager(root)
+    app.frame_clock.stop()
+    app.init_animation_state(seed=seed)
+    app.main_canvas.delete('all')
+    app.settings['ui']['particle_count'] = particles
+    app.start_background_animations()
+    app.frame_clock.stop()
+    root.update()
+
+    def tk_calls():
+        return counter.calls
+    return app, tk_calls, root.update_idletasks
+
+
+def run_case(func, tk_calls, flush, frames, warmup):
+    """Time ``func`` per frame, then measure its allocations separately."""
+    for _ in range(warmup):
+        func()
+        flush()
+
+    times = []
+    calls_before = tk_calls()
+    for _ in range(frames):
+        start = time.perf_counter()
+        func()
+        flush()
+        times.append((time.perf_counter() - start) * 1000.0)
+    calls = (tk_calls() - calls_before) / frames
+
+    # Allocation pass runs apart from timing because tracing is slow
+    tracemalloc.start()
+    peaks = []
+    retained = []
+    for _ in range(min(frames, 50)):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        func()
+        flush()
+        after, peak = tracemalloc.get_traced_memory()
+        peaks.append(max(0, peak - before) / 1024.0)
+        retained.append((after - before) / 1024.0)
+    tracemalloc.stop()
+
+    times.sort()
+    return {
+        'frames': frames,
+        'mean_ms': statistics.fmean(times),
+        'p95_ms': times[min(len(times) - 1, int(len(times) * 0.95))],
+        'max_ms': times[-1],
+        'tk_calls_per_frame': calls,
+        'alloc_peak_kb_per_frame': statistics.fmean(peaks) if peaks else 0.0,
+        'retained_kb_per_frame': statistics.fmean(retained) if retained else 0.0,
+    }
+
+
+def check_save_roundtrip(workdir):
+    """Load and save files with each line ending, streamed and memory-mapped.
+
+    Returns the names of the files that did not come back byte for byte,
+    or whose mixed line endings were not flagged.
+    """
+    failures = []
+    mixed = ''.join(f"line {i}" + ('\n', '\r\n', '\r')[i % 3] for i in range(5000)).encode('utf-8')
+    for name, newline in (('lf', '\n'), ('crlf', '\r\n'), ('cr', '\r'), ('mixed', None)):
+        raw = mixed if newline is None else \
+            newline.join(f"line {i} \u00e9" for i in range(5000)).encode('utf-8') + newline.encode()
+        for mode, threshold in (('streamed', 1 << 40), ('mapped', 0)):
+            path = workdir / f"roundtrip_{name}_{mode}.txt"
+            path.write_bytes(raw)
+            document = upm.Document(path=str(path))
+            loader = upm.FileLoader(str(path), document, chunk_size=4096, mmap_threshold=threshold)
+            loader.start()
+            while not loader.poll():
+                time.sleep(0.001)
+            if document.mixed_newlines != (newline is None):
+                failures.append(f"{path.name} (mixed line endings flagged wrongly)")
+            if newline is None:
+                continue
+            try:
+                upm.DocumentSaver().write(document.table, path, document.newline)
+                if path.read_bytes() != raw:
+                    failures.append(path.name)
+            except OSError as e:
+                failures.append(f"{path.name} ({e})")
+    return failures
+
+
+def full_frame(app):
+    """One frame of the frame clock: every effect due on this frame."""
+    clock = app.frame_clock
+
+    def frame():
+        for callback, divisor in list(clock.effects.values()):
+            if clock.frame % divisor == 0:
+                callback()
+        clock.frame += 1
+        clock.animation_time += clock.interval
+    return frame
+
+
+def run(args):
+    results = {}
+    workdir = Path(tempfile.mkdtemp(prefix="upm_bench_"))
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        write_fixture(workdir, max(args.plugins or [0]))
+        build = build_tk_app if args.backend == 'tk' else build_stub_app
+        for count in args.particles:
+            random.seed(args.seed)
+            app, tk_calls, flush = build(count, args.seed)
+            # Grow to the configured count so the frames measure steady state
+            app.apply_ui_settings()
+
+            cases = {
+                'update_particles': app.update_particles,
+                'update_bands': app.update_bands,
+                'update_pulse': app.update_pulse,
+                'frame': full_frame(app),
+                'apply_ui_settings': app.apply_ui_settings,
+            }
+            for name, func in cases.items():
+                results[f"{name}[particles={count}]"] = run_case(func, tk_calls, flush, args.frames, args.warmup)
+
+            if upm.BackgroundCompositor.available() and args.backend == 'tk':
+                app.set_render_mode('composite')
+                results[f"composite_frame[particles={count}]"] = run_case(
+                    full_frame(app), tk_calls, flush, args.frames, args.warmup)
+                app.set_render_mode('items')
+
+            if args.backend == 'tk':
+                app.root.destroy()
+
+        if args.backend == 'tk' and args.plugins:
+            import tkinter as tk
+            for count in args.plugins:
+                random.seed(args.seed)
+                app, tk_calls, flush = build_tk_app(0, args.seed)
+                # Only the first `count` fixture plugins are visible to the scan
+                app.plugin_manager.plugins_dir = _plugin_subset(workdir, count)
+                container = tk.Frame(app.root)
+                results[f"refresh_plugin_list[plugins={count}]"] = run_case(
+                    lambda: app.refresh_plugin_list(container), tk_calls, flush,
+                    max(5, args.frames // 20), 1)
+                app.root.destroy()
+    finally:
+        os.chdir(cwd)
+    return results
+
+
+def _plugin_subset(workdir, count):
+    subset = workdir / f"plugins_{count}"
+    if not subset.exists():
+        subset.mkdir()
+        for path in sorted((workdir / "plugins").glob("*.py"))[:count]:
+            (subset / path.name).write_text(path.read_text(encoding='utf-8'), encoding='utf-8')
+    return subset
+
+
+def metadata(args):
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'backend': args.backend,
+        'seed': args.seed,
+        'frames': args.frames,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': upm.np.__version__ if upm.np is not None else None,
+    }
+
+
+def print_results(results, baseline=None):
+    header = f"{'case':44} {'mean ms':>9} {'p95 ms':>9} {'tk/frame':>9} {'alloc kB':>9}"
+    if baseline:
+        header += f" {'vs base':>9}"
+    print(header)
+    print('-' * len(header))
+    for name, r in results.items():
+        line = (f"{name:44} {r['mean_ms']:9.3f} {r['p95_ms']:9.3f} "
+                f"{r['tk_calls_per_frame']:9.1f} {r['alloc_peak_kb_per_frame']:9.1f}")
+        if baseline:
+            base = baseline.get(name)
+            if base and base['mean_ms'] > 0:
+                line += f" {(r['mean_ms'] / base['mean_ms'] - 1) * 100:+8.1f}%"
+            else:
+                line += f" {'new':>9}"
+        print(line)
+
+
+def regressions(results, baseline, max_regression):
+    slower = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if base and base['mean_ms'] > 0:
+            change = (r['mean_ms'] / base['mean_ms'] - 1) * 100
+            if change > max_regression:
+                slower.append((name, change))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', choices=('stub', 'tk'), default='stub')
+    parser.add_argument('--particles', type=int, nargs='+', default=[60, 250, 500])
+    parser.add_argument('--plugins', type=int, nargs='*', default=[10, 100],
+                        help="plugin counts for refresh_plugin_list (tk backend only)")
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--save', type=Path, help="write results JSON here")
+    parser.add_argument('--save-baseline', nargs='?', type=Path, const=DEFAULT_BASELINE,
+                        help=f"write results as the baseline (default {DEFAULT_BASELINE.name})")
+    parser.add_argument('--baseline', type=Path, help="compare against this results file")
+    parser.add_argument('--max-regression', type=float, default=20.0,
+                        help="percent slowdown vs baseline that fails the run")
+    args = parser.parse_args(argv)
+
+    failures = check_save_roundtrip(Path(tempfile.mkdtemp(prefix="upm_roundtrip_")))
+    for name in failures:
+        print(f"ROUND-TRIP FAILED {name}")
+    if failures:
+        return 1
+    print("Save round-trip: LF, CRLF and CR files unchanged, mixed endings flagged")
+
+    results = run(args)
+    report = {'meta': metadata(args), 'results': results}
+
+    baseline = None
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding='utf-8'))['results']
+    print_results(results, baseline)
+
+    for path in (args.save, args.save_baseline):
+        if path:
+            path.write_text(json.dumps(report, indent=2), encoding='utf-8')
+            print(f"Saved: {path}")
+
+    if baseline:
+        slower = regressions(results, baseline, args.max_regression)
+        for name, change in slower:
+            print(f"REGRESSION {name}: {change:+.1f}% (limit {args.max_regression:.0f}%)")
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -22,12 +22,74 @@ DISK_WARN = 85.0
 TOP_PROCESS_LIMIT = 10
 REFRESH_INTERVAL_SECONDS = 5
 
+# ---------- Background work (runs in a worker process when isolated) ----------
+def hash_file(path: Path):
+    try:
+        data = path.read_bytes()
+        return hashlib.sha256(data).hexdigest()
+    except Exception:
+        return None
+
+def collect_rule_hashes():
+    hashes = {}
+    if RULES_DIR.exists():
+        for f in RULES_DIR.glob("*.md"):  # monitor policy markdown
+            h = hash_file(f)
+            if h:
+                hashes[f.name] = h
+        # also watch the protection guidelines txt
+        txt = RULES_DIR / "SERVER_PROTECTION_APPLICATION.txt"
+        if txt.exists():
+            h = hash_file(txt)
+            if h:
+                hashes[txt.name] = h
+    return hashes
+
+def top_processes():
+    procs = []
+    for p in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
+        try:
+            info = p.info
+            procs.append(info)
+        except Exception:
+            pass
+    # Sort by memory
+    procs.sort(key=lambda x: x.get('memory_percent', 0), reverse=True)
+    return procs[:TOP_PROCESS_LIMIT]
+
+def collect_scan():
+    """Rule hashes and top processes; usage figures come from the app's sampler"""
+    return {
+        'hashes': collect_rule_hashes(),
+        'processes': top_processes(),
+    }
+
+def collect_metrics():
+    """One sample of everything the dashboard shows"""
+    return {
+        'cpu': psutil.cpu_percent(interval=0.5),
+        'mem': psutil.virtual_memory().percent,
+        'disk': psutil.disk_usage(Path('.')).percent,
+        **collect_scan(),
+    }
+
+def metrics_worker(channel, config):
+    """Worker process entry point: stream samples to the UI half"""
+    while channel.running:
+        try:
+            channel.send(('metrics', collect_metrics()))
+        except Exception as e:
+            channel.send(('error', str(e)))
+        channel.sleep(REFRESH_INTERVAL_SECONDS)
+
 class Plugin:
     def __init__(self, parent_frame, app):
         self.parent = parent_frame
         self.app = app
         self.tab_name = "Server Protection"
         self.metrics_running = True
+        self.worker = None
+        self.job = None
         self.baseline = {}
         self.events = []  # rolling log
         # Build UI first so logging and widgets are available
@@ -81,26 +143,10 @@ class Plugin:
 
     # ---------- Baseline / Integrity ----------
     def _hash_file(self, path: Path):
-        try:
-            data = path.read_bytes()
-            return hashlib.sha256(data).hexdigest()
-        except Exception:
-            return None
+        return hash_file(path)
 
     def _collect_rule_hashes(self):
-        hashes = {}
-        if RULES_DIR.exists():
-            for f in RULES_DIR.glob("*.md"):  # monitor policy markdown
-                h = self._hash_file(f)
-                if h:
-                    hashes[f.name] = h
-            # also watch the protection guidelines txt
-            txt = RULES_DIR / "SERVER_PROTECTION_APPLICATION.txt"
-            if txt.exists():
-                h = self._hash_file(txt)
-                if h:
-                    hashes[txt.name] = h
-        return hashes
+        return collect_rule_hashes()
 
     def _load_baseline(self):
         if BASELINE_FILE.exists():
@@ -124,8 +170,9 @@ class Plugin:
             self._log("CRITICAL", f"Baseline write failed: {e}")
             messagebox.showerror("Baseline Error", str(e))
 
-    def _integrity_status(self):
-        current = self._collect_rule_hashes()
+    def _integrity_status(self, current=None):
+        if current is None:
+            current = self._collect_rule_hashes()
         missing = []
         changed = []
         new = []
@@ -159,45 +206,82 @@ class Plugin:
 
     # ---------- Metrics Loop ----------
     def _start_refresh_loop(self):
+        # Isolated mode: sampling and hashing run in a worker process
+        if getattr(self.app, 'plugin_isolated', None) and self.app.plugin_isolated('server_protection'):
+            self.worker = self.app.start_plugin_worker('server_protection', 'metrics_worker',
+                                                       self._on_worker_messages)
+            self._log("INFO", "Metrics running in an isolated worker process")
+            return
+
+        # Shared services: usage comes from the app's sampler, scans run on its worker pool
+        scheduler = getattr(self.app, 'scheduler', None)
+        sampler = getattr(self.app, 'metrics', None)
+        if scheduler is not None and sampler is not None:
+            sampler.subscribe(self._apply_usage, owner='server_protection')
+            # Integrity alerts matter even when the tab is not showing
+            self.job = scheduler.every(REFRESH_INTERVAL_SECONDS, collect_scan, owner='server_protection',
+                                       blocking=True, on_result=self._on_scan,
+                                       on_error=lambda e: self._log("WARN", f"Metrics refresh error: {e}"),
+                                       pause_hidden=False)
+            return
+
+        # Fallback thread: widgets are only touched on the UI thread
+        call_in_ui = getattr(self.app, 'call_in_ui', None)
+        if call_in_ui is None:
+            call_in_ui = lambda func, *args, key=None: func(*args)
+
         def loop():
             while self.metrics_running:
                 try:
-                    self._refresh_metrics()
+                    metrics = collect_metrics()
                 except Exception as e:
-                    self._log("WARN", f"Metrics refresh error: {e}")
+                    call_in_ui(self._log, "WARN", f"Metrics refresh error: {e}")
+                else:
+                    call_in_ui(self._apply_metrics, metrics, key='server_protection.metrics')
                 time.sleep(REFRESH_INTERVAL_SECONDS)
         threading.Thread(target=loop, daemon=True).start()
 
-    def _refresh_metrics(self):
-        cpu = psutil.cpu_percent(interval=0.5)
-        mem = psutil.virtual_memory().percent
-        disk = psutil.disk_usage(Path('.')).percent
-        integrity = self._integrity_status()
+    def _on_worker_messages(self, messages):
+        samples = [payload for kind, payload in messages if kind == 'metrics']
+        for kind, payload in messages:
+            if kind == 'error':
+                self._log("WARN", f"Metrics refresh error: {payload}")
+        if samples:
+            self._apply_metrics(samples[-1])
+
+    def _apply_metrics(self, metrics):
+        self._apply_usage(metrics)
+        self._check_usage(metrics)
+        self._apply_scan(metrics)
 
-        self.cpu_var.set(f"CPU Usage: {cpu:.1f}%")
-        self.mem_var.set(f"Memory Usage: {mem:.1f}%")
-        self.disk_var.set(f"Disk Usage: {disk:.1f}%")
+    def _on_scan(self, scan):
+        usage = self.app.metrics.latest()
+        if usage is not None:
+            self._check_usage(usage)
+        self._apply_scan(scan)
+
+    def _apply_usage(self, usage):
+        self.cpu_var.set(f"CPU Usage: {usage['cpu']:.1f}%")
+        self.mem_var.set(f"Memory Usage: {usage['mem']:.1f}%")
+        self.disk_var.set(f"Disk Usage: {usage['disk']:.1f}%")
+
+    def _check_usage(self, usage):
+        # Checked once per scan so the event log is not flooded every sample
+        if usage['cpu'] > CPU_WARN:
+            self._log("WARN", f"High CPU {usage['cpu']:.1f}%")
+        if usage['mem'] > MEM_WARN:
+            self._log("WARN", f"High Memory {usage['mem']:.1f}%")
+        if usage['disk'] > DISK_WARN:
+            self._log("WARN", f"High Disk {usage['disk']:.1f}%")
+
+    def _apply_scan(self, scan):
+        integrity = self._integrity_status(scan['hashes'])
         self.integrity_var.set(f"Integrity: {integrity}")
+        self._refresh_process_list(scan['processes'])
 
-        if cpu > CPU_WARN:
-            self._log("WARN", f"High CPU {cpu:.1f}%")
-        if mem > MEM_WARN:
-            self._log("WARN", f"High Memory {mem:.1f}%")
-        if disk > DISK_WARN:
-            self._log("WARN", f"High Disk {disk:.1f}%")
-        self._refresh_process_list()
-
-    def _refresh_process_list(self):
-        procs = []
-        for p in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
-            try:
-                info = p.info
-                procs.append(info)
-            except Exception:
-                pass
-        # Sort by memory
-        procs.sort(key=lambda x: x.get('memory_percent', 0), reverse=True)
-        top = procs[:TOP_PROCESS_LIMIT]
+    def _refresh_process_list(self, top=None):
+        if top is None:
+            top = top_processes()
         self.proc_list.delete(0, tk.END)
         for pr in top:
             name = pr.get('name') or '???'
@@ -257,4 +341,9 @@ class Plugin:
     # ---------- Cleanup ----------
     def cleanup(self):
         self.metrics_running = False
+        if self.worker is not None:
+            self.worker.stop()
+        if self.job is not None:
+            self.app.scheduler.cancel(self.job)
+            self.app.metrics.unsubscribe(self._apply_usage)
         self._log("INFO", "Server Protection plugin stopped")
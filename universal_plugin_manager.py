@@ -4,12 +4,13 @@ With visible particle bands and modern UI
 """
 
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog, scrolledtext
+from tkinter import ttk, messagebox, filedialog, scrolledtext, simpledialog
 import json
 import sys
 import platform
 import os
 import importlib.util
+import ast
 from pathlib import Path
 import psutil
 from datetime import datetime
@@ -17,6 +18,36 @@ import random
 import math
 import time
 import threading
+import queue
+import codecs
+import re
+import keyword
+import builtins
+import mmap
+import shutil
+import tempfile
+import uuid
+import bisect
+import concurrent.futures
+import multiprocessing
+import functools
+import traceback
+from collections import deque
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # optional: particle physics falls back to pure Python
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: journal locks use msvcrt instead
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
 
 class UniversalPluginManager:
     def __init__(self, root):
@@ -31,10 +62,47 @@ class UniversalPluginManager:
         self.plugin_manager = PluginManager()
         self.active_plugins = {}
         
+        # Time spent in each plugin's constructor and Tk callbacks
+        plugin_settings = self.settings.get('plugins', {})
+        self.profiler = PluginProfiler()
+        if plugin_settings.get('profile_callbacks', True):
+            self.profiler.install()
+        
+        # Shared timers and worker pool for plugin jobs
+        self.scheduler = TaskScheduler(self.root, plugin_settings.get('scheduler_tick_ms', 250),
+                                       plugin_settings.get('scheduler_workers', 4),
+                                       current_owner=lambda: self.profiler.current,
+                                       instrument=self.profiler.wrap, report=self.report_callback_error)
+        # Worker threads hand widget updates to the UI thread through one batched queue
+        self.ui_queue = UIDispatcher(self.root, self.settings.get('advanced', {}).get('target_fps', 50),
+                                     report=self.report_callback_error)
+        self.ui_queue.start()
+        # One system sampler shared by the dashboard and every plugin
+        adv = self.settings.get('advanced', {})
+        self.metrics = MetricsSampler(self.scheduler, adv.get('metrics_interval_ms', 1000),
+                                      adv.get('metrics_history', 300),
+                                      current_owner=lambda: self.profiler.current,
+                                      instrument=self.profiler.wrap, report=self.report_callback_error)
+        self.metrics.start()
+        
+        # Editor documents; tab widgets are built on demand, saves run in the background
+        editor_settings = self.settings.get('editor', {})
+        self.documents = DocumentManager(self._build_editor, editor_settings.get('release_tabs_after_s', 120))
+        self.saver = DocumentSaver(editor_settings.get('write_buffer_kb', 1024) * 1024)
+        self.journal = None
+        if editor_settings.get('journal_enabled', True):
+            self.journal = EditJournal(Path("journal"), editor_settings.get('journal_flush_ms', 1000),
+                                       editor_settings.get('journal_compact_ops', 5000))
+        self._save_poll_pending = False
+        self._position_pending = False
+        self.plugin_startup_report = None
+        self.plugin_workers = {}
+        self.started_at = time.monotonic()
+        self.plugin_count_history = deque(maxlen=60)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
         # Animation variables
-        self.particles = []
-        self.bands = []
-        self.animation_active = True
+        self.init_animation_state()
         
         # Create GUI
         self.create_gui()
@@ -42,6 +110,42 @@ class UniversalPluginManager:
         # Load saved plugins
         self.load_saved_plugins()
         
+        # Drop the widgets of editor tabs nobody has looked at for a while
+        self.root.after(30000, self._release_idle_editors)
+        
+        # Reload plugins whose files change while they are loaded
+        plugin_settings = self.settings.get('plugins', {})
+        self.plugin_watcher = PluginWatcher(self.root, self.plugin_manager,
+                                            lambda: list(self.active_plugins), self.reload_plugin,
+                                            plugin_settings.get('watch_interval_ms', 1000))
+        if plugin_settings.get('hot_reload', True):
+            self.plugin_watcher.start()
+        
+        # Offer to restore documents that had unsaved edits when the app last died
+        if self.journal is not None:
+            self.root.after(500, self.recover_documents)
+        
+    def init_animation_state(self, seed=None):
+        """Reset background animation and activity state (no widgets needed)"""
+        self.particles = ParticleStore(seed=seed)
+        # Particle settings the live particles were last styled with
+        self.particle_style = None
+        self.bands = []
+        self.animation_active = True
+        self.animation_throttled = False
+        self.render_mode = 'items'
+        self.compositor = None
+        self.background_color = '#000011'
+        self.frame_times = {'items': None, 'composite': None}
+        self.glow_enabled = True
+
+        # Window/user activity, updated by setup_activity_tracking()
+        self.window_hidden = False
+        self.window_obscured = False
+        self.window_focused = True
+        self.user_idle = False
+        self.last_input_time = time.monotonic()
+        
     def create_gui(self):
         """Create universal plugin manager GUI with animated background"""
         # Create main canvas that covers everything
@@ -59,85 +163,278 @@ class UniversalPluginManager:
                                     bg='#001122', fg='#00ffff',
                                     font=('Segoe UI', 10, 'bold'), anchor='w', padx=10, pady=5)
         self.status_label.pack(fill='x', side='bottom')
+
+        # Background quality level, shown at the right of the status bar
+        self.quality_label = tk.Label(self.status_label, bg='#001122', fg='#00ffff',
+                                      font=('Segoe UI', 9))
+        self.quality_label.pack(side='right')
+
+        # Cursor position of the current editor, left of the quality level
+        self.position_label = tk.Label(self.status_label, bg='#001122', fg='#00ffff',
+                                       font=('Consolas', 9))
+        self.position_label.pack(side='right', padx=(0, 15))
+
+        # Pause/throttle the background when nobody is looking at it
+        self.setup_activity_tracking()
         
     def start_background_animations(self):
-        """Start multiple animated background effects"""
+        """Start multiple animated background effects on one frame clock"""
+        adv = self.settings.get('advanced', {})
+        self.frame_clock = FrameScheduler(self.root, adv.get('target_fps', 50))
+        self.governor = QualityGovernor(self.frame_clock, adv.get('frame_budget_ms', 8.0),
+                                        on_change=self._apply_quality)
+        divisors = adv.get('effect_divisors', {})
+
         # Particle system
         self.start_particle_system()
+        self.frame_clock.add('particles', self.update_particles, divisors.get('particles', 1))
         
         # Animated bands
         self.start_band_animations()
+        self.frame_clock.add('bands', self.update_bands, divisors.get('bands', 2))
         
         # Pulsing background
-        self.start_pulse_animation()
+        self.frame_clock.add('pulse', self.update_pulse, divisors.get('pulse', 5))
+
+        # Composited render mode draws everything above in one image
+        self.frame_clock.add('composite', self.render_composite, 1)
+        self.frame_clock.on_frame = self._record_frame_time
+        self.set_render_mode(self.settings.get('ui', {}).get('render_mode', 'items'))
+
+        self.frame_clock.start()
+
+    def set_render_mode(self, mode):
+        """Switch between per-item canvas drawing and the composited image"""
+        if mode == 'composite' and not BackgroundCompositor.available():
+            mode = 'items'
+        if mode == self.render_mode:
+            return
+        if mode == 'composite' and self.compositor is None:
+            try:
+                self.compositor = BackgroundCompositor(self.main_canvas)
+            except Exception:
+                return
+
+        self.render_mode = mode
+        items_state = self._item_state()
+        bands_state = items_state if self.settings.get('ui', {}).get('bands_enabled', True) else 'hidden'
+        store = self.particles
+        for item in store.ids:
+            self.main_canvas.itemconfigure(item, state=items_state)
+        glow_state = self._item_state(glow=True)
+        for item in store.glow_ids:
+            self.main_canvas.itemconfigure(item, state=glow_state)
+        for band in self.bands:
+            self.main_canvas.itemconfigure(band['id'], state=bands_state)
+        if self.compositor is not None:
+            self.compositor.show(mode == 'composite')
+
+    def render_composite(self):
+        """Rasterize particles, glows, bands and pulse colour into one image"""
+        if not self.animation_active or self.render_mode != 'composite':
+            return
+        ui = self.settings.get('ui', {})
+        bands = self.bands if ui.get('bands_enabled', True) else []
+        try:
+            self.compositor.render(self.background_color, self.particles, bands, glow=self.glow_enabled)
+        except Exception:
+            # e.g. a Tk build without PPM data support: fall back for good
+            self.set_render_mode('items')
+            self.compositor = None
+            BackgroundCompositor.disabled = True
+
+    def _record_frame_time(self, elapsed):
+        """Keep a smoothed background frame time per render mode"""
+        previous = self.frame_times.get(self.render_mode)
+        ms = elapsed * 1000.0
+        self.frame_times[self.render_mode] = ms if previous is None else previous * 0.9 + ms * 0.1
+        if self.governor.record(elapsed):
+            self.update_quality_label()
+
+    def setup_activity_tracking(self):
+        """Watch window visibility, focus and user input for the frame clock"""
+        self.root.bind('<Unmap>', self._on_window_unmap, add='+')
+        self.root.bind('<Map>', self._on_window_map, add='+')
+        self.root.bind('<FocusIn>', self._on_focus_change, add='+')
+        self.root.bind('<FocusOut>', self._on_focus_change, add='+')
+        self.main_canvas.bind('<Visibility>', self._on_canvas_visibility, add='+')
+        for sequence in ('<Any-KeyPress>', '<Any-ButtonPress>', '<Motion>', '<MouseWheel>'):
+            self.root.bind_all(sequence, self._note_user_activity, add='+')
+        self.notebook.bind('<<NotebookTabChanged>>', lambda e: self.update_animation_state(), add='+')
+
+        self.root.after(1000, self._check_idle)
+        self.update_animation_state()
+
+    def _on_window_unmap(self, event):
+        # Child widgets share the toplevel's bindings; only react to the window
+        if event.widget is self.root:
+            self.window_hidden = True
+            self.update_animation_state()
+
+    def _on_window_map(self, event):
+        if event.widget is self.root:
+            self.window_hidden = False
+            self.update_animation_state()
+
+    def _on_focus_change(self, event):
+        # Focus moves between our own widgets and dialogs too; settle first
+        self.root.after(50, self._check_focus)
+
+    def _check_focus(self):
+        try:
+            focused = self.root.focus_get() is not None
+        except Exception:
+            focused = True
+        if focused != self.window_focused:
+            self.window_focused = focused
+            self.update_animation_state()
+
+    def _on_canvas_visibility(self, event):
+        obscured = event.state == 'VisibilityFullyObscured'
+        if obscured != self.window_obscured:
+            self.window_obscured = obscured
+            self.update_animation_state()
+
+    def _note_user_activity(self, event=None):
+        self.last_input_time = time.monotonic()
+        if self.user_idle:
+            self.user_idle = False
+            self.update_animation_state()
+
+    def _check_idle(self):
+        timeout = self.settings.get('advanced', {}).get('idle_timeout_s', 120)
+        if (not self.user_idle and timeout > 0
+                and time.monotonic() - self.last_input_time > timeout):
+            self.user_idle = True
+            self.update_animation_state()
+        self.root.after(1000, self._check_idle)
+
+    def _dashboard_selected(self):
+        try:
+            return str(self.notebook.select()) == str(self.dashboard_frame)
+        except Exception:
+            return True
+
+    def update_animation_state(self):
+        """Pause, throttle or run the background effects as appropriate"""
+        adv = self.settings.get('advanced', {})
+        fps = adv.get('target_fps', 50)
+        paused = False
+        self.animation_throttled = False
+        if adv.get('pause_when_hidden', True):
+            paused = self.window_hidden or self.window_obscured or self.user_idle
+            if not self.window_focused or not self._dashboard_selected():
+                self.animation_throttled = True
+                fps = min(fps, adv.get('throttle_fps', 15))
+
+        self.frame_clock.set_fps(fps)
+        if paused and self.animation_active:
+            self.animation_active = False
+            self.frame_clock.stop()
+        elif not paused and not self.animation_active:
+            # The clock restarts from now, so nothing is replayed or skipped
+            self.animation_active = True
+            self.frame_clock.start()
+        self.update_quality_label()
+
+    def _item_state(self, glow=False):
+        """Canvas state for particle (or glow) items in the current mode"""
+        if self.render_mode != 'items' or (glow and not self.glow_enabled):
+            return 'hidden'
+        return 'normal'
+
+    def _particle_limit(self):
+        """Configured particle count scaled by the current quality level"""
+        count = self.settings.get('ui', {}).get('particle_count', 80)
+        return int(count * self.governor.level_settings()['particles'])
+
+    def _trim_particles(self, target):
+        """Return particles beyond ``target`` to the canvas item pool"""
+        while len(self.particles) > target:
+            item, glow_item = self.particles.pop()
+            try:
+                self.item_pool.release(item, glow_item)
+            except Exception:
+                pass
+
+    def _apply_quality(self, level=None):
+        """Apply the governor's quality level to particles, glow and bands"""
+        quality = self.governor.level_settings()
+        self._trim_particles(self._particle_limit())
+
+        if quality['glow'] != self.glow_enabled:
+            self.glow_enabled = quality['glow']
+            state = self._item_state(glow=True)
+            for item in self.particles.glow_ids:
+                self.main_canvas.itemconfigure(item, state=state)
+
+        divisors = self.settings.get('advanced', {}).get('effect_divisors', {})
+        self.frame_clock.set_divisor('bands', divisors.get('bands', 2) * quality['band_divisor'])
+        self.update_quality_label()
+
+    def update_quality_label(self):
+        """Show the current background quality level in the status bar"""
+        if not hasattr(self, 'quality_label'):
+            return
+        quality = self.governor.level_settings()
+        if not self.animation_active:
+            reason = 'idle' if self.user_idle else 'hidden'
+            self.quality_label.config(text=f"Background paused ({reason})")
+            return
+        text = f"Background quality: {quality['name']}"
+        if self.governor.average_ms is not None:
+            text += f" ({self.governor.average_ms:.1f} ms/frame)"
+        if self.animation_throttled:
+            text += " · throttled"
+        self.quality_label.config(text=text)
         
     def start_particle_system(self):
         """Create visible floating particles"""
-        # Use helper to create particles so settings can call it later
-        # initial particles will be created below using self._create_particle()
-        
-        def update_particles():
-            if not self.animation_active:
-                return
-                
-            for particle in self.particles[:]:
-                # Update position
-                particle['x'] += particle['vx']
-                particle['y'] += particle['vy']
-                
-                # Add some turbulence
-                particle['vx'] += (random.random() - 0.5) * 0.2
-                particle['vy'] += (random.random() - 0.5) * 0.2
-                
-                # Wrap around screen
-                if particle['x'] < -20:
-                    particle['x'] = 1520
-                elif particle['x'] > 1520:
-                    particle['x'] = -20
-                    
-                if particle['y'] < -20:
-                    particle['y'] = 920
-                elif particle['y'] > 920:
-                    particle['y'] = -20
-                
-                # Update visual
-                size = particle['size']
-                glow_size = size + particle['glow']
-                
-                try:
-                    # Main particle
-                    self.main_canvas.coords(particle['id'],
-                                          particle['x']-size, particle['y']-size,
-                                          particle['x']+size, particle['y']+size)
-                    
-                    # Add glow effect
-                    if 'glow_id' not in particle:
-                        particle['glow_id'] = self.main_canvas.create_oval(
-                            particle['x']-glow_size, particle['y']-glow_size,
-                            particle['x']+glow_size, particle['y']+glow_size,
-                            fill='', outline=particle['color'], width=2
-                        )
-                    else:
-                        self.main_canvas.coords(particle['glow_id'],
-                                              particle['x']-glow_size, particle['y']-glow_size,
-                                              particle['x']+glow_size, particle['y']+glow_size)
-                        
-                except:
-                    pass
-            
-            # Create new particles occasionally (respect settings)
-            max_particles = self.settings.get('ui', {}).get('particle_count', 80)
-            if random.random() < 0.3 and len(self.particles) < max_particles:
-                self._create_particle()
-            
-            self.root.after(20, update_particles)
-        
-        # Start with configured number of particles
+        # Particle and glow ovals come from a preallocated pool, so frames
+        # and settings changes only show, hide and move existing items
         initial = self.settings.get('ui', {}).get('particle_count', 60)
+        pool_size = self.settings.get('advanced', {}).get('particle_pool_size', 500)
+        self.item_pool = CanvasItemPool(self.main_canvas, max(pool_size, initial))
+
+        # Use helper to create particles so settings can call it later
         for _ in range(initial):
             self._create_particle()
-            
-        update_particles()
+
+    def update_particles(self):
+        """Advance the particle system by one frame"""
+        if not self.animation_active:
+            return
+
+        # One batched physics step for every particle, then only the
+        # per-item canvas calls remain in Python
+        store = self.particles
+        store.step()
+
+        if self.render_mode == 'items':
+            self._draw_particle_items()
+
+        # Create new particles occasionally (respect settings and quality level)
+        if random.random() < 0.3 and len(self.particles) < self._particle_limit():
+            self._create_particle()
+
+    def _draw_particle_items(self):
+        """Move each particle's canvas ovals to match the store"""
+        store = self.particles
+        coords = self.main_canvas.coords
+        glow_ids = store.glow_ids
+        boxes = store.boxes()
+        glow_boxes = store.boxes(glow=True)
+        for i, item in enumerate(store.ids):
+            try:
+                # Main particle
+                coords(item, *boxes[i])
+
+                # Glow ring
+                if self.glow_enabled:
+                    coords(glow_ids[i], *glow_boxes[i])
+
+            except Exception:
+                pass
         
     def start_band_animations(self):
         """Create animated color bands across the background"""
@@ -162,32 +459,31 @@ class UniversalPluginManager:
             y_pos = 100 + i * 100
             base = random.uniform(0.5, 2.0)
             create_band(y_pos, random.choice(colors), base * band_mul)
-        
-        def update_bands():
-            if not self.animation_active:
-                return
-                
-            for band in self.bands:
-                # Move band
-                band['y'] += band['speed'] * band['direction']
-                
-                # Bounce off edges
-                if band['y'] < 0:
-                    band['y'] = 0
-                    band['direction'] = 1
-                elif band['y'] > 900:
-                    band['y'] = 900
-                    band['direction'] = -1
-                
-                # Update visual
-                try:
-                    self.main_canvas.coords(band['id'], 0, band['y']-3, 1500, band['y']+3)
-                except:
-                    pass
+
+    def update_bands(self):
+        """Move the color bands by one step"""
+        if not self.animation_active:
+            return
+            
+        for band in self.bands:
+            # Move band
+            band['y'] += band['speed'] * band['direction']
             
-            self.root.after(50, update_bands)
+            # Bounce off edges
+            if band['y'] < 0:
+                band['y'] = 0
+                band['direction'] = 1
+            elif band['y'] > 900:
+                band['y'] = 900
+                band['direction'] = -1
             
-        update_bands()
+            # Update visual
+            if self.render_mode != 'items':
+                continue
+            try:
+                self.main_canvas.coords(band['id'], 0, band['y']-3, 1500, band['y']+3)
+            except:
+                pass
 
     def _create_particle(self):
         """Helper to create a single particle (usable by settings)."""
@@ -207,36 +503,39 @@ class UniversalPluginManager:
         color = random.choice(palette) if palette else '#00ffff'
         base_glow = max(0, int(3 * glow_mul))
 
-        particle = {
-            'id': self.main_canvas.create_oval(x-size, y-size, x+size, y+size,
-                                             fill=color, outline='', width=0),
-            'x': x, 'y': y,
-            'vx': (random.random() - 0.5) * 4 * speed_mul,
-            'vy': (random.random() - 0.5) * 4 * speed_mul,
-            'size': size,
-            'color': color,
-            'glow': base_glow
-        }
-        self.particles.append(particle)
+        # Reuse pooled ovals instead of creating canvas items
+        item, glow_item = self.item_pool.acquire()
+        glow_size = size + base_glow
+        canvas = self.main_canvas
+        canvas.coords(item, x-size, y-size, x+size, y+size)
+        canvas.itemconfigure(item, fill=color, state=self._item_state())
+        canvas.coords(glow_item, x-glow_size, y-glow_size, x+glow_size, y+glow_size)
+        canvas.itemconfigure(glow_item, outline=color, state=self._item_state(glow=True))
+
+        self.particles.add(
+            item, x, y,
+            (random.random() - 0.5) * 4 * speed_mul,
+            (random.random() - 0.5) * 4 * speed_mul,
+            size, base_glow, color, glow_id=glow_item
+        )
         
-    def start_pulse_animation(self):
-        """Create pulsing background effect"""
-        def pulse():
-            if not self.animation_active:
-                return
-                
-            current_time = time.time()
-            # Create subtle color shifts
-            r = int(0 + 15 * math.sin(current_time * 0.3))
-            g = int(17 + 15 * math.sin(current_time * 0.4))
-            b = int(17 + 20 * math.sin(current_time * 0.5))
+    def update_pulse(self):
+        """Shift the background color for the pulsing effect"""
+        if not self.animation_active:
+            return
             
-            color = f'#{max(0, min(255, r)):02x}{max(0, min(255, g)):02x}{max(0, min(255, b)):02x}'
+        # Animation time only advances while the clock runs, so the colour
+        # picks up where it left off after a pause
+        current_time = self.frame_clock.animation_time
+        # Create subtle color shifts
+        r = int(0 + 15 * math.sin(current_time * 0.3))
+        g = int(17 + 15 * math.sin(current_time * 0.4))
+        b = int(17 + 20 * math.sin(current_time * 0.5))
+        
+        color = f'#{max(0, min(255, r)):02x}{max(0, min(255, g)):02x}{max(0, min(255, b)):02x}'
+        self.background_color = color
+        if self.render_mode == 'items':
             self.main_canvas.configure(bg=color)
-            
-            self.root.after(100, pulse)
-            
-        pulse()
         
     def create_ui_frames(self):
         """Create UI elements on top of animated background"""
@@ -260,7 +559,7 @@ class UniversalPluginManager:
         # Close button
         tk.Button(title_frame, text="✕", bg='#ff4444', fg='white',
                  font=('Segoe UI', 12, 'bold'), bd=0, padx=15, pady=5,
-                 command=self.root.quit).pack(side='right', padx=10, pady=10)
+                 command=self.on_close).pack(side='right', padx=10, pady=10)
         
         # Sidebar - semi-transparent to see particles
         self.sidebar = tk.Frame(self.main_frame, bg='#3d3d60')
@@ -289,6 +588,7 @@ class UniversalPluginManager:
         # Create notebook for tabs
         self.notebook = ttk.Notebook(self.content_frame)
         self.notebook.pack(fill='both', expand=True, padx=10, pady=10)
+        self.notebook.bind('<<NotebookTabChanged>>', self._on_tab_changed, add='+')
         
         # Style the notebook
         style = ttk.Style()
@@ -307,6 +607,7 @@ class UniversalPluginManager:
         """Create animated dashboard"""
         dashboard = tk.Frame(self.notebook, bg='#2a2a3e')
         self.notebook.add(dashboard, text="📊 Dashboard")
+        self.dashboard_frame = dashboard
         
         # Header
         header = tk.Frame(dashboard, bg='#2a2a3e')
@@ -322,15 +623,16 @@ class UniversalPluginManager:
         metrics_frame = tk.Frame(dashboard, bg='#2a2a3e')
         metrics_frame.pack(fill='x', padx=20, pady=10)
         
-        # Create metric cards
+        # Metric cards are built once; update_dashboard() changes their values in place
         metrics = [
-            ("CPU Usage", f"{psutil.cpu_percent():.1f}%", "#00ff88"),
-            ("Memory", f"{psutil.virtual_memory().percent:.1f}%", "#00ffff"),
-            ("Plugins", str(len(self.active_plugins)), "#ffaa00"),
-            ("Uptime", "Active", "#ff0080")
+            ("CPU Usage", 'cpu', "#00ff88"),
+            ("Memory", 'mem', "#00ffff"),
+            ("Plugins", 'plugins', "#ffaa00"),
+            ("Uptime", 'uptime', "#ff0080")
         ]
+        self.dashboard_cards = {}
         
-        for i, (label, value, color) in enumerate(metrics):
+        for i, (label, field, color) in enumerate(metrics):
             card = tk.Frame(metrics_frame, bg='#2d2d50', relief='flat', bd=0)
             card.grid(row=i//2, column=i%2, padx=10, pady=10, sticky='nsew')
             metrics_frame.grid_rowconfigure(i//2, weight=1)
@@ -343,8 +645,21 @@ class UniversalPluginManager:
             tk.Label(inner, text=label, bg='#2d2d50', fg='#ffffff',
                     font=('Segoe UI', 12)).pack(anchor='w')
             
-            tk.Label(inner, text=value, bg='#2d2d50', fg=color,
-                    font=('Segoe UI', 24, 'bold')).pack(anchor='w', pady=(10, 0))
+            value_label = tk.Label(inner, text="--", bg='#2d2d50', fg=color,
+                                   font=('Segoe UI', 24, 'bold'))
+            value_label.pack(anchor='w', pady=(10, 0))
+            card_info = {'value': value_label, 'text': "--"}
+            
+            # Sparkline: one line item whose coords follow the recent history
+            if field != 'uptime':
+                spark = tk.Canvas(inner, width=160, height=32, bg='#2d2d50', highlightthickness=0)
+                spark.pack(anchor='w', pady=(8, 0))
+                card_info.update(canvas=spark, size=(160, 32),
+                                 line=spark.create_line(0, 0, 0, 0, fill=color, width=2))
+            self.dashboard_cards[field] = card_info
+        if not self.metrics.subscribed(self._on_metrics_sample):
+            self.metrics.subscribe(self._on_metrics_sample)
+        self.update_dashboard()
         
         # Quick actions
         actions_frame = tk.Frame(dashboard, bg='#2a2a3e')
@@ -368,10 +683,20 @@ class UniversalPluginManager:
                      font=('Segoe UI', 11, 'bold'), bd=0, padx=20, pady=10,
                      activebackground='#0088cc', command=command).pack(side='left', padx=5)
         
-    def create_editor_tab(self):
-        """Create text editor tab"""
+    def create_editor_tab(self, document=None, title="New Document"):
+        """Add an editor tab; its widgets are only built once it is shown"""
         editor = tk.Frame(self.notebook, bg='#2a2a3e')
-        self.notebook.add(editor, text="📝 New Document")
+        self.notebook.add(editor, text=f"📝 {title}")
+        if document is None:
+            document = Document('# Welcome to Universal Plugin Manager With NotePad++\n\nStart typing your code here...\n\n')
+        self.documents.add(editor, document)
+        if self.journal is not None and not document.loading:
+            self.journal.attach(document)
+        return editor
+
+    def _build_editor(self, tab):
+        """Create text editor widgets for a tab, backed by a virtualised document view"""
+        editor = tab.frame
         
         # Toolbar
         toolbar = tk.Frame(editor, bg='#2d2d50', height=50)
@@ -383,7 +708,8 @@ class UniversalPluginManager:
             ("📁 Open", self.open_file),
             ("📋 Copy", lambda: None),
             ("📄 Paste", lambda: None),
-            ("🔍 Find", lambda: None)
+            ("🔍 Find", lambda: tab.find_bar.show()),
+            ("↪ Go To", self.goto_prompt)
         ]
         
         for text, command in buttons:
@@ -400,18 +726,119 @@ class UniversalPluginManager:
         scrollbar = tk.Scrollbar(text_frame, bg='#2d2d50', troughcolor='#1a1a2e')
         scrollbar.pack(side='right', fill='y')
         
-        # Text widget
-        self.text_widget = tk.Text(text_frame, bg='#0f0f1a', fg='#d4d4d4',
-                                  insertbackground='#00ffff', selectbackground='#00ffff',
-                                  selectforeground='#1a1a2e',
-                                  font=('Consolas', 12),
-                                  yscrollcommand=scrollbar.set,
-                                  relief='flat', bd=0,
-                                  padx=15, pady=15)
-        self.text_widget.pack(fill='both', expand=True)
-        scrollbar.config(command=self.text_widget.yview)
+        # Text widget (only shows a window of the document's lines)
+        text_widget = tk.Text(text_frame, bg='#0f0f1a', fg='#d4d4d4',
+                              insertbackground='#00ffff', selectbackground='#00ffff',
+                              selectforeground='#1a1a2e',
+                              font=('Consolas', 12),
+                              relief='flat', bd=0,
+                              padx=15, pady=15)
+        text_widget.pack(fill='both', expand=True)
         
-        self.text_widget.insert('1.0', '# Welcome to Universal Plugin Manager With NotePad++\n\nStart typing your code here...\n\n')
+        document = tab.document
+        tab.view = DocumentView(text_widget, scrollbar, document,
+                                self.settings.get('editor', {}).get('long_line_chars', 5000))
+        tab.find_bar = FindBar(editor, tab.view, before=text_frame)
+        if (self.settings.get('editor', {}).get('syntax_highlighting', True) and
+                (document.path is None or Path(document.path).suffix.lower() in PythonHighlighter.EXTENSIONS)):
+            tab.highlighter = PythonHighlighter(tab.view)
+        for sequence in ('<Control-s>', '<Control-S>'):
+            text_widget.bind(sequence, self._on_save_key)
+        for sequence in ('<Control-g>', '<Control-G>'):
+            text_widget.bind(sequence, self.goto_prompt)
+        for sequence in ('<KeyRelease>', '<ButtonRelease-1>'):
+            text_widget.bind(sequence, self._schedule_position, add='+')
+        tab.view.add_viewport_listener(self._schedule_position)
+        
+        # Back where the tab was when its widgets were released
+        if tab.top_line:
+            tab.view.scroll_to_line(tab.top_line)
+        if tab.cursor is not None and tab.view.window_start <= tab.cursor <= tab.view.window_end():
+            text_widget.mark_set('insert', tab.view.offset_to_index(tab.cursor))
+
+    @property
+    def editor_view(self):
+        """DocumentView of the selected (or last shown) editor tab, if built"""
+        tab = self.documents.current()
+        return tab.view if tab is not None else None
+
+    @property
+    def text_widget(self):
+        view = self.editor_view
+        return view.text if view is not None else None
+
+    def _on_tab_changed(self, event=None):
+        try:
+            self.documents.show(self.notebook.select())
+        except Exception:
+            pass
+        self._schedule_position()
+        self._update_plugin_visibility()
+        if self._dashboard_selected():
+            self.update_dashboard()
+
+    def _update_plugin_visibility(self):
+        """Pause the scheduled jobs of plugins whose tab is not showing"""
+        try:
+            selected = str(self.notebook.select())
+        except Exception:
+            return
+        for plugin_name, plugin_info in self.active_plugins.items():
+            self.scheduler.set_paused(plugin_name, str(plugin_info['frame']) != selected)
+
+    def _schedule_position(self, event=None):
+        if not self._position_pending:
+            self._position_pending = True
+            self.root.after_idle(self._update_position)
+
+    def _update_position(self):
+        """Show Ln/Col/Lines of the current editor in the status bar"""
+        self._position_pending = False
+        view = self.editor_view
+        if view is None:
+            self.position_label.config(text="")
+            return
+        line, column = view.document.position(view.index_to_offset('insert'))
+        self.position_label.config(
+            text=f"Ln {line + 1:,}  Col {column + 1:,}  Lines {view.document.line_count():,}")
+
+    def goto_prompt(self, event=None):
+        """Jump to 'line', 'line:column' or '#offset' in the current editor"""
+        view = self.editor_view
+        if view is None:
+            return 'break'
+        answer = simpledialog.askstring("Go To", "Line, line:column or #character offset:",
+                                        parent=self.root)
+        if not answer:
+            return 'break'
+        target = answer.strip().replace(',', '')
+        try:
+            if target.startswith('#'):
+                view.goto_offset(int(target[1:]))
+            else:
+                line, _, column = target.partition(':')
+                view.goto_line(int(line) - 1, int(column) - 1 if column else 0)
+        except ValueError:
+            self.status_label.config(text=f"Go To: not a line or offset: {answer}")
+        view.text.focus_set()
+        self._schedule_position()
+        return 'break'
+
+    def select_editor(self, editor):
+        """Select an editor tab and make sure its widgets exist"""
+        self.notebook.select(editor)
+        return self.documents.show(editor)
+
+    def close_editor_tab(self, editor):
+        tab = self.documents.remove(editor)
+        if tab is not None and self.journal is not None:
+            self.journal.detach(tab.document)
+        self.notebook.forget(editor)
+        editor.destroy()
+
+    def _release_idle_editors(self):
+        self.documents.release_idle()
+        self.root.after(30000, self._release_idle_editors)
         
     def show_dashboard(self):
         """Switch to dashboard"""
@@ -427,14 +854,58 @@ class UniversalPluginManager:
                 self.notebook.select(i)
                 break
                 
+    def _on_metrics_sample(self, sample):
+        """Record plugin count history; redraw the cards only while they are showing"""
+        self.plugin_count_history.append(len(self.active_plugins))
+        if self._dashboard_selected():
+            self.update_dashboard()
+
+    def update_dashboard(self):
+        """Update the dashboard card values and sparklines in place"""
+        cards = getattr(self, 'dashboard_cards', None)
+        if not cards:
+            return
+        seconds = int(time.monotonic() - self.started_at)
+        hours, rest = divmod(seconds, 3600)
+        values = {
+            'plugins': str(len(self.active_plugins)),
+            'uptime': f"{hours}h {rest // 60:02d}m" if hours else f"{rest // 60}m {rest % 60:02d}s"
+        }
+        sample = self.metrics.latest()
+        if sample is not None:
+            values['cpu'] = f"{sample['cpu']:.1f}%"
+            values['mem'] = f"{sample['mem']:.1f}%"
+        for field, text in values.items():
+            # Only labels whose text changed go back to Tk
+            if cards[field]['text'] != text:
+                cards[field]['value'].config(text=text)
+                cards[field]['text'] = text
+        
+        points = self.plugin_count_history.maxlen
+        self._draw_sparkline(cards['cpu'], self.metrics.series('cpu', points), 100.0)
+        self._draw_sparkline(cards['mem'], self.metrics.series('mem', points), 100.0)
+        history = list(self.plugin_count_history)
+        self._draw_sparkline(cards['plugins'], history, max(history, default=1) or 1)
+
+    def _draw_sparkline(self, card, values, top):
+        """Move a card's sparkline to ``values``, newest at the right edge"""
+        if len(values) < 2:
+            return
+        width, height = card['size']
+        step = width / (self.plugin_count_history.maxlen - 1)
+        right = len(values) - 1
+        coords = []
+        for i, value in enumerate(values):
+            coords.append(width - (right - i) * step)
+            coords.append(height - 2 - (height - 4) * min(value, top) / top)
+        try:
+            card['canvas'].coords(card['line'], *coords)
+        except Exception:
+            pass
+
     def refresh_dashboard(self):
         """Refresh dashboard data"""
-        # Remove and recreate dashboard
-        for i in range(self.notebook.index('end')):
-            if '📊' in self.notebook.tab(i, 'text'):
-                self.notebook.forget(i)
-                break
-        self.create_dashboard_tab()
+        self.update_dashboard()
         self.status_label.config(text="Dashboard refreshed - Universal Plugin Manager Mode")
         
     def open_file(self):
@@ -444,29 +915,167 @@ class UniversalPluginManager:
             filetypes=[("Text Files", "*.txt"), ("Python Files", "*.py"), ("All Files", "*.*")]
         )
         if filename:
-            try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                self.create_editor_tab()
-                # Would insert content into new tab
-                self.status_label.config(text=f"Opened: {filename}")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to open file:\n{e}")
+            self.load_file(filename)
+
+    def load_file(self, filename):
+        """Open a file in a new editor tab, streaming it in from a worker thread"""
+        editor_settings = self.settings.get('editor', {})
+        document = Document(path=filename)
+        try:
+            loader = FileLoader(filename, document,
+                                chunk_size=editor_settings.get('read_chunk_kb', 1024) * 1024,
+                                mmap_threshold=editor_settings.get('mmap_threshold_mb', 64) << 20)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to open file:\n{e}")
+            return None
+        document.loading = True
+        editor = self.create_editor_tab(document, Path(filename).name)
+        tab = self.select_editor(editor)
+
+        # Progress and cancel button at the right of the status bar
+        progress = tk.Frame(self.status_label, bg='#001122')
+        progress.pack(side='right', padx=(0, 10))
+        tk.Label(progress, text=f"Loading {Path(filename).name}", bg='#001122', fg='#00ffff',
+                 font=('Segoe UI', 9)).pack(side='left')
+        bar = ttk.Progressbar(progress, length=150, maximum=100, mode='determinate')
+        bar.pack(side='left', padx=5)
+        tk.Button(progress, text="Cancel", bg='#001122', fg='#ff4444', bd=0,
+                  font=('Segoe UI', 9, 'bold'), command=loader.cancel).pack(side='left')
+
+        self.status_label.config(text=f"Opening: {filename}")
+        loader.start()
+        self._poll_loader(loader, tab, progress, bar)
+        return editor
+
+    def _poll_loader(self, loader, tab, progress, bar):
+        try:
+            finished = loader.poll()
+        except Exception as e:
+            progress.destroy()
+            self.close_editor_tab(tab.frame)
+            messagebox.showerror("Error", f"Failed to open file:\n{e}")
+            return
+        if tab.view is not None:
+            tab.view.refresh()
+        bar['value'] = loader.progress * 100
+        if not finished:
+            self.root.after(30, self._poll_loader, loader, tab, progress, bar)
+            return
+        progress.destroy()
+        if loader.cancelled.is_set():
+            self.close_editor_tab(tab.frame)
+            self.status_label.config(text=f"Open cancelled: {loader.path}")
+        else:
+            if self.journal is not None:
+                self.journal.attach(tab.document)
+            mode = " (memory-mapped)" if loader.mapped else ""
+            limit = self.settings.get('editor', {}).get('long_line_chars', 5000)
+            if tab.document.longest_line() > limit:
+                mode += f" - lines over {limit:,} characters are truncated, click ... to show more"
+            if tab.document.mixed_newlines:
+                mode += f" - mixed line endings, saving converts them to {_NEWLINE_NAMES[tab.document.newline]}"
+            self.status_label.config(text=f"Opened: {loader.path}{mode}")
                 
-    def save_file(self):
-        """Save file"""
-        filename = filedialog.asksaveasfilename(
-            title="Save File",
-            defaultextension=".txt",
-            filetypes=[("Text Files", "*.txt"), ("Python Files", "*.py"), ("All Files", "*.*")]
-        )
-        if filename:
+    def save_file(self, save_as=False):
+        """Save the current document; the write happens on a background thread"""
+        tab = self.documents.current()
+        if tab is None:
+            self.status_label.config(text="No document to save")
+            return
+        document = tab.document
+        if document.loading:
+            self.status_label.config(text="Cannot save while the file is still loading")
+            return
+        if tab.view is not None:
+            tab.view.sync()
+        filename = document.path
+        if save_as or not filename:
+            filename = filedialog.asksaveasfilename(
+                title="Save File",
+                defaultextension=".txt",
+                filetypes=[("Text Files", "*.txt"), ("Python Files", "*.py"), ("All Files", "*.*")]
+            )
+            if not filename:
+                return
+            document.path = filename
+            self.notebook.tab(tab.frame, text=f"📝 {Path(filename).name}")
+        self.saver.save(document, filename)
+        if self.journal is not None:
+            self.journal.begin_save(document)
+        self.status_label.config(text=f"Saving: {filename}")
+        if not self._save_poll_pending:
+            self._save_poll_pending = True
+            self.root.after(50, self._poll_saves)
+
+    def _on_save_key(self, event=None):
+        self.save_file()
+        return 'break'
+
+    def _poll_saves(self):
+        for document, path, version, error, seconds in self.saver.poll():
+            if error is not None:
+                if self.journal is not None:
+                    self.journal.save_failed(document, version)
+                self.status_label.config(text=f"Save failed: {path}")
+                messagebox.showerror("Error", f"Failed to save file:\n{error}")
+                continue
+            if document.version == version:
+                document.modified = False
+            if self.journal is not None:
+                # The file is on disk now: journal later edits against it
+                self.journal.rebase(document, path, version)
+            normalised = ""
+            if document.mixed_newlines:
+                document.mixed_newlines = False
+                normalised = f", line endings normalised to {_NEWLINE_NAMES[document.newline]}"
+            self.status_label.config(text=f"Saved: {path} ({seconds:.2f}s{normalised})")
+        if self.saver.busy():
+            self.root.after(50, self._poll_saves)
+        else:
+            self._save_poll_pending = False
+
+    def on_close(self):
+        """Let pending saves finish before the window goes away"""
+        if self.saver.busy():
+            self.status_label.config(text="Finishing saves...")
+            self.root.update_idletasks()
+            self.saver.flush(timeout=30)
+        if self.journal is not None:
+            # Journals of documents with unsaved edits stay for recovery
+            self.journal.close()
+        for plugin_name in list(self.plugin_workers):
+            self.stop_plugin_workers(plugin_name, wait=True)
+        self.scheduler.stop()
+        self.ui_queue.stop()
+        self.profiler.uninstall()
+        self.root.destroy()
+
+    def recover_documents(self):
+        """Reopen documents rebuilt from journals left behind by a crash"""
+        try:
+            found = self.journal.pending()
+        except Exception:
+            return
+        if not found:
+            return
+        names = "\n".join(Path(path).name if path else "(untitled)" for _, path in found)
+        if not messagebox.askyesno("Recover Documents",
+                                   f"Unsaved changes were found for:\n\n{names}\n\nRecover them?"):
+            for journal_path, _ in found:
+                self.journal.discard(journal_path)
+            return
+        recovered = 0
+        for journal_path, path in found:
             try:
-                # Would save current tab content
-                self.status_label.config(text=f"Saved: {filename}")
-                messagebox.showinfo("Success", "File saved successfully!")
+                document = self.journal.recover(journal_path)
             except Exception as e:
-                messagebox.showerror("Error", f"Failed to save file:\n{e}")
+                self.status_label.config(text=f"Recovery failed for {path or 'untitled'}: {e}")
+                continue
+            title = Path(path).name if path else "Recovered Document"
+            self.create_editor_tab(document, title)
+            recovered += 1
+        if recovered:
+            self.status_label.config(text=f"Recovered {recovered} document(s) from the edit journal")
                 
     def open_plugin_manager(self):
         """Open plugin manager"""
@@ -551,6 +1160,29 @@ class UniversalPluginManager:
                 bg='#2d2d50', fg='#00ffff',
                 font=('Segoe UI', 14, 'bold')).pack(anchor='w')
         
+        # Details from the plugin's manifest (parsed, never imported)
+        manifest = plugin_info.get('manifest') or {}
+        version = manifest.get('version')
+        details = [manifest.get('tab_name'), f"v{version}" if version else None, manifest.get('author')]
+        subtitle = "  ·  ".join(str(d) for d in details if d)
+        if subtitle:
+            tk.Label(info_frame, text=subtitle, bg='#2d2d50', fg='#ffffff',
+                    font=('Segoe UI', 10)).pack(anchor='w')
+        if manifest.get('description'):
+            tk.Label(info_frame, text=manifest['description'], bg='#2d2d50', fg='#aaaaaa',
+                    font=('Segoe UI', 10), justify='left', wraplength=600).pack(anchor='w')
+        if manifest.get('error'):
+            tk.Label(info_frame, text=f"⚠ {manifest['error']}", bg='#2d2d50', fg='#ff4444',
+                    font=('Segoe UI', 10)).pack(anchor='w')
+        
+        # Out-of-process workers and what they cost
+        for worker in self.plugin_workers.get(plugin_info['name'], []):
+            stats = worker.stats()
+            state = f"pid {stats['pid']}" if stats['alive'] else "restarting"
+            tk.Label(info_frame, text=f"⚙ Worker {state}  ·  CPU {stats['cpu_percent']:.1f}%  ·  "
+                                      f"{stats['rss_mb']:.1f} MB  ·  restarts {stats['restarts']}",
+                    bg='#2d2d50', fg='#ffaa00', font=('Consolas', 9)).pack(anchor='w')
+        
         status = "✅ ACTIVE" if plugin_info['loaded'] else "⭕ INACTIVE"
         color = '#00ff88' if plugin_info['loaded'] else '#666666'
         
@@ -579,82 +1211,193 @@ class UniversalPluginManager:
         """Load a plugin"""
         try:
             plugin_class = self.plugin_manager.load_plugin(plugin_name)
+            plugin_frame, friendly = self._create_plugin(plugin_name, plugin_class)
 
-            # Create plugin tab
-            plugin_frame = tk.Frame(self.notebook, bg='#1a1a2e')
-            tab_id = self.notebook.add(plugin_frame, text=f"🔌 {plugin_name}")
+            # Select the newly-created plugin tab so it's visible immediately
+            self._select_plugin_tab(plugin_name, plugin_frame, friendly)
 
-            # Instantiate plugin (guard so failure removes tab)
-            try:
-                plugin_instance = plugin_class(plugin_frame, self)
-            except Exception as e:
-                # remove the tab we just created
-                try:
-                    # find the tab index and forget
-                    for i in range(self.notebook.index('end')):
-                        if plugin_name in self.notebook.tab(i, 'text'):
-                            self.notebook.forget(i)
-                            break
-                except Exception:
-                    pass
-                raise
+            self.status_label.config(text=f"Universal Plugin Loaded: {plugin_name}")
+            self.save_plugin_state()
+
+            messagebox.showinfo("Success", f"Plugin '{plugin_name}' loaded with universal effects!")
+
+        except Exception as e:
+            # surface a helpful error
+            messagebox.showerror("Error", f"Failed to load plugin:\n{e}")
 
-            # If plugin provides a friendly tab name, use it
+    def _create_plugin(self, plugin_name, plugin_class):
+        """Instantiate a plugin in a new tab; UI thread only"""
+        # Create plugin tab
+        plugin_frame = tk.Frame(self.notebook, bg='#1a1a2e')
+        tab_id = self.notebook.add(plugin_frame, text=f"🔌 {plugin_name}")
+
+        # Instantiate plugin (guard so failure removes tab)
+        try:
+            plugin_instance = self.profiler.call(plugin_name, plugin_class, plugin_frame, self)
+        except Exception as e:
+            # remove the tab we just created
             try:
-                friendly = getattr(plugin_instance, 'tab_name', None)
-                if friendly:
-                    # update the last-added tab's text
-                    for i in range(self.notebook.index('end')):
-                        if plugin_name in self.notebook.tab(i, 'text'):
-                            self.notebook.tab(i, text=f"🔌 {friendly}")
-                            break
+                # find the tab index and forget
+                for i in range(self.notebook.index('end')):
+                    if plugin_name in self.notebook.tab(i, 'text'):
+                        self.notebook.forget(i)
+                        break
             except Exception:
                 pass
+            raise
 
-            # Select the newly-created plugin tab so it's visible immediately
+        # If plugin provides a friendly tab name, use it
+        friendly = None
+        try:
+            friendly = getattr(plugin_instance, 'tab_name', None)
+            if friendly:
+                # update the last-added tab's text
+                for i in range(self.notebook.index('end')):
+                    if plugin_name in self.notebook.tab(i, 'text'):
+                        self.notebook.tab(i, text=f"🔌 {friendly}")
+                        break
+        except Exception:
+            pass
+
+        self.active_plugins[plugin_name] = {
+            'instance': plugin_instance,
+            'frame': plugin_frame
+        }
+        self._update_plugin_visibility()
+        return plugin_frame, friendly
+
+    def _select_plugin_tab(self, plugin_name, plugin_frame, friendly=None):
+        try:
+            self.notebook.select(plugin_frame)
+        except Exception:
             try:
-                self.notebook.select(plugin_frame)
+                # fallback: select by index of matching text
+                for i in range(self.notebook.index('end')):
+                    if (plugin_name in self.notebook.tab(i, 'text')) or (friendly and friendly in self.notebook.tab(i, 'text')):
+                        self.notebook.select(i)
+                        break
             except Exception:
-                try:
-                    # fallback: select by index of matching text
-                    for i in range(self.notebook.index('end')):
-                        if (plugin_name in self.notebook.tab(i, 'text')) or (friendly and friendly in self.notebook.tab(i, 'text')):
-                            self.notebook.select(i)
-                            break
-                except Exception:
-                    pass
-
-            self.active_plugins[plugin_name] = {
-                'instance': plugin_instance,
-                'frame': plugin_frame
-            }
+                pass
+        
+    def reload_plugin(self, plugin_name):
+        """Re-import a changed plugin and rebuild its tab in place.
 
-            self.status_label.config(text=f"Universal Plugin Loaded: {plugin_name}")
-            self.save_plugin_state()
+        A plugin can carry state across the reload by defining
+        ``save_reload_state()`` on the old instance and
+        ``restore_reload_state(state)`` on the new one.
+        """
+        plugin_info = self.active_plugins.get(plugin_name)
+        if plugin_info is None:
+            return
+        start = time.perf_counter()
+        try:
+            # Import first so a broken edit leaves the running plugin alone
+            module = self.plugin_manager.import_module(plugin_name)
+            plugin_class = self.plugin_manager.register(plugin_name, module)
+        except BaseException as e:
+            self.status_label.config(text=f"Reload failed for {plugin_name}: {e}")
+            return
 
-            messagebox.showinfo("Success", f"Plugin '{plugin_name}' loaded with universal effects!")
+        old = plugin_info['instance']
+        frame = plugin_info['frame']
+        state = None
+        try:
+            if hasattr(old, 'save_reload_state'):
+                state = old.save_reload_state()
+        except Exception:
+            pass
+        try:
+            if hasattr(old, 'cleanup'):
+                old.cleanup()
+        except Exception:
+            pass
+        self.stop_plugin_workers(plugin_name)
+        self.scheduler.cancel_owner(plugin_name)
+        self.metrics.unsubscribe_owner(plugin_name)
+        for widget in frame.winfo_children():
+            widget.destroy()
 
+        try:
+            instance = self.profiler.call(plugin_name, plugin_class, frame, self)
         except Exception as e:
-            # surface a helpful error
-            messagebox.showerror("Error", f"Failed to load plugin:\n{e}")
-            
-    def unload_plugin(self, plugin_name):
-        """Unload a plugin"""
-        if plugin_name not in self.active_plugins:
+            # Keep the tab so the next save can bring it back
+            tk.Label(frame, text=f"⚠ Reload failed: {e}", bg='#1a1a2e', fg='#ff4444',
+                    font=('Segoe UI', 12)).pack(pady=40)
+            plugin_info['instance'] = None
+            self.status_label.config(text=f"Reload failed for {plugin_name}: {e}")
             return
-            
+        if state is not None and hasattr(instance, 'restore_reload_state'):
+            try:
+                instance.restore_reload_state(state)
+            except Exception:
+                pass
+        plugin_info['instance'] = instance
         try:
-            plugin_info = self.active_plugins[plugin_name]
-            
-            # Cleanup
-            if hasattr(plugin_info['instance'], 'cleanup'):
-                plugin_info['instance'].cleanup()
-                
-            # Remove tab
-            for i in range(self.notebook.index('end')):
-                if plugin_name in self.notebook.tab(i, 'text'):
-                    self.notebook.forget(i)
-                    break
+            friendly = getattr(instance, 'tab_name', None) or plugin_name
+            self.notebook.tab(frame, text=f"🔌 {friendly}")
+        except Exception:
+            pass
+        elapsed = (time.perf_counter() - start) * 1000
+        self.status_label.config(text=f"Reloaded plugin: {plugin_name} ({elapsed:.0f} ms)")
+
+    def report_callback_error(self, owner, where, error):
+        """Log a failed scheduler, sampler or UI-queue callback and charge it to its plugin"""
+        if owner not in self.active_plugins and owner not in self.profiler.stats:
+            owner = None
+        if self.profiler.record_error(owner, where, error) and hasattr(self, 'status_label'):
+            try:
+                self.status_label.config(text=f"{where} failed: {error}")
+            except Exception:
+                pass
+
+    def call_in_ui(self, func, *args, key=None):
+        """Run ``func(*args)`` on the UI thread; safe to call from any thread.
+
+        Calls posted with the same ``key`` (e.g. the widget they update)
+        coalesce, so only the latest one runs in the next batch.
+        """
+        self.ui_queue.post(func, *args, key=key)
+
+    def plugin_isolated(self, plugin_name):
+        """Whether the settings ask for this plugin's background work to run out of process"""
+        return plugin_name in self.settings.get('plugins', {}).get('isolated', [])
+
+    def start_plugin_worker(self, plugin_name, function_name, on_messages, config=None):
+        """Run ``function_name(channel, config)`` from a plugin's module in a subprocess.
+
+        ``on_messages(list)`` receives the worker's batched messages on the UI
+        thread. The worker is stopped when the plugin unloads or reloads.
+        """
+        worker = PluginWorker(self.root, self.plugin_manager.plugins_dir / f"{plugin_name}.py",
+                              function_name, on_messages, config)
+        worker.start()
+        self.plugin_workers.setdefault(plugin_name, []).append(worker)
+        return worker
+
+    def stop_plugin_workers(self, plugin_name, wait=False):
+        for worker in self.plugin_workers.pop(plugin_name, []):
+            worker.stop(wait=wait)
+
+    def unload_plugin(self, plugin_name):
+        """Unload a plugin"""
+        if plugin_name not in self.active_plugins:
+            return
+            
+        try:
+            plugin_info = self.active_plugins[plugin_name]
+            
+            # Cleanup (no instance if its last reload failed)
+            if hasattr(plugin_info['instance'], 'cleanup'):
+                plugin_info['instance'].cleanup()
+            self.stop_plugin_workers(plugin_name)
+            self.scheduler.cancel_owner(plugin_name)
+            self.metrics.unsubscribe_owner(plugin_name)
+                
+            # Remove tab
+            for i in range(self.notebook.index('end')):
+                if plugin_name in self.notebook.tab(i, 'text'):
+                    self.notebook.forget(i)
+                    break
                     
             del self.active_plugins[plugin_name]
             self.plugin_manager.unload_plugin(plugin_name)
@@ -853,6 +1596,21 @@ class Plugin:
         bands_var = tk.BooleanVar(value=ui.get('bands_enabled', True))
         tk.Checkbutton(general_tab, text="Enable animated bands", variable=bands_var, bg='#1a1a2e', fg='#00ffff', selectcolor='#2a2a3e').pack(anchor='w', padx=12, pady=(8,6))
 
+        # Background render mode, with the measured frame time of each
+        tk.Label(general_tab, text="Background Rendering:", bg='#1a1a2e', fg='#ffffff').pack(anchor='w', padx=12, pady=(8,0))
+        render_mode_var = tk.StringVar(value=self.render_mode)
+        def frame_time_text(mode):
+            ms = self.frame_times.get(mode)
+            return f"{ms:.2f} ms/frame" if ms is not None else "not measured yet"
+        tk.Radiobutton(general_tab, text=f"Canvas items ({frame_time_text('items')})", value='items',
+                       variable=render_mode_var, bg='#1a1a2e', fg='#00ffff', selectcolor='#2a2a3e').pack(anchor='w', padx=12)
+        composite_text = f"Composited image ({frame_time_text('composite')})"
+        if not BackgroundCompositor.available():
+            composite_text = "Composited image (requires NumPy)"
+        tk.Radiobutton(general_tab, text=composite_text, value='composite',
+                       variable=render_mode_var, bg='#1a1a2e', fg='#00ffff', selectcolor='#2a2a3e',
+                       state='normal' if BackgroundCompositor.available() else 'disabled').pack(anchor='w', padx=12)
+
         # --- Advanced Tab ---
         adv = self.settings.setdefault('advanced', {})
         tk.Label(adv_tab, text="🔬 Advanced Options", bg='#1a1a2e', fg='#00ffff', font=('Segoe UI', 14, 'bold')).pack(anchor='w', padx=12, pady=(8,6))
@@ -872,6 +1630,33 @@ class Plugin:
         band_speed_var = tk.DoubleVar(value=adv.get('band_speed_multiplier', 1.0))
         tk.Scale(adv_tab, from_=0.1, to=3.0, resolution=0.05, orient='horizontal', variable=band_speed_var, bg='#1a1a2e', fg='#00ffff').pack(fill='x', padx=12)
 
+        # Background frame rate
+        tk.Label(adv_tab, text="Background Target FPS:", bg='#1a1a2e', fg='#ffffff').pack(anchor='w', padx=12, pady=(8,0))
+        fps_var = tk.IntVar(value=adv.get('target_fps', 50))
+        tk.Scale(adv_tab, from_=5, to=120, resolution=1, orient='horizontal', variable=fps_var, bg='#1a1a2e', fg='#00ffff').pack(fill='x', padx=12)
+        # Frame-time budget for the adaptive quality governor
+        tk.Label(adv_tab, text="Background Frame Budget (ms, 0 = fixed quality):", bg='#1a1a2e', fg='#ffffff').pack(anchor='w', padx=12, pady=(8,0))
+        budget_var = tk.DoubleVar(value=adv.get('frame_budget_ms', 8.0))
+        tk.Scale(adv_tab, from_=0.0, to=40.0, resolution=0.5, orient='horizontal', variable=budget_var, bg='#1a1a2e', fg='#00ffff').pack(fill='x', padx=12)
+
+        # Pause when minimized/covered/idle, throttle when unfocused
+        pause_var = tk.BooleanVar(value=adv.get('pause_when_hidden', True))
+        tk.Checkbutton(adv_tab, text="Pause background when hidden or idle, throttle when unfocused", variable=pause_var, bg='#1a1a2e', fg='#00ffff', selectcolor='#2a2a3e').pack(anchor='w', padx=12, pady=(8,0))
+        tk.Label(adv_tab, text="Idle Timeout (seconds, 0 = never):", bg='#1a1a2e', fg='#ffffff').pack(anchor='w', padx=12, pady=(4,0))
+        idle_var = tk.IntVar(value=adv.get('idle_timeout_s', 120))
+        tk.Spinbox(adv_tab, from_=0, to=3600, textvariable=idle_var, bg='#2d2d50', fg='#00ffff', bd=0).pack(fill='x', padx=12)
+
+        clock = self.frame_clock.stats()
+        disabled = f", disabled: {', '.join(clock['disabled'])}" if clock['disabled'] else ""
+        tk.Label(adv_tab, text=f"Frame clock: {clock['frames']} frames, {clock['late']} late, "
+                               f"{clock['dropped']} dropped{disabled}",
+                 bg='#1a1a2e', fg='#cccccc').pack(anchor='w', padx=12, pady=(4,0))
+        ui_queue = self.ui_queue.stats()
+        tk.Label(adv_tab, text=f"UI queue: depth {ui_queue['depth']} (max {ui_queue['max_depth']}), "
+                               f"{ui_queue['applied']} applied, {ui_queue['coalesced']} coalesced, "
+                               f"latency {ui_queue['latency_ms']:.1f} ms avg / {ui_queue['max_latency_ms']:.1f} ms max",
+                 bg='#1a1a2e', fg='#cccccc').pack(anchor='w', padx=12, pady=(0,0))
+
         # --- Theme Tab ---
         theme = adv.get('theme', {})
         tk.Label(theme_tab, text="🎨 Theme Overrides", bg='#1a1a2e', fg='#00ffff', font=('Segoe UI', 14, 'bold')).pack(anchor='w', padx=12, pady=(8,6))
@@ -903,7 +1688,7 @@ class Plugin:
         # --- Plugins Tab ---
         tk.Label(plugins_tab, text="🔌 Plugin Settings", bg='#1a1a2e', fg='#00ffff', font=('Segoe UI', 14, 'bold')).pack(anchor='w', padx=12, pady=(8,6))
         plugin_list_frame = tk.Frame(plugins_tab, bg='#1a1a2e')
-        plugin_list_frame.pack(fill='both', expand=True, padx=12, pady=6)
+        plugin_list_frame.pack(fill='x', padx=12, pady=6)
 
         # Show list of plugins with their state
         plugins = self.plugin_manager.scan_plugins()
@@ -911,6 +1696,9 @@ class Plugin:
             lbl = tk.Label(plugin_list_frame, text=f"{p['name']} - {'Loaded' if p['loaded'] else 'Not Loaded'}", bg='#1a1a2e', fg='#ffffff')
             lbl.pack(anchor='w')
 
+        # Where the time goes, per plugin
+        self.create_plugin_cost_table(plugins_tab)
+
         # Buttons (Preview, Apply & Save, Cancel) - global for all tabs
         btn_frame = tk.Frame(dialog, bg='#1a1a2e')
         btn_frame.pack(fill='x', padx=12, pady=(6,12))
@@ -920,12 +1708,17 @@ class Plugin:
             ui['alpha'] = float(alpha_var.get())
             ui['particle_count'] = int(particle_var.get())
             ui['bands_enabled'] = bool(bands_var.get())
+            ui['render_mode'] = render_mode_var.get()
             ui['particle_min_size'] = int(size_min_var.get())
             ui['particle_max_size'] = int(size_max_var.get())
 
             adv['particle_speed'] = float(particle_speed_var.get())
             adv['glow_intensity'] = float(glow_var.get())
             adv['band_speed_multiplier'] = float(band_speed_var.get())
+            adv['target_fps'] = int(fps_var.get())
+            adv['frame_budget_ms'] = float(budget_var.get())
+            adv['pause_when_hidden'] = bool(pause_var.get())
+            adv['idle_timeout_s'] = int(idle_var.get())
             adv['particle_colors'] = [c.strip() for c in palette_var.get().split(',') if c.strip()]
             adv['theme'] = {
                 'panel_bg': panel_bg_var.get(),
@@ -973,12 +1766,113 @@ Active Plugins: {len(self.active_plugins)}
                 self.settings_manager.save_settings(self.settings)
         except Exception:
             pass
-        for plugin_name in loaded:
+        # Import on a worker pool; tabs are created here, in order, as imports land
+        loaded = [name for name in dict.fromkeys(loaded) if name not in self.active_plugins]
+        if not loaded:
+            return
+        workers = self.settings.get('plugins', {}).get('import_workers', 4)
+        startup = PluginStartup(self.plugin_manager, loaded, workers)
+        self.plugin_startup_report = {'plugins': {}, 'failed': {}}
+        self.status_label.config(text=f"Loading {len(loaded)} plugin(s)...")
+        startup.start()
+        self._poll_plugin_startup(startup, 0.0, None)
+
+    def _poll_plugin_startup(self, startup, create_seconds, last_frame):
+        report = self.plugin_startup_report
+        for plugin_name, module, error, import_seconds in startup.ready():
+            if error is not None:
+                report['failed'][plugin_name] = str(error) or type(error).__name__
+                continue
+            start = time.perf_counter()
             try:
-                self.load_plugin(plugin_name)
-            except Exception:
-                pass
+                plugin_class = self.plugin_manager.register(plugin_name, module)
+                last_frame = (plugin_name,) + self._create_plugin(plugin_name, plugin_class)
+                report['plugins'][plugin_name] = {'import_s': import_seconds,
+                                                  'create_s': time.perf_counter() - start}
+            except Exception as e:
+                report['failed'][plugin_name] = str(e)
+            create_seconds += time.perf_counter() - start
+        if not startup.done():
+            self.root.after(20, self._poll_plugin_startup, startup, create_seconds, last_frame)
+            return
+
+        # One summary instead of a dialog per plugin
+        total = time.perf_counter() - startup.started
+        report.update(total_s=total, import_s=startup.import_seconds(), create_s=create_seconds)
+        if last_frame is not None:
+            self._select_plugin_tab(*last_frame)
+        if report['plugins']:
+            self.save_plugin_state()
+        self.status_label.config(
+            text=f"Loaded {len(report['plugins'])} plugin(s) in {total:.2f}s "
+                 f"(import {report['import_s']:.2f}s on {startup.workers} workers, "
+                 f"create {create_seconds:.2f}s)")
+        if report['failed']:
+            details = "\n".join(f"{name}: {error}" for name, error in report['failed'].items())
+            messagebox.showwarning("Plugin Startup",
+                                   f"{len(report['failed'])} plugin(s) failed to load:\n\n{details}")
                 
+    def plugin_costs(self):
+        """Profiler rows for every plugin that is loaded or was timed"""
+        names = list(dict.fromkeys(list(self.active_plugins) + list(self.profiler.stats)))
+        return self.profiler.snapshot(names, self.plugin_manager.import_seconds)
+
+    def create_plugin_cost_table(self, parent):
+        """Sortable table of plugin costs with refresh and JSON export"""
+        tk.Label(parent, text="⏱ Plugin Costs", bg='#1a1a2e', fg='#00ffff',
+                 font=('Segoe UI', 12, 'bold')).pack(anchor='w', padx=12, pady=(10, 4))
+        frame = tk.Frame(parent, bg='#1a1a2e')
+        frame.pack(fill='both', expand=True, padx=12, pady=(0, 6))
+
+        columns = [('name', "Plugin", 140), ('import_ms', "Import ms", 75), ('create_ms', "Create ms", 75),
+                   ('callbacks', "Calls", 60), ('callback_total_ms', "Total ms", 75),
+                   ('callback_p95_ms', "p95 ms", 65), ('callback_max_ms', "Max ms", 65), ('errors', "Errors", 55),
+                   ('threads', "Threads", 60)]
+        table = ttk.Treeview(frame, columns=[key for key, _, _ in columns], show='headings', height=6)
+        scrollbar = tk.Scrollbar(frame, orient='vertical', command=table.yview, bg='#2d2d50', troughcolor='#1a1a2e')
+        table.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side='right', fill='y')
+        table.pack(fill='both', expand=True)
+        order = {'key': 'callback_total_ms', 'reverse': True}
+
+        def fill():
+            rows = sorted(self.plugin_costs(), key=lambda row: row[order['key']], reverse=order['reverse'])
+            table.delete(*table.get_children())
+            for row in rows:
+                table.insert('', 'end', values=[row['name']] + [
+                    f"{row[key]:.1f}" if isinstance(row[key], float) else row[key] for key, _, _ in columns[1:]])
+
+        def sort_by(key):
+            order['reverse'] = not order['reverse'] if order['key'] == key else key != 'name'
+            order['key'] = key
+            fill()
+
+        for key, heading, width in columns:
+            table.heading(key, text=heading, command=lambda k=key: sort_by(k))
+            table.column(key, width=width, anchor='w' if key == 'name' else 'e')
+
+        def export():
+            filename = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON", "*.json")],
+                                                    initialfile="plugin_costs.json")
+            if not filename:
+                return
+            try:
+                with open(filename, 'w', encoding='utf-8') as f:
+                    json.dump({'generated': datetime.now().isoformat(timespec='seconds'),
+                               'plugins': self.plugin_costs()}, f, indent=2)
+                self.status_label.config(text=f"Plugin costs exported: {filename}")
+            except Exception as e:
+                messagebox.showerror("Export Error", str(e))
+
+        buttons = tk.Frame(parent, bg='#1a1a2e')
+        buttons.pack(fill='x', padx=12, pady=(0, 6))
+        tk.Button(buttons, text="🔄 Refresh", bg='#2d2d50', fg='#00ffff', bd=0, padx=10,
+                  command=fill).pack(side='left')
+        tk.Button(buttons, text="💾 Export JSON", bg='#2d2d50', fg='#00ffff', bd=0, padx=10,
+                  command=export).pack(side='left', padx=6)
+        fill()
+        return table
+
     def save_plugin_state(self):
         """Save plugin state"""
         self.settings['plugins']['loaded'] = list(self.active_plugins.keys())
@@ -995,13 +1889,17 @@ Active Plugins: {len(self.active_plugins)}
         except Exception:
             pass
 
+        # Render mode (items vs composited image)
+        self.set_render_mode(ui.get('render_mode', 'items'))
+
         # Bands visibility and speed
         bands_enabled = ui.get('bands_enabled', True)
         adv = self.settings.get('advanced', {})
         band_mul = adv.get('band_speed_multiplier', 1.0)
+        bands_visible = bands_enabled and self.render_mode == 'items'
         for band in getattr(self, 'bands', []):
             try:
-                self.main_canvas.itemconfigure(band['id'], state='normal' if bands_enabled else 'hidden')
+                self.main_canvas.itemconfigure(band['id'], state='normal' if bands_visible else 'hidden')
                 # adjust speed relative to stored base_speed if present
                 if 'base_speed' in band:
                     band['speed'] = band['base_speed'] * band_mul
@@ -1010,61 +1908,69 @@ Active Plugins: {len(self.active_plugins)}
             except Exception:
                 pass
 
+        # Frame clock rate and per-effect divisors
+        if hasattr(self, 'frame_clock'):
+            self.update_animation_state()
+            for name, divisor in adv.get('effect_divisors', {}).items():
+                self.frame_clock.set_divisor(name, divisor)
+
         # Particle adjustments (size, color, speed, glow)
         min_size = ui.get('particle_min_size', 6)
         max_size = ui.get('particle_max_size', 12)
         particle_speed = adv.get('particle_speed', 1.0)
         glow_mul = adv.get('glow_intensity', 1.0)
         palette = adv.get('particle_colors', [])
-        for p in list(self.particles):
-            # clamp sizes and update visuals
-            p['size'] = max(1, min(max_size, max(min_size, int(p.get('size', min_size)))))
-            # update color
-            if palette:
+        store = self.particles
+        # Only restyle what changed, so a count-only change leaves the live particles alone
+        style = (min_size, max_size, particle_speed, glow_mul, tuple(palette))
+        previous = self.particle_style or style
+        self.particle_style = style
+        resize = previous[:2] != style[:2]
+        recolor = previous[4] != style[4] and palette
+        speed_ratio = particle_speed / previous[2] if previous[2] else None
+        reglow = previous[3] != glow_mul
+        for i in range(len(store) if style != previous else 0):
+            if resize:
+                store.size[i] = max(1, min(max_size, max(min_size, int(store.size[i]))))
+            if recolor:
                 try:
                     new_color = random.choice(palette)
-                    p['color'] = new_color
-                    self.main_canvas.itemconfigure(p['id'], fill=new_color)
+                    store.colors[i] = new_color
+                    self.main_canvas.itemconfigure(store.ids[i], fill=new_color)
+                    self.main_canvas.itemconfigure(store.glow_ids[i], outline=new_color)
+                except Exception:
+                    pass
+            # Scale velocities to the new speed instead of re-rolling them
+            if speed_ratio is None:
+                store.vx[i] = (random.random() - 0.5) * 4 * particle_speed
+                store.vy[i] = (random.random() - 0.5) * 4 * particle_speed
+            elif speed_ratio != 1:
+                store.vx[i] *= speed_ratio
+                store.vy[i] *= speed_ratio
+            if resize or reglow:
+                try:
+                    store.glow[i] = max(0, int(3 * glow_mul))
+                    self.main_canvas.coords(store.glow_ids[i], *store.box(i, glow=True))
                 except Exception:
                     pass
-            # update velocity to match speed multiplier
-            try:
-                p['vx'] = (random.random() - 0.5) * 4 * particle_speed
-                p['vy'] = (random.random() - 0.5) * 4 * particle_speed
-            except Exception:
-                pass
-            # update glow
-            try:
-                p['glow'] = max(0, int(3 * glow_mul))
-                if 'glow_id' in p:
-                    glow_size = p['size'] + p.get('glow', 0)
-                    self.main_canvas.coords(p['glow_id'], p['x']-glow_size, p['y']-glow_size, p['x']+glow_size, p['y']+glow_size)
-                else:
-                    # create glow if missing
-                    p['glow_id'] = self.main_canvas.create_oval(p['x']- (p['size']+p['glow']), p['y']-(p['size']+p['glow']), p['x']+(p['size']+p['glow']), p['y']+(p['size']+p['glow']), fill='', outline=p.get('color',''), width=2)
-            except Exception:
-                pass
 
-        # Particle count adjustments
+        # Particle count adjustments (capped by the quality governor)
         target = ui.get('particle_count', len(self.particles))
         try:
             target = int(target)
         except Exception:
             target = len(self.particles)
+        self.governor.budget_ms = float(adv.get('frame_budget_ms', 8.0))
+        target = min(target, self._particle_limit())
 
-        # Add particles if needed
+        # Add particles if needed (growing the pool here, never mid-frame)
+        self.item_pool.reserve(target)
         while len(self.particles) < target:
             self._create_particle()
 
         # Remove excess particles
-        while len(self.particles) > target:
-            p = self.particles.pop()
-            try:
-                self.main_canvas.delete(p.get('id'))
-                if 'glow_id' in p:
-                    self.main_canvas.delete(p.get('glow_id'))
-            except Exception:
-                pass
+        self._trim_particles(target)
+        self._apply_quality()
         # Apply theme overrides across UI where possible
         try:
             theme = adv.get('theme', {})
@@ -1108,6 +2014,7 @@ Active Plugins: {len(self.active_plugins)}
             # Status label
             try:
                 self.status_label.config(bg=panel_bg, fg=accent)
+                self.quality_label.config(bg=panel_bg, fg=accent)
             except Exception:
                 pass
 
@@ -1135,18 +2042,41 @@ class SettingsManager:
         
         # Add UI/settings defaults so the settings UI has keys to read/write
         self.defaults = {
-            'plugins': {'loaded': []},
+            'plugins': {'loaded': [], 'import_workers': 4, 'hot_reload': True, 'watch_interval_ms': 1000,
+                        'isolated': [], 'scheduler_tick_ms': 250, 'scheduler_workers': 4,
+                        'profile_callbacks': True},
             'ui': {
                 'alpha': 0.95,
                 'particle_count': 60,
                 'bands_enabled': True,
+                'render_mode': 'items',
                 'particle_min_size': 6,
                 'particle_max_size': 12
             },
+            'editor': {
+                'read_chunk_kb': 1024,
+                'mmap_threshold_mb': 64,
+                'write_buffer_kb': 1024,
+                'syntax_highlighting': True,
+                'release_tabs_after_s': 120,
+                'long_line_chars': 5000,
+                'journal_enabled': True,
+                'journal_flush_ms': 1000,
+                'journal_compact_ops': 5000
+            },
             'advanced': {
                 'particle_speed': 1.0,
                 'glow_intensity': 1.0,
                 'band_speed_multiplier': 1.0,
+                'target_fps': 50,
+                'particle_pool_size': 500,
+                'frame_budget_ms': 8.0,
+                'pause_when_hidden': True,
+                'idle_timeout_s': 120,
+                'throttle_fps': 15,
+                'metrics_interval_ms': 1000,
+                'metrics_history': 300,
+                'effect_divisors': {'particles': 1, 'bands': 2, 'pulse': 5},
                 'particle_colors': ['#00ffff', '#ff00ff', '#ffff00', '#ff0080', '#8000ff', '#00ff80', '#ff4444'],
                 'theme': {
                     'panel_bg': '#2a2a4e',
@@ -1191,29 +2121,59 @@ class PluginManager:
         self.plugins_dir = Path(plugins_dir)
         self.plugins = {}
         self.loaded_plugins = []
+        self.import_seconds = {}
         self.plugins_dir.mkdir(exist_ok=True)
+        self.index = PluginIndex(self.plugins_dir / "plugin_index.json")
     
     def scan_plugins(self):
+        """Plugin files with their manifests; unchanged files only cost a stat"""
+        files = []
+        try:
+            with os.scandir(self.plugins_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.py') and entry.name != '__init__.py' and entry.is_file():
+                        files.append((Path(entry.path), entry.stat()))
+        except OSError:
+            pass
+        manifests = self.index.manifests(files)
         plugins = []
-        for plugin_file in self.plugins_dir.glob("*.py"):
-            if plugin_file.stem != "__init__":
-                plugins.append({
-                    'name': plugin_file.stem,
-                    'path': plugin_file,
-                    'loaded': plugin_file.stem in self.loaded_plugins
-                })
+        for plugin_file, _ in sorted(files, key=lambda item: item[0].name):
+            plugins.append({
+                'name': plugin_file.stem,
+                'path': plugin_file,
+                'loaded': plugin_file.stem in self.loaded_plugins,
+                'manifest': manifests[str(plugin_file)]
+            })
         return plugins
     
     def load_plugin(self, plugin_name):
+        return self.register(plugin_name, self.import_module(plugin_name))
+    
+    def import_module(self, plugin_name):
+        """Compile and run a plugin's module; safe to call from a worker thread"""
         plugin_file = self.plugins_dir / f"{plugin_name}.py"
         if not plugin_file.exists():
             raise FileNotFoundError(f"Plugin {plugin_name} not found")
         
         spec = importlib.util.spec_from_file_location(plugin_name, plugin_file)
         module = importlib.util.module_from_spec(spec)
+        previous = sys.modules.get(plugin_name)
         sys.modules[plugin_name] = module
-        spec.loader.exec_module(module)
-        
+        start = time.perf_counter()
+        try:
+            spec.loader.exec_module(module)
+            self.import_seconds[plugin_name] = time.perf_counter() - start
+        except BaseException:
+            # Leave a running plugin's module in place if its new version fails
+            if previous is not None:
+                sys.modules[plugin_name] = previous
+            else:
+                sys.modules.pop(plugin_name, None)
+            raise
+        return module
+    
+    def register(self, plugin_name, module):
+        """Record an imported plugin module and return its Plugin class"""
         if hasattr(module, 'Plugin'):
             self.plugins[plugin_name] = module
             if plugin_name not in self.loaded_plugins:
@@ -1230,6 +2190,3680 @@ class PluginManager:
         if plugin_name in sys.modules:
             del sys.modules[plugin_name]
 
+class PluginStartup:
+    """Imports plugin modules on a worker pool for the UI thread to instantiate.
+
+    start() submits every import at once. ready() yields
+    ``(name, module, error, seconds)`` in the original order, as soon as a
+    plugin and every plugin before it have been imported, so tabs can be
+    created in order while later imports are still running.
+    """
+    def __init__(self, plugin_manager, names, workers=4):
+        self.plugin_manager = plugin_manager
+        self.names = list(names)
+        self.workers = max(1, workers)
+        self.futures = []
+        self.next = 0
+        self.started = None
+        self.imports_finished = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers,
+                                                         thread_name_prefix='plugin-import')
+        self.futures = [executor.submit(self._import, name) for name in self.names]
+        executor.shutdown(wait=False)
+
+    def _import(self, name):
+        start = time.perf_counter()
+        try:
+            return self.plugin_manager.import_module(name), time.perf_counter() - start
+        finally:
+            self.imports_finished = time.perf_counter()
+
+    def ready(self):
+        while self.next < len(self.futures) and self.futures[self.next].done():
+            name, future = self.names[self.next], self.futures[self.next]
+            self.next += 1
+            try:
+                module, seconds = future.result()
+            except BaseException as e:
+                # A plugin calling sys.exit() at import is a failed plugin, not a shutdown
+                yield name, None, e, 0.0
+            else:
+                yield name, module, None, seconds
+
+    def done(self):
+        return self.next >= len(self.futures)
+
+    def import_seconds(self):
+        """Wall time from start() until the last import finished"""
+        if self.imports_finished is None:
+            return 0.0
+        return self.imports_finished - self.started
+
+def _plugin_worker_main(plugin_file, function_name, conn, config, batch_interval):
+    """Entry point of a plugin worker process."""
+    name = Path(plugin_file).stem
+    spec = importlib.util.spec_from_file_location(name, plugin_file)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    channel = WorkerChannel(conn, batch_interval)
+    try:
+        getattr(module, function_name)(channel, config)
+    finally:
+        channel.flush()
+        conn.close()
+
+class WorkerChannel:
+    """A plugin worker's end of its pipe to the manager, used inside the subprocess.
+
+    send() queues a message, and queued messages go out as one batch every
+    ``batch_interval`` seconds or on flush(). sleep() waits while picking up
+    commands from the UI half. ``running`` turns False when the manager
+    stops the worker or goes away.
+    """
+    def __init__(self, conn, batch_interval=0.1):
+        self.conn = conn
+        self.batch_interval = batch_interval
+        self.pending = []
+        self.inbox = []
+        self.running = True
+        self.last_flush = time.monotonic()
+
+    def send(self, message):
+        self.pending.append(message)
+        if time.monotonic() - self.last_flush >= self.batch_interval:
+            self.flush()
+
+    def flush(self):
+        if self.pending and self.running:
+            try:
+                self.conn.send(self.pending)
+            except (OSError, EOFError):
+                self.running = False
+        self.pending = []
+        self.last_flush = time.monotonic()
+
+    def receive(self):
+        """Commands from the UI half since the last call."""
+        self._read()
+        received, self.inbox = self.inbox, []
+        return received
+
+    def sleep(self, seconds):
+        """Wait up to ``seconds``; returns early once the worker should stop."""
+        self.flush()
+        deadline = time.monotonic() + seconds
+        while self.running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                if self.conn.poll(remaining):
+                    self._read()
+            except (OSError, EOFError):
+                self.running = False
+
+    def _read(self):
+        try:
+            while self.conn.poll():
+                kind, payload = self.conn.recv()
+                if kind == 'stop':
+                    self.running = False
+                else:
+                    self.inbox.append(payload)
+        except (OSError, EOFError):
+            self.running = False
+
+def _callable_name(func):
+    return getattr(func, '__qualname__', None) or repr(func)
+
+def _print_error(where, error):
+    print(f"{where} failed:", file=sys.stderr)
+    traceback.print_exception(type(error), error, error.__traceback__, file=sys.stderr)
+
+class TaskScheduler:
+    """Shared timer and worker pool for periodic and one-shot jobs.
+
+    One Tk timer ticks every ``tick_ms`` while there is work. Intervals are
+    rounded up to whole ticks and periodic jobs are aligned to multiples of
+    their interval, so jobs due together run on the same tick; a job that
+    fell behind runs once instead of catching up. Blocking jobs run on a
+    bounded thread pool, a periodic one never overlapping itself, and their
+    results come back to ``on_result`` on the UI thread. Jobs belong to an
+    owner (a plugin name) and can be paused or cancelled together. Errors
+    with no ``on_error`` to take them, and errors raised by the callbacks
+    themselves, go to ``report(owner, where, error)``.
+    """
+    def __init__(self, root, tick_ms=250, workers=4, current_owner=None, instrument=None, report=None):
+        self.root = root
+        self.tick_ms = max(10, int(tick_ms))
+        self.workers = max(1, int(workers))
+        self.current_owner = current_owner
+        self.instrument = instrument
+        self.report = report
+        self.jobs = {}
+        self.paused = set()
+        self.results = queue.Queue()
+        self.inflight = 0
+        self.executor = None
+        self.started = time.monotonic()
+        self._next_id = 0
+        self._after_id = None
+
+    def every(self, seconds, func, owner=None, blocking=False, on_result=None, on_error=None,
+              pause_hidden=True, run_now=True):
+        """Run ``func()`` every ``seconds``; returns a job id for cancel()."""
+        return self._add(func, seconds, 0 if run_now else seconds, True, owner,
+                         blocking, on_result, on_error, pause_hidden)
+
+    def once(self, seconds, func, owner=None, blocking=False, on_result=None, on_error=None,
+             pause_hidden=False):
+        """Run ``func()`` once, ``seconds`` from now."""
+        return self._add(func, seconds, seconds, False, owner,
+                         blocking, on_result, on_error, pause_hidden)
+
+    def _add(self, func, interval, delay, periodic, owner, blocking, on_result, on_error, pause_hidden):
+        if owner is None and self.current_owner is not None:
+            owner = self.current_owner()
+        wrap = self.instrument if self.instrument is not None and owner is not None else (lambda o, f: f)
+        self._next_id += 1
+        ticks = max(1, math.ceil(interval * 1000 / self.tick_ms))
+        now = self._now()
+        due = now + max(1, math.ceil(delay * 1000 / self.tick_ms))
+        job = {'id': self._next_id, 'owner': owner, 'name': _callable_name(func),
+               'periodic': periodic, 'ticks': ticks,
+               'due': (due + ticks - 1) // ticks * ticks if periodic and delay else due,
+               'blocking': blocking, 'pause_hidden': pause_hidden, 'running': False, 'cancelled': False,
+               'func': func if blocking else wrap(owner, func),
+               'on_result': wrap(owner, on_result) if on_result else None,
+               'on_error': wrap(owner, on_error) if on_error else None}
+        self.jobs[job['id']] = job
+        self._schedule()
+        return job['id']
+
+    def cancel(self, job_id):
+        job = self.jobs.pop(job_id, None)
+        if job is not None:
+            job['cancelled'] = True
+
+    def cancel_owner(self, owner):
+        for job in [job for job in self.jobs.values() if job['owner'] == owner]:
+            self.cancel(job['id'])
+        self.paused.discard(owner)
+
+    def set_paused(self, owner, paused):
+        if paused:
+            self.paused.add(owner)
+        elif owner in self.paused:
+            self.paused.discard(owner)
+            self._schedule()
+
+    def stop(self):
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def _now(self):
+        return int((time.monotonic() - self.started) * 1000 // self.tick_ms)
+
+    def _schedule(self):
+        if self._after_id is None:
+            # Wait for the next tick boundary so timers stay aligned
+            elapsed_ms = (time.monotonic() - self.started) * 1000
+            delay = self.tick_ms - int(elapsed_ms % self.tick_ms)
+            self._after_id = self.root.after(delay, self._tick)
+
+    def _tick(self):
+        self._after_id = None
+        self._deliver_results()
+        now = self._now()
+        for job in list(self.jobs.values()):
+            if job['due'] > now or job['running'] or (job['pause_hidden'] and job['owner'] in self.paused):
+                continue
+            if job['periodic']:
+                job['due'] = (now // job['ticks'] + 1) * job['ticks']
+            else:
+                del self.jobs[job['id']]
+            self._run(job)
+        # Keep ticking only while something can become due
+        if self.inflight or any(not (job['pause_hidden'] and job['owner'] in self.paused)
+                                for job in self.jobs.values()):
+            self._schedule()
+
+    def _run(self, job):
+        if job['blocking']:
+            if self.executor is None:
+                self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers,
+                                                                      thread_name_prefix='task')
+            job['running'] = True
+            self.inflight += 1
+            future = self.executor.submit(job['func'])
+            future.add_done_callback(lambda f, job=job: self.results.put((job, f)))
+            return
+        try:
+            result = job['func']()
+        except Exception as e:
+            self._finish(job, None, e)
+        else:
+            self._finish(job, result, None)
+
+    def _deliver_results(self):
+        while True:
+            try:
+                job, future = self.results.get_nowait()
+            except queue.Empty:
+                return
+            job['running'] = False
+            self.inflight -= 1
+            if job['cancelled'] or future.cancelled():
+                continue
+            error = future.exception()
+            self._finish(job, None if error else future.result(), error)
+
+    def _finish(self, job, result, error):
+        if job['cancelled']:
+            return
+        callback = job['on_error'] if error is not None else job['on_result']
+        if callback is None:
+            if error is not None:
+                self._report(job, error)
+            return
+        try:
+            callback(error if error is not None else result)
+        except Exception as e:
+            self._report(job, e)
+
+    def _report(self, job, error):
+        where = f"Scheduled job {job['id']} ({job['name']})"
+        if self.report is not None:
+            self.report(job['owner'], where, error)
+        else:
+            _print_error(where, error)
+
+class PluginProfiler:
+    """Attributes UI-thread time to the plugin that registered the callback.
+
+    install() wraps ``tkinter.Misc._register``, through which every Tk
+    callback (button commands, bindings, ``after`` timers) passes. Callbacks
+    registered while a plugin is running (in its constructor, or in one of
+    its own callbacks) are timed and charged to that plugin. Threads are
+    counted by the module of their target function. uninstall() puts the
+    original back.
+    """
+    SAMPLES = 1000
+
+    def __init__(self):
+        self.current = None
+        self.stats = {}
+        self._installed = None
+        self._reported = set()
+
+    def install(self):
+        if self._installed is not None:
+            return
+        register = tk.Misc._register
+        profiler = self
+
+        def _register(widget, func, subst=None, needcleanup=1):
+            if profiler.current is not None and callable(func):
+                func = profiler.wrap(profiler.current, func)
+            return register(widget, func, subst, needcleanup)
+        tk.Misc._register = _register
+        self._installed = (register, _register)
+
+    def uninstall(self):
+        """Restore ``tkinter.Misc._register``; callbacks already wrapped stay timed"""
+        if self._installed is None:
+            return
+        register, wrapper = self._installed
+        self._installed = None
+        # Leave a hook installed on top of ours alone
+        if tk.Misc._register is wrapper:
+            tk.Misc._register = register
+
+    def _stats(self, plugin):
+        stats = self.stats.get(plugin)
+        if stats is None:
+            stats = self.stats[plugin] = {'create_s': None, 'calls': 0, 'total_s': 0.0, 'errors': 0,
+                                          'samples': deque(maxlen=self.SAMPLES)}
+        return stats
+
+    def record_error(self, plugin, where, error):
+        """Count a failed callback against ``plugin``; each ``where`` logs its traceback once.
+
+        Returns True the first time ``where`` fails.
+        """
+        if plugin is not None:
+            self._stats(plugin)['errors'] += 1
+        if (plugin, where) in self._reported:
+            return False
+        self._reported.add((plugin, where))
+        _print_error(f"{where} ({plugin or 'manager'})", error)
+        return True
+
+    def wrap(self, plugin, func):
+        @functools.wraps(func)
+        def call(*args):
+            previous = self.current
+            self.current = plugin
+            start = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.current = previous
+                stats = self._stats(plugin)
+                stats['calls'] += 1
+                stats['total_s'] += elapsed
+                stats['samples'].append(elapsed)
+        return call
+
+    def call(self, plugin, factory, *args):
+        """Construct a plugin object, timing it and attributing its callbacks to ``plugin``."""
+        previous = self.current
+        self.current = plugin
+        start = time.perf_counter()
+        try:
+            return factory(*args)
+        finally:
+            self._stats(plugin)['create_s'] = time.perf_counter() - start
+            self.current = previous
+
+    @staticmethod
+    def thread_counts():
+        counts = {}
+        for thread in threading.enumerate():
+            target = getattr(thread, '_target', None)
+            module = getattr(target, '__module__', None) if target is not None else type(thread).__module__
+            if module:
+                counts[module] = counts.get(module, 0) + 1
+        return counts
+
+    def snapshot(self, plugins, import_seconds=None):
+        """One row of costs per plugin, times in milliseconds."""
+        import_seconds = import_seconds or {}
+        threads = self.thread_counts()
+        rows = []
+        for plugin in plugins:
+            stats = self._stats(plugin)
+            samples = sorted(stats['samples'])
+            rows.append({
+                'name': plugin,
+                'import_ms': import_seconds.get(plugin, 0.0) * 1000,
+                'create_ms': (stats['create_s'] or 0.0) * 1000,
+                'callbacks': stats['calls'],
+                'callback_total_ms': stats['total_s'] * 1000,
+                'callback_p95_ms': samples[int(len(samples) * 0.95)] * 1000 if samples else 0.0,
+                'callback_max_ms': samples[-1] * 1000 if samples else 0.0,
+                'errors': stats['errors'],
+                'threads': threads.get(plugin, 0),
+            })
+        return rows
+
+class PluginWorker:
+    """The manager's handle on a plugin worker running in its own process.
+
+    Batches from the worker are passed to ``on_messages(list)`` on the Tk
+    loop. The process's CPU and memory use are sampled while it runs, and a
+    worker that dies is started again after a delay that doubles with each
+    quick failure.
+    """
+    POLL_MS = 100
+    STATS_INTERVAL = 2.0
+    MAX_RESTART_DELAY = 30.0
+
+    def __init__(self, root, plugin_file, function_name, on_messages, config=None, batch_interval=0.1):
+        self.root = root
+        self.plugin_file = Path(plugin_file)
+        self.function_name = function_name
+        self.on_messages = on_messages
+        self.config = config
+        self.batch_interval = batch_interval
+        self.process = None
+        self.conn = None
+        self.ps_process = None
+        self.cpu_percent = 0.0
+        self.rss = 0
+        self.restarts = 0
+        self.restart_delay = 1.0
+        self.started_at = 0.0
+        self.stopping = False
+        self._stats_time = 0.0
+        self._after_id = None
+
+    def start(self):
+        context = multiprocessing.get_context('spawn')
+        self.conn, child = context.Pipe()
+        self.process = context.Process(
+            target=_plugin_worker_main, daemon=True, name=f"plugin-{self.plugin_file.stem}",
+            args=(str(self.plugin_file), self.function_name, child, self.config, self.batch_interval))
+        self.process.start()
+        child.close()
+        self.started_at = time.monotonic()
+        try:
+            self.ps_process = psutil.Process(self.process.pid)
+            self.ps_process.cpu_percent(None)
+        except Exception:
+            self.ps_process = None
+        self._after_id = self.root.after(self.POLL_MS, self.poll)
+
+    def send(self, payload):
+        """Pass a command to the worker (it reads them with channel.receive())."""
+        try:
+            self.conn.send(('command', payload))
+        except Exception:
+            pass
+
+    def poll(self):
+        if self.stopping:
+            return
+        messages = []
+        try:
+            while self.conn.poll():
+                messages.extend(self.conn.recv())
+        except (OSError, EOFError):
+            pass
+        if messages:
+            try:
+                self.on_messages(messages)
+            except Exception:
+                pass
+        now = time.monotonic()
+        if self.ps_process is not None and now - self._stats_time >= self.STATS_INTERVAL:
+            self._stats_time = now
+            try:
+                self.cpu_percent = self.ps_process.cpu_percent(None)
+                self.rss = self.ps_process.memory_info().rss
+            except Exception:
+                pass
+        if self.process.is_alive():
+            self._after_id = self.root.after(self.POLL_MS, self.poll)
+            return
+        # Died: start it again, backing off if it keeps dying quickly
+        self.conn.close()
+        self.cpu_percent = 0.0
+        if now - self.started_at > 60:
+            self.restart_delay = 1.0
+        self._after_id = self.root.after(int(self.restart_delay * 1000), self._restart)
+        self.restart_delay = min(self.MAX_RESTART_DELAY, self.restart_delay * 2)
+
+    def _restart(self):
+        if not self.stopping:
+            self.restarts += 1
+            self.start()
+
+    def stop(self, timeout=1.0, wait=False):
+        """Ask the worker to exit and terminate it if it is still running after ``timeout``.
+
+        The Tk loop checks on the process rather than joining it, unless
+        ``wait`` is set (on shutdown, when blocking no longer matters).
+        """
+        self.stopping = True
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+        try:
+            self.conn.send(('stop', None))
+        except Exception:
+            pass
+        if self.process is None:
+            return
+        if wait:
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(0.5)
+            return
+        self._after_id = self.root.after(self.POLL_MS, self._reap, time.monotonic() + timeout, False)
+
+    def _reap(self, deadline, terminated):
+        self._after_id = None
+        if not self.process.is_alive():
+            return
+        if time.monotonic() >= deadline:
+            if terminated:
+                self.process.kill()
+                return
+            self.process.terminate()
+            deadline, terminated = time.monotonic() + 0.5, True
+        self._after_id = self.root.after(self.POLL_MS, self._reap, deadline, terminated)
+
+    def stats(self):
+        alive = self.process is not None and self.process.is_alive()
+        return {'pid': self.process.pid if alive else None, 'alive': alive,
+                'cpu_percent': self.cpu_percent if alive else 0.0,
+                'rss_mb': self.rss / (1 << 20) if alive else 0.0, 'restarts': self.restarts}
+
+class PluginWatcher:
+    """Polls the files of loaded plugins and reports the ones that changed.
+
+    Every ``interval_ms`` the Tk loop stats the file of each plugin named
+    by ``names()``; nothing else in the directory is touched. A change is
+    passed to ``on_change(name)`` once the file's mtime and size have held
+    still for one more poll, so half-written saves are not picked up.
+    """
+    def __init__(self, root, plugin_manager, names, on_change, interval_ms=1000):
+        self.root = root
+        self.plugin_manager = plugin_manager
+        self.names = names
+        self.on_change = on_change
+        self.interval_ms = max(100, int(interval_ms))
+        self.signatures = {}
+        self.changed = {}
+        self.running = False
+        self._after_id = None
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self._after_id = self.root.after(self.interval_ms, self.poll)
+
+    def stop(self):
+        self.running = False
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def _signature(self, name):
+        try:
+            stat = os.stat(self.plugin_manager.plugins_dir / f"{name}.py")
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def poll(self):
+        if not self.running:
+            return
+        names = self.names()
+        for name in names:
+            signature = self._signature(name)
+            known = self.signatures.setdefault(name, signature)
+            if signature is None or signature == known:
+                self.changed.pop(name, None)
+            elif self.changed.get(name) != signature:
+                self.changed[name] = signature
+            else:
+                del self.changed[name]
+                self.signatures[name] = signature
+                try:
+                    self.on_change(name)
+                except Exception:
+                    pass
+        for name in [name for name in self.signatures if name not in names]:
+            del self.signatures[name]
+            self.changed.pop(name, None)
+        self._after_id = self.root.after(self.interval_ms, self.poll)
+
+class PluginIndex:
+    """Manifests of plugin files, read without importing them.
+
+    Each file is parsed with ``ast`` for its module docstring, the tab name
+    its Plugin class sets, and declared metadata: ``__version__``,
+    ``__author__`` and a literal ``PLUGIN_METADATA`` dict. Manifests are
+    cached in ``index_file`` by path together with the file's mtime and
+    size, so only new or changed files are parsed again.
+    """
+    VERSION = 1
+
+    def __init__(self, index_file):
+        self.index_file = Path(index_file)
+        self.entries = None
+
+    def _load(self):
+        if self.entries is None:
+            self.entries = {}
+            try:
+                data = json.loads(self.index_file.read_text(encoding='utf-8'))
+                if data.get('version') == self.VERSION:
+                    self.entries = data['plugins']
+            except Exception:
+                pass
+        return self.entries
+
+    def manifests(self, files):
+        """Manifests by path for ``(path, stat_result)`` pairs."""
+        entries = self._load()
+        changed = False
+        result = {}
+        for path, stat in files:
+            key = str(path)
+            entry = entries.get(key)
+            if entry is None or entry['mtime_ns'] != stat.st_mtime_ns or entry['size'] != stat.st_size:
+                entry = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'manifest': self.parse(path)}
+                entries[key] = entry
+                changed = True
+            result[key] = entry['manifest']
+        for key in [key for key in entries if key not in result]:
+            del entries[key]
+            changed = True
+        if changed:
+            self.save()
+        return result
+
+    def save(self):
+        temp = self.index_file.with_suffix('.tmp')
+        try:
+            with open(temp, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.VERSION, 'plugins': self.entries}, f, indent=1)
+            os.replace(temp, self.index_file)
+        except Exception:
+            pass
+
+    @staticmethod
+    def parse(path):
+        """Manifest of one plugin file, from its syntax tree only."""
+        manifest = {'description': '', 'tab_name': None, 'version': None, 'author': None,
+                    'metadata': {}, 'has_plugin_class': False, 'error': None}
+        try:
+            tree = ast.parse(Path(path).read_bytes(), filename=str(path))
+        except (OSError, SyntaxError, ValueError) as e:
+            manifest['error'] = str(e)
+            return manifest
+        doc = ast.get_docstring(tree)
+        if doc:
+            manifest['description'] = doc.strip().split('\n\n')[0]
+        declared = {'__version__': 'version', '__author__': 'author', 'PLUGIN_METADATA': 'metadata'}
+        for node in tree.body:
+            if isinstance(node, ast.Assign):
+                for target in node.targets:
+                    if isinstance(target, ast.Name) and target.id in declared:
+                        value = PluginIndex._literal(node.value)
+                        if value is not None:
+                            manifest[declared[target.id]] = value
+            elif isinstance(node, ast.ClassDef) and node.name == 'Plugin':
+                manifest['has_plugin_class'] = True
+                manifest['tab_name'] = PluginIndex._tab_name(node)
+        if not isinstance(manifest['metadata'], dict):
+            manifest['metadata'] = {}
+        return manifest
+
+    @staticmethod
+    def _tab_name(class_node):
+        # ``tab_name = "..."`` in the class body or ``self.tab_name = "..."`` in a method
+        for node in ast.walk(class_node):
+            if isinstance(node, ast.Assign):
+                for target in node.targets:
+                    if ((isinstance(target, ast.Name) and target.id == 'tab_name') or
+                            (isinstance(target, ast.Attribute) and target.attr == 'tab_name')):
+                        value = PluginIndex._literal(node.value)
+                        if isinstance(value, str):
+                            return value
+        return None
+
+    @staticmethod
+    def _literal(node):
+        """A JSON-friendly constant for ``node``, or None if it is not a literal."""
+        try:
+            return json.loads(json.dumps(ast.literal_eval(node), default=str))
+        except (ValueError, TypeError, SyntaxError, RecursionError):
+            return None
+
+class MetricsSampler:
+    """System metrics sampled once per interval into a fixed-size ring buffer.
+
+    psutil is polled on the scheduler's worker pool. Each sample is written
+    into one preallocated ``array('d')`` per field on the UI thread and then
+    handed to every subscriber, so extra consumers cost a callback, not
+    another round of sampling. Network fields are bytes per second. A
+    subscriber that raises goes to ``report(owner, where, error)``.
+    """
+    FIELDS = ('time', 'cpu', 'mem', 'disk', 'net_sent', 'net_recv')
+
+    def __init__(self, scheduler, interval_ms=1000, capacity=300, disk_path='.',
+                 current_owner=None, instrument=None, report=None):
+        self.scheduler = scheduler
+        self.interval = max(0.1, interval_ms / 1000.0)
+        self.capacity = max(2, int(capacity))
+        self.disk_path = disk_path
+        self.current_owner = current_owner
+        self.instrument = instrument
+        self.report = report
+        self.buffers = {field: array('d', bytes(8 * self.capacity)) for field in self.FIELDS}
+        self.count = 0
+        self.subscribers = {}
+        self.job = None
+        self._net = None
+
+    def start(self):
+        if self.job is None:
+            # Prime the CPU counter so the first reading covers one interval
+            psutil.cpu_percent(interval=None)
+            self.job = self.scheduler.every(self.interval, self.sample, blocking=True,
+                                            on_result=self._record, pause_hidden=False)
+
+    def stop(self):
+        if self.job is not None:
+            self.scheduler.cancel(self.job)
+            self.job = None
+
+    def subscribe(self, callback, owner=None):
+        """Call ``callback(sample)`` on the UI thread for every new sample"""
+        if owner is None and self.current_owner is not None:
+            owner = self.current_owner()
+        wrapped = callback
+        if owner is not None and self.instrument is not None:
+            wrapped = self.instrument(owner, callback)
+        self.subscribers[callback] = (owner, wrapped)
+        return callback
+
+    def subscribed(self, callback):
+        return callback in self.subscribers
+
+    def unsubscribe(self, callback):
+        self.subscribers.pop(callback, None)
+
+    def unsubscribe_owner(self, owner):
+        for callback, (callback_owner, _) in list(self.subscribers.items()):
+            if callback_owner == owner:
+                del self.subscribers[callback]
+
+    def sample(self):
+        """Read psutil once (worker thread); the scheduler never overlaps calls"""
+        now = time.time()
+        sent = recv = 0.0
+        try:
+            net = psutil.net_io_counters()
+        except Exception:
+            net = None
+        if net is not None:
+            if self._net is not None and now > self._net[0]:
+                elapsed = now - self._net[0]
+                sent = max(0.0, (net.bytes_sent - self._net[1]) / elapsed)
+                recv = max(0.0, (net.bytes_recv - self._net[2]) / elapsed)
+            self._net = (now, net.bytes_sent, net.bytes_recv)
+        try:
+            disk = psutil.disk_usage(self.disk_path).percent
+        except Exception:
+            disk = 0.0
+        return (now, psutil.cpu_percent(interval=None), psutil.virtual_memory().percent,
+                disk, sent, recv)
+
+    def _record(self, values):
+        slot = self.count % self.capacity
+        for field, value in zip(self.FIELDS, values):
+            self.buffers[field][slot] = value
+        self.count += 1
+        sample = dict(zip(self.FIELDS, values))
+        for callback, (owner, wrapped) in list(self.subscribers.items()):
+            try:
+                wrapped(sample)
+            except Exception as e:
+                where = f"Metrics subscriber {_callable_name(callback)}"
+                if self.report is not None:
+                    self.report(owner, where, e)
+                else:
+                    _print_error(where, e)
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def latest(self):
+        if not self.count:
+            return None
+        slot = (self.count - 1) % self.capacity
+        return {field: buffer[slot] for field, buffer in self.buffers.items()}
+
+    def series(self, field, count=None):
+        """The last ``count`` values of ``field``, oldest first"""
+        n = len(self) if count is None else min(len(self), max(0, int(count)))
+        buffer = self.buffers[field]
+        start = (self.count - n) % self.capacity
+        end = start + n
+        if end <= self.capacity:
+            return buffer[start:end].tolist()
+        return buffer[start:].tolist() + buffer[:end - self.capacity].tolist()
+
+class UIDispatcher:
+    """Thread-safe queue of widget updates applied in batches on the UI thread.
+
+    Any thread may post(); the UI thread drains everything pending once per
+    frame. Updates posted under the same key replace each other in place, so
+    a widget that changed five times between frames is only updated once,
+    with its latest value, in the order it was first posted. While the queue
+    stays empty the drain backs off to ``IDLE_FRAMES`` frames.
+    An update that raises goes to ``report(owner, where, error)``, the owner
+    being the module that defined it.
+    """
+    IDLE_FRAMES = 2
+
+    def __init__(self, root, fps=50, report=None):
+        self.root = root
+        self.report = report
+        self.interval_ms = max(1, int(1000 / max(1, int(fps))))
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.posted = 0
+        self.coalesced = 0
+        self.applied = 0
+        self.errors = 0
+        self.batches = 0
+        self.max_depth = 0
+        self.last_batch = 0
+        self.latency_ms = 0.0
+        self.max_latency_ms = 0.0
+        self.running = False
+        self._delay = self.interval_ms
+        self._next_id = 0
+        self._after_id = None
+
+    def post(self, func, *args, key=None):
+        with self.lock:
+            self.posted += 1
+            if key is None:
+                self._next_id += 1
+                key = ('call', self._next_id)
+                posted_at = time.perf_counter()
+            else:
+                previous = self.pending.get(key)
+                if previous is not None:
+                    # Latency counts from the first update the widget missed
+                    self.coalesced += 1
+                    posted_at = previous[2]
+                else:
+                    posted_at = time.perf_counter()
+            self.pending[key] = (func, args, posted_at)
+            self.max_depth = max(self.max_depth, len(self.pending))
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    def stop(self):
+        self.running = False
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def stats(self):
+        return {
+            'depth': len(self.pending),
+            'max_depth': self.max_depth,
+            'posted': self.posted,
+            'coalesced': self.coalesced,
+            'applied': self.applied,
+            'errors': self.errors,
+            'batches': self.batches,
+            'last_batch': self.last_batch,
+            'latency_ms': self.latency_ms,
+            'max_latency_ms': self.max_latency_ms
+        }
+
+    def _drain(self):
+        self._after_id = None
+        if not self.running:
+            return
+        with self.lock:
+            batch, self.pending = self.pending, {}
+        if batch:
+            now = time.perf_counter()
+            oldest = (now - min(posted_at for _, _, posted_at in batch.values())) * 1000.0
+            self.latency_ms = oldest if not self.batches else self.latency_ms * 0.9 + oldest * 0.1
+            self.max_latency_ms = max(self.max_latency_ms, oldest)
+            self.batches += 1
+            self.last_batch = len(batch)
+            for func, args, _ in batch.values():
+                try:
+                    func(*args)
+                    self.applied += 1
+                except Exception as e:
+                    self.errors += 1
+                    where = f"UI update {_callable_name(func)}"
+                    if self.report is not None:
+                        self.report(getattr(func, '__module__', None), where, e)
+                    else:
+                        _print_error(where, e)
+            self._delay = self.interval_ms
+        else:
+            self._delay = min(self.interval_ms * self.IDLE_FRAMES, self._delay * 2)
+        self._after_id = self.root.after(self._delay, self._drain)
+
+class FrameScheduler:
+    """Single frame clock driving every background effect.
+
+    Effects register with a divisor and run on every ``divisor``-th frame, so
+    the Tk event queue only sees one timer at ``fps``. Frames that start late
+    are counted, and frames that were missed entirely are dropped rather
+    than replayed, which keeps the background cost capped. An effect's first
+    error is logged; after ``MAX_FAILURES`` failures in a row it is removed.
+    """
+    MAX_FAILURES = 10
+
+    def __init__(self, root, fps=50):
+        self.root = root
+        self.fps = max(1, int(fps))
+        self.effects = {}
+        self.failures = {}
+        self.disabled = []
+        self.frame = 0
+        self.animation_time = 0.0
+        self.late_frames = 0
+        self.dropped_frames = 0
+        self.last_frame_time = 0.0
+        self.on_frame = None
+        self.running = False
+        self._after_id = None
+        self._deadline = 0.0
+
+    @property
+    def interval(self):
+        return 1.0 / self.fps
+
+    def add(self, name, callback, divisor=1):
+        self.effects[name] = [callback, max(1, int(divisor))]
+        self.failures.pop(name, None)
+
+    def remove(self, name):
+        self.effects.pop(name, None)
+        self.failures.pop(name, None)
+
+    def set_divisor(self, name, divisor):
+        if name in self.effects:
+            self.effects[name][1] = max(1, int(divisor))
+
+    def set_fps(self, fps):
+        self.fps = max(1, int(fps))
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._deadline = time.perf_counter()
+        self._tick()
+
+    def stop(self):
+        self.running = False
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def stats(self):
+        return {
+            'fps': self.fps,
+            'frames': self.frame,
+            'late': self.late_frames,
+            'dropped': self.dropped_frames,
+            'disabled': list(self.disabled),
+            'frame_ms': self.last_frame_time * 1000.0
+        }
+
+    def _tick(self):
+        self._after_id = None
+        if not self.running:
+            return
+        interval = self.interval
+        start = time.perf_counter()
+        lateness = start - self._deadline
+        if lateness >= interval:
+            # Skip the frames we missed instead of running them back to back
+            missed = int(lateness // interval)
+            self.dropped_frames += missed
+            self._deadline += missed * interval
+        elif lateness > interval / 2:
+            self.late_frames += 1
+
+        for name, (callback, divisor) in list(self.effects.items()):
+            if self.frame % divisor == 0:
+                try:
+                    callback()
+                except Exception as e:
+                    self._failed(name, e)
+                else:
+                    self.failures.pop(name, None)
+
+        self.frame += 1
+        self.animation_time += interval
+        self._deadline += interval
+        now = time.perf_counter()
+        self.last_frame_time = now - start
+        if self.on_frame is not None:
+            self.on_frame(self.last_frame_time)
+        delay = max(1, int((self._deadline - now) * 1000))
+        self._after_id = self.root.after(delay, self._tick)
+
+    def _failed(self, name, error):
+        count = self.failures.get(name, 0) + 1
+        self.failures[name] = count
+        if count == 1 and name not in self.disabled:
+            _print_error(f"Frame effect {name}", error)
+        if count >= self.MAX_FAILURES:
+            self.remove(name)
+            self.disabled.append(name)
+            print(f"Frame effect {name} disabled after {count} failures in a row", file=sys.stderr)
+
+class QualityGovernor:
+    """Keeps the background animation within a frame-time budget.
+
+    It is fed the measured time of every background frame. After each window
+    of frames it steps the quality level down when the average (or any
+    dropped frame) exceeds the budget. It steps back up only after several
+    windows comfortably under budget, so the level does not oscillate.
+    A budget of 0 pins the level at full quality.
+    """
+    LEVELS = [
+        # name, particle fraction, glow rings, band divisor multiplier
+        ('Minimal', 0.25, False, 4),
+        ('Low', 0.4, False, 2),
+        ('Medium', 0.6, True, 2),
+        ('High', 0.8, True, 1),
+        ('Full', 1.0, True, 1),
+    ]
+
+    def __init__(self, clock, budget_ms=8.0, window=30, on_change=None):
+        self.clock = clock
+        self.budget_ms = budget_ms
+        self.window = window
+        self.on_change = on_change
+        self.level = len(self.LEVELS) - 1
+        self.average_ms = None
+        self._total = 0.0
+        self._samples = 0
+        self._calm_windows = 0
+        self._dropped_seen = clock.dropped_frames
+
+    def level_settings(self):
+        name, particles, glow, band_divisor = self.LEVELS[self.level]
+        return {'name': name, 'particles': particles, 'glow': glow, 'band_divisor': band_divisor}
+
+    def record(self, elapsed):
+        """Add one frame time; returns True when a window was evaluated."""
+        self._total += elapsed * 1000.0
+        self._samples += 1
+        if self._samples < self.window:
+            return False
+
+        self.average_ms = self._total / self._samples
+        self._total = 0.0
+        self._samples = 0
+        dropped = self.clock.dropped_frames - self._dropped_seen
+        self._dropped_seen = self.clock.dropped_frames
+
+        previous = self.level
+        if self.budget_ms <= 0:
+            self.level = len(self.LEVELS) - 1
+        elif (self.average_ms > self.budget_ms or dropped) and self.level > 0:
+            self.level -= 1
+            self._calm_windows = 0
+        elif self.average_ms < self.budget_ms * 0.6 and not dropped:
+            self._calm_windows += 1
+            if self._calm_windows >= 3 and self.level < len(self.LEVELS) - 1:
+                self.level += 1
+                self._calm_windows = 0
+        else:
+            self._calm_windows = 0
+
+        if self.on_change is not None and self.level != previous:
+            self.on_change(self.level)
+        return True
+
+class BackgroundCompositor:
+    """Rasterises the animated background into a single canvas image.
+
+    Particles, glow rings, bands and the pulse colour are drawn into a NumPy
+    RGB buffer at ``1/scale`` resolution, encoded as a binary PPM and loaded
+    into a PhotoImage that Tk zooms onto one full-size image item. Requires
+    NumPy; without it the manager stays in per-item mode.
+    """
+    disabled = False
+
+    def __init__(self, canvas, width=1500, height=900, scale=3):
+        self.canvas = canvas
+        self.scale = scale
+        self.w = width // scale
+        self.h = height // scale
+        self.buffer = np.zeros((self.h, self.w, 3), dtype=np.uint8)
+        self._header = f'P6 {self.w} {self.h} 255\n'.encode('ascii')
+        self._stamps = {}
+        self._rgb_cache = {}
+
+        self.frame_image = tk.PhotoImage(master=canvas, width=self.w, height=self.h)
+        self.display_image = tk.PhotoImage(master=canvas, width=width, height=height)
+        self.item = canvas.create_image(0, 0, image=self.display_image, anchor='nw', state='hidden')
+        canvas.tag_lower(self.item)
+
+    @classmethod
+    def available(cls):
+        return np is not None and not cls.disabled
+
+    def show(self, visible):
+        self.canvas.itemconfigure(self.item, state='normal' if visible else 'hidden')
+
+    def _rgb(self, color):
+        rgb = self._rgb_cache.get(color)
+        if rgb is None:
+            try:
+                rgb = tuple(c // 257 for c in self.canvas.winfo_rgb(color))
+            except Exception:
+                rgb = (0, 255, 255)
+            self._rgb_cache[color] = rgb
+        return rgb
+
+    def _stamp(self, radius, ring):
+        """Pixel offsets of a filled disc (or a 1px ring) of ``radius``."""
+        key = (radius, ring)
+        if key not in self._stamps:
+            r = np.arange(-radius, radius + 1)
+            dy, dx = np.meshgrid(r, r, indexing='ij')
+            dist2 = dy * dy + dx * dx
+            mask = dist2 <= radius * radius
+            if ring:
+                mask &= dist2 > (radius - 1) * (radius - 1)
+            self._stamps[key] = (dy[mask], dx[mask])
+        return self._stamps[key]
+
+    def _draw_discs(self, cx, cy, radii, rgb, ring=False):
+        buf = self.buffer
+        for radius in np.unique(radii):
+            sel = radii == radius
+            dy, dx = self._stamp(int(radius), ring)
+            ys = cy[sel, None] + dy
+            xs = cx[sel, None] + dx
+            ok = (ys >= 0) & (ys < self.h) & (xs >= 0) & (xs < self.w)
+            colors = np.broadcast_to(rgb[sel, None, :], ys.shape + (3,))
+            buf[ys[ok], xs[ok]] = colors[ok]
+
+    def render(self, background, particles, bands, glow=True):
+        buf = self.buffer
+        s = self.scale
+        buf[:] = self._rgb(background)
+
+        for band in bands:
+            y0 = max(0, int((band['y'] - 3) / s))
+            y1 = min(self.h, int((band['y'] + 3) / s) + 1)
+            buf[y0:y1] = self._rgb(band['color'])
+
+        n = len(particles)
+        if n:
+            cx = (np.frombuffer(particles.x, dtype=np.float64) / s).astype(np.intp)
+            cy = (np.frombuffer(particles.y, dtype=np.float64) / s).astype(np.intp)
+            size = np.frombuffer(particles.size, dtype=np.float64)
+            rgb = np.array([self._rgb(c) for c in particles.colors], dtype=np.uint8)
+            if glow:
+                glow_r = np.maximum(1, np.rint((size + np.frombuffer(particles.glow, dtype=np.float64)) / s)).astype(np.intp)
+                self._draw_discs(cx, cy, glow_r, rgb, ring=True)
+            radii = np.maximum(1, np.rint(size / s)).astype(np.intp)
+            self._draw_discs(cx, cy, radii, rgb)
+
+        self.frame_image.configure(data=self._header + buf.tobytes(), format='PPM')
+        self.display_image.tk.call(self.display_image, 'copy', self.frame_image,
+                                   '-zoom', s, s, '-compositingrule', 'set')
+
+class CanvasItemPool:
+    """Preallocated particle and glow ovals on the background canvas.
+
+    Items are created hidden up front; particles acquire a pair and show and
+    move it, and give it back hidden when removed, so the animation never
+    creates or deletes canvas items mid-frame.
+    """
+    def __init__(self, canvas, size=0):
+        self.canvas = canvas
+        self.free = []
+        self.allocated = 0
+        self.reserve(size)
+
+    def reserve(self, size):
+        """Make sure at least ``size`` item pairs exist."""
+        while self.allocated < size:
+            item = self.canvas.create_oval(0, 0, 0, 0, fill='', outline='', width=0, state='hidden')
+            glow = self.canvas.create_oval(0, 0, 0, 0, fill='', outline='', width=2, state='hidden')
+            self.free.append((item, glow))
+            self.allocated += 1
+
+    def acquire(self):
+        """Take a hidden ``(item, glow)`` pair, growing only past the pool size."""
+        if not self.free:
+            self.reserve(self.allocated + 1)
+        return self.free.pop()
+
+    def release(self, item, glow):
+        self.canvas.itemconfigure(item, state='hidden')
+        self.canvas.itemconfigure(glow, state='hidden')
+        self.free.append((item, glow))
+
+class ParticleStore:
+    """Column-oriented storage for the background particles.
+
+    x/y/vx/vy/size/glow each live in a contiguous ``array('d')`` so one frame
+    of physics is a single batched step (vectorised through NumPy when it is
+    installed). Canvas item ids and colours are kept in parallel lists.
+    """
+    def __init__(self, width=1500, height=900, margin=20, seed=None):
+        self.width = width
+        self.height = height
+        self.margin = margin
+        self.rng = random.Random(seed)
+        self.np_rng = np.random.default_rng(seed) if np is not None else None
+
+        self.x = array('d')
+        self.y = array('d')
+        self.vx = array('d')
+        self.vy = array('d')
+        self.size = array('d')
+        self.glow = array('d')
+        self.ids = []
+        self.glow_ids = []
+        self.colors = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _columns(self):
+        return (self.x, self.y, self.vx, self.vy, self.size, self.glow)
+
+    def add(self, item_id, x, y, vx, vy, size, glow, color, glow_id):
+        for column, value in zip(self._columns(), (x, y, vx, vy, size, glow)):
+            column.append(value)
+        self.ids.append(item_id)
+        self.glow_ids.append(glow_id)
+        self.colors.append(color)
+
+    def pop(self):
+        """Remove the newest particle and return its ``(id, glow_id)``."""
+        for column in self._columns():
+            column.pop()
+        self.colors.pop()
+        return self.ids.pop(), self.glow_ids.pop()
+
+    def step(self, turbulence=0.2):
+        """Move every particle, add turbulence and wrap around the edges."""
+        if not self.ids:
+            return
+        if np is not None:
+            self._step_numpy(turbulence)
+        else:
+            self._step_python(turbulence)
+
+    def _bounds(self):
+        m = self.margin
+        return -m, self.width + m, -m, self.height + m
+
+    def _step_numpy(self, turbulence):
+        n = len(self.ids)
+        lo_x, hi_x, lo_y, hi_y = self._bounds()
+        # Zero-copy views: the arrays are updated in place
+        x = np.frombuffer(self.x, dtype=np.float64)
+        y = np.frombuffer(self.y, dtype=np.float64)
+        vx = np.frombuffer(self.vx, dtype=np.float64)
+        vy = np.frombuffer(self.vy, dtype=np.float64)
+
+        x += vx
+        y += vy
+        vx += (self.np_rng.random(n) - 0.5) * turbulence
+        vy += (self.np_rng.random(n) - 0.5) * turbulence
+
+        for pos, lo, hi in ((x, lo_x, hi_x), (y, lo_y, hi_y)):
+            below = pos < lo
+            above = pos > hi
+            pos[below] = hi
+            pos[above] = lo
+
+    def _step_python(self, turbulence):
+        lo_x, hi_x, lo_y, hi_y = self._bounds()
+        rand = self.rng.random
+        self.x = array('d', [hi_x if v < lo_x else lo_x if v > hi_x else v
+                             for v in map(float.__add__, self.x, self.vx)])
+        self.y = array('d', [hi_y if v < lo_y else lo_y if v > hi_y else v
+                             for v in map(float.__add__, self.y, self.vy)])
+        self.vx = array('d', [v + (rand() - 0.5) * turbulence for v in self.vx])
+        self.vy = array('d', [v + (rand() - 0.5) * turbulence for v in self.vy])
+
+    def box(self, i, glow=False):
+        """Bounding box of particle ``i`` (grown by its glow radius if asked)."""
+        r = self.size[i] + (self.glow[i] if glow else 0)
+        return (self.x[i] - r, self.y[i] - r, self.x[i] + r, self.y[i] + r)
+
+    def boxes(self, glow=False):
+        """Bounding boxes of all particles, computed in one batch."""
+        if not self.ids:
+            return []
+        if np is not None:
+            x = np.frombuffer(self.x, dtype=np.float64)
+            y = np.frombuffer(self.y, dtype=np.float64)
+            r = np.frombuffer(self.size, dtype=np.float64)
+            if glow:
+                r = r + np.frombuffer(self.glow, dtype=np.float64)
+            return np.column_stack((x - r, y - r, x + r, y + r)).tolist()
+        radii = map(float.__add__, self.size, self.glow) if glow else self.size
+        return [(x - r, y - r, x + r, y + r) for x, y, r in zip(self.x, self.y, radii)]
+
+class AddBuffer:
+    """Append-only text store for inserted text.
+
+    Text is kept as chunks of roughly ``CHUNK`` characters, so an append
+    copies at most one short chunk however large the buffer has grown.
+    Slices join only the chunks they cover. Text once stored never changes,
+    so clones of a table can keep reading a buffer the original still
+    appends to.
+    """
+    CHUNK = 1 << 12
+
+    def __init__(self):
+        self.chunks = []
+        self.starts = []
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def append(self, text):
+        """Store ``text`` and return the offset it starts at."""
+        start = self.length
+        if self.chunks and len(self.chunks[-1]) < self.CHUNK:
+            self.chunks[-1] = self.chunks[-1] + text
+        else:
+            self.chunks.append(text)
+            self.starts.append(start)
+        self.length += len(text)
+        return start
+
+    def __getitem__(self, key):
+        start, stop, _ = key.indices(self.length)
+        if start >= stop:
+            return ''
+        i = bisect.bisect_right(self.starts, start) - 1
+        j = bisect.bisect_left(self.starts, stop)
+        base = self.starts[i]
+        if j - i == 1:
+            return self.chunks[i][start - base:stop - base]
+        return ''.join(self.chunks[i:j])[start - base:stop - base]
+
+class PieceTable:
+    """Piece-table text buffer.
+
+    The text is a list of ``(buffer, start, length)`` pieces over append-only
+    buffers: buffer 0 holds the original text and inserted text goes to an
+    ``AddBuffer``. Edits only split or trim pieces, so changing a huge
+    document never copies it. Buffers only need ``len()`` and slicing.
+    """
+
+    def __init__(self, text=''):
+        self.buffers = [text]
+        self.pieces = [(0, 0, len(text))] if len(text) else []
+        self.length = len(text)
+        self._add_index = None
+        self._offsets = None
+
+    def __len__(self):
+        return self.length
+
+    def clone(self):
+        """Cheap read-only copy; buffers are shared since stored text never changes."""
+        copy = PieceTable.__new__(PieceTable)
+        copy.buffers = list(self.buffers)
+        copy.pieces = list(self.pieces)
+        copy.length = self.length
+        copy._add_index = None
+        copy._offsets = self._offsets
+        return copy
+
+    def _piece_offsets(self):
+        if self._offsets is None:
+            offsets = []
+            pos = 0
+            for _, _, n in self.pieces:
+                offsets.append(pos)
+                pos += n
+            self._offsets = offsets
+        return self._offsets
+
+    def _append(self, text):
+        """Store ``text`` in the add buffer and return ``(buffer, start)``."""
+        if self._add_index is None:
+            self.buffers.append(AddBuffer())
+            self._add_index = len(self.buffers) - 1
+        return self._add_index, self.buffers[self._add_index].append(text)
+
+    def insert(self, offset, text):
+        if not text:
+            return
+        offset = max(0, min(offset, self.length))
+        b, start = self._append(text)
+        new = (b, start, len(text))
+        pieces = self.pieces
+        if not pieces:
+            pieces.append(new)
+        else:
+            offsets = self._piece_offsets()
+            i = bisect.bisect_right(offsets, offset) - 1
+            pb, ps, pn = pieces[i]
+            within = offset - offsets[i]
+            if within == 0 and i > 0:
+                # At a piece boundary: look at the piece that ends here
+                i -= 1
+                pb, ps, pn = pieces[i]
+                within = pn
+            if within == pn:
+                if pb == b and ps + pn == start:
+                    # Typing: the new text continues the previous insertion
+                    pieces[i] = (pb, ps, pn + len(text))
+                else:
+                    pieces.insert(i + 1, new)
+            elif within == 0:
+                pieces.insert(0, new)
+            else:
+                pieces[i:i + 1] = [(pb, ps, within), new, (pb, ps + within, pn - within)]
+        self.length += len(text)
+        self._offsets = None
+
+    def delete(self, offset, length):
+        offset = max(0, offset)
+        end = min(self.length, offset + length)
+        if end <= offset:
+            return
+        offsets = self._piece_offsets()
+        first = max(0, bisect.bisect_right(offsets, offset) - 1)
+        last = bisect.bisect_left(offsets, end)
+        kept = []
+        for i in range(first, last):
+            b, s, n = self.pieces[i]
+            pos = offsets[i]
+            if pos < offset:
+                kept.append((b, s, offset - pos))
+            if pos + n > end:
+                cut = max(end - pos, 0)
+                kept.append((b, s + cut, n - cut))
+        self.pieces[first:last] = kept
+        self.length -= end - offset
+        self._offsets = None
+
+    def replace_many(self, edits):
+        """Apply ``(offset, length, text)`` edits in one pass over the pieces.
+
+        Offsets refer to the text before the call and must be increasing
+        without overlaps.
+        """
+        source = iter(zip(self._piece_offsets(), self.pieces))
+        current = next(source, None)
+        pieces = []
+        for offset, length, text in edits:
+            end = offset + length
+            # Keep everything before the edit, splitting the piece it starts in
+            while current is not None and current[0] + current[1][2] <= offset:
+                pieces.append(current[1])
+                current = next(source, None)
+            if current is not None and current[0] < offset:
+                pos, (b, s, n) = current
+                pieces.append((b, s, offset - pos))
+                current = (offset, (b, s + offset - pos, n - (offset - pos)))
+            # Drop the replaced range
+            while current is not None and current[0] + current[1][2] <= end:
+                current = next(source, None)
+            if current is not None and current[0] < end:
+                pos, (b, s, n) = current
+                current = (end, (b, s + end - pos, n - (end - pos)))
+            if text:
+                b, start = self._append(text)
+                if pieces and pieces[-1][0] == b and pieces[-1][1] + pieces[-1][2] == start:
+                    pieces[-1] = (b, pieces[-1][1], pieces[-1][2] + len(text))
+                else:
+                    pieces.append((b, start, len(text)))
+            self.length += len(text) - length
+        if current is not None:
+            pieces.append(current[1])
+        pieces.extend(piece for _, piece in source)
+        self.pieces = pieces
+        self._offsets = None
+
+    def append_buffer(self, buffer):
+        """Append a whole buffer (e.g. a loaded chunk) as a new piece."""
+        if not len(buffer):
+            return
+        self.buffers.append(buffer)
+        self.pieces.append((len(self.buffers) - 1, 0, len(buffer)))
+        self.length += len(buffer)
+        self._offsets = None
+
+    def iter_chunks(self, start=0, end=None, size=1 << 20):
+        """Yield the text between ``start`` and ``end`` in slices of at most ``size``."""
+        end = self.length if end is None else min(end, self.length)
+        if start >= end or not self.pieces:
+            return
+        offsets = self._piece_offsets()
+        i = max(0, bisect.bisect_right(offsets, start) - 1)
+        while i < len(self.pieces) and offsets[i] < end:
+            b, s, n = self.pieces[i]
+            lo = max(start, offsets[i]) - offsets[i]
+            hi = min(end, offsets[i] + n) - offsets[i]
+            buf = self.buffers[b]
+            while lo < hi:
+                step = min(size, hi - lo)
+                yield buf[s + lo:s + lo + step]
+                lo += step
+            i += 1
+
+    def get_text(self, start=0, end=None):
+        return ''.join(self.iter_chunks(start, end))
+
+class LineIndex:
+    """Offsets of the start of every line, kept current across edits.
+
+    The offsets live in one array('q'). An edit moves every later offset, so
+    that shift is left pending: entries from ``pending_from`` on are stored
+    ``pending_delta`` short, and the delta is only folded into the entries
+    between one edit location and the next. Typing in one place costs a
+    binary search plus the newlines added or removed; lookups are O(log n).
+    """
+    NUMPY_SHIFT = 256
+
+    def __init__(self, starts=None):
+        self.starts = starts if starts is not None else array('q', [0])
+        self.pending_from = len(self.starts)
+        self.pending_delta = 0
+
+    @classmethod
+    def build(cls, chunks):
+        starts = array('q', [0])
+        pos = 0
+        for chunk in chunks:
+            ends = _newline_ends(chunk)
+            if np is not None and pos:
+                ends = array('q', (np.frombuffer(ends, dtype=np.int64) + pos).tobytes())
+            elif pos:
+                ends = array('q', [pos + end for end in ends])
+            starts.extend(ends)
+            pos += len(chunk)
+        return cls(starts)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, line):
+        if line >= self.pending_from:
+            return self.starts[line] + self.pending_delta
+        return self.starts[line]
+
+    def line_of(self, offset):
+        """Line containing ``offset``."""
+        starts, split = self.starts, self.pending_from
+        if split < len(starts) and offset >= starts[split] + self.pending_delta:
+            return bisect.bisect_right(starts, offset - self.pending_delta, split) - 1
+        return bisect.bisect_right(starts, offset, 0, split) - 1
+
+    def edit(self, offset, removed, inserted):
+        """Account for ``removed`` characters replaced by ``inserted`` at ``offset``."""
+        first = self.line_of(offset) + 1
+        self._settle(first)
+        starts = self.starts
+        delta = self.pending_delta
+        # Line starts inside the removed range belong to deleted newlines
+        last = bisect.bisect_right(starts, offset + removed - delta, first)
+        added = _newline_ends(inserted) if '\n' in inserted else ()
+        if last > first or added:
+            starts[first:last] = array('q', [offset + end for end in added])
+        self.pending_from = first + len(added)
+        self.pending_delta = delta + len(inserted) - removed
+
+    def extend(self, line_starts, offset):
+        """Append line starts found in text appended at ``offset``."""
+        starts = self.starts
+        self._settle(len(starts))
+        if np is not None and isinstance(line_starts, array):
+            shifted = np.frombuffer(line_starts, dtype=np.int64) + offset
+            starts.frombytes(shifted.astype(np.int64).tobytes())
+        else:
+            starts.extend(offset + start for start in line_starts)
+        self.pending_from = len(starts)
+
+    def longest(self, length):
+        """Length of the longest line of a ``length`` character text."""
+        self._settle(len(self.starts))
+        starts = self.starts
+        if np is not None:
+            offsets = np.append(np.frombuffer(starts, dtype=np.int64), length + 1)
+            return int(np.diff(offsets).max()) - 1
+        ends = list(starts[1:]) + [length + 1]
+        return max(end - start for start, end in zip(starts, ends)) - 1
+
+    def _settle(self, line):
+        """Move the start of the pending shift to ``line``."""
+        split, delta = self.pending_from, self.pending_delta
+        if split >= len(self.starts):
+            self.pending_delta = delta = 0
+        if delta and line != split:
+            if line > split:
+                self._shift(split, line, delta)
+            else:
+                self._shift(line, split, -delta)
+        self.pending_from = line
+
+    def _shift(self, lo, hi, amount):
+        starts = self.starts
+        if np is not None and hi - lo > self.NUMPY_SHIFT:
+            view = np.frombuffer(starts, dtype=np.int64)
+            view[lo:hi] += amount
+            del view  # release the buffer so the array can resize again
+        else:
+            for i in range(lo, hi):
+                starts[i] += amount
+
+class Document:
+    """An editor document: piece-table text plus undo history.
+
+    Offsets are character offsets. Listeners registered with add_listener()
+    are called as ``listener(offset, removed, inserted)`` after every change.
+    """
+    COMPACT_LIMIT = 16 << 20
+    def __init__(self, text='', path=None, newline='\n'):
+        self.table = PieceTable(text)
+        self.path = path
+        # Line ending the file uses on disk; the text itself always has '\n'
+        self.newline = newline
+        # The file mixed several line endings; saving writes them all as ``newline``
+        self.mixed_newlines = False
+        self.modified = False
+        self.version = 0
+        self.loading = False
+        self.listeners = []
+        self._undo = []
+        self._redo = []
+        self._typing = None
+        self._line_index = None
+
+    def __len__(self):
+        return len(self.table)
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def get_text(self, start=0, end=None):
+        return self.table.get_text(start, end)
+
+    def iter_chunks(self, start=0, end=None, size=1 << 20):
+        return self.table.iter_chunks(start, end, size)
+
+    # ---------- Editing ----------
+    def replace(self, offset, length, text, coalesce=False):
+        """Replace ``length`` characters at ``offset`` with ``text``.
+
+        With ``coalesce`` consecutive typing joins the previous undo step.
+        """
+        removed = self.table.get_text(offset, offset + length) if length else ''
+        if not removed and not text:
+            return
+        self._apply(offset, removed, text)
+        op = (offset, removed, text)
+        if coalesce and self._continues_typing(op):
+            self._undo[-1].append(op)
+        else:
+            self._undo.append([op])
+        self._typing = op if coalesce else None
+        self._redo.clear()
+
+    def replace_many(self, edits):
+        """Apply ``(offset, length, text)`` edits as one undo step.
+
+        Offsets refer to the text before any of them is applied and must be
+        in increasing order without overlaps.
+        """
+        edits = [(offset, self.table.get_text(offset, offset + length) if length else '', text)
+                 for offset, length, text in edits if length or text]
+        if not edits:
+            return
+        self._undo.append(self._apply_many(edits))
+        self._typing = None
+        self._redo.clear()
+
+    def insert(self, offset, text):
+        self.replace(offset, 0, text)
+
+    def extend(self, buffer, line_starts=()):
+        """Append loaded text. Not an edit: no undo step, no listeners.
+
+        ``line_starts`` are the offsets just after each newline in ``buffer``.
+        """
+        offset = len(self.table)
+        index = self._lines()
+        self.table.append_buffer(buffer)
+        index.extend(line_starts, offset)
+
+    def delete(self, offset, length):
+        self.replace(offset, length, '')
+
+    def _continues_typing(self, op):
+        last = self._typing
+        if last is None or not self._undo or '\n' in op[2]:
+            return False
+        offset, removed, inserted = op
+        l_offset, l_removed, l_inserted = last
+        if not removed and not l_removed:
+            return offset == l_offset + len(l_inserted)
+        if not inserted and not l_inserted:
+            # Backspace or forward delete next to the previous deletion
+            return offset + len(removed) == l_offset or offset == l_offset
+        return False
+
+    def _apply(self, offset, removed, inserted):
+        if removed:
+            self.table.delete(offset, len(removed))
+        if inserted:
+            self.table.insert(offset, inserted)
+        self.modified = True
+        self.version += 1
+        self._changed(offset, removed, inserted)
+
+    def _apply_many(self, edits):
+        """Apply increasing, non-overlapping ``(offset, removed, inserted)`` edits
+        (offsets in the current text) in one piece-table pass. Listeners see
+        them one by one; returns them as sequential ops for the undo stack."""
+        self.table.replace_many([(offset, len(removed), inserted) for offset, removed, inserted in edits])
+        self.modified = True
+        self.version += 1
+        ops = []
+        delta = 0
+        for offset, removed, inserted in edits:
+            op = (offset + delta, removed, inserted)
+            ops.append(op)
+            delta += len(inserted) - len(removed)
+            self._changed(*op)
+        return ops
+
+    @staticmethod
+    def _in_order(group):
+        """Whether each op of an undo group starts after the text the previous one left."""
+        return all(later[0] >= earlier[0] + len(earlier[2]) for earlier, later in zip(group, group[1:]))
+
+    def _changed(self, offset, removed, inserted):
+        if self._line_index is not None:
+            self._line_index.edit(offset, len(removed), inserted)
+        for listener in list(self.listeners):
+            listener(offset, removed, inserted)
+
+    def undo(self):
+        """Undo one step; returns the offset it touched, or None."""
+        if not self._undo:
+            return None
+        group = self._undo.pop()
+        if len(group) > 1 and self._in_order(group):
+            # Later ops never moved earlier ones, so the offsets hold in the current text
+            self._apply_many([(offset, inserted, removed) for offset, removed, inserted in group])
+        else:
+            for offset, removed, inserted in reversed(group):
+                self._apply(offset, inserted, removed)
+        self._redo.append(group)
+        self._typing = None
+        return group[0][0]
+
+    def redo(self):
+        if not self._redo:
+            return None
+        group = self._redo.pop()
+        if len(group) > 1 and self._in_order(group):
+            edits = []
+            delta = 0
+            for offset, removed, inserted in group:
+                edits.append((offset - delta, removed, inserted))
+                delta += len(inserted) - len(removed)
+            self._apply_many(edits)
+        else:
+            for offset, removed, inserted in group:
+                self._apply(offset, removed, inserted)
+        self._undo.append(group)
+        self._typing = None
+        return group[-1][0] + len(group[-1][2])
+
+    def compact(self):
+        """Collapse a fragmented piece table into one buffer, freeing
+        deleted text. Line offsets do not move, so the index is kept."""
+        table = self.table
+        if len(table) > self.COMPACT_LIMIT or any(isinstance(b, MappedText) for b in table.buffers):
+            return
+        if len(table.pieces) > 1 or len(table.buffers) > 1:
+            self.table = PieceTable(table.get_text())
+
+    # ---------- Lines ----------
+    def _lines(self):
+        if self._line_index is None:
+            self._line_index = LineIndex.build(self.table.iter_chunks())
+        return self._line_index
+
+    def line_count(self):
+        return len(self._lines())
+
+    def line_start(self, line):
+        """Offset of the first character of ``line`` (0-based)."""
+        index = self._lines()
+        if line >= len(index):
+            return len(self)
+        return index[max(0, line)]
+
+    def line_end(self, line):
+        """Offset just past the last character of ``line`` (before its newline)."""
+        index = self._lines()
+        if line + 1 < len(index):
+            return index[line + 1] - 1
+        return len(self)
+
+    def line_of(self, offset):
+        return self._lines().line_of(offset)
+
+    def longest_line(self):
+        return self._lines().longest(len(self))
+
+    def position(self, offset):
+        """``(line, column)`` of ``offset``, both 0-based."""
+        line = self.line_of(offset)
+        return line, offset - self.line_start(line)
+
+class DocumentView:
+    """Virtualised tk.Text front end for a Document.
+
+    Only a window of lines around the viewport lives in the widget. Edits
+    made in the widget are diffed against the rendered window and applied to
+    the document; the scrollbar and mouse wheel address document lines and
+    re-render the window when the viewport leaves it. Changes made to the
+    document from elsewhere re-render the window once the loop is idle.
+    Viewport listeners are called with no arguments after every render or
+    scroll, for decorations that only cover what is on screen.
+
+    Lines longer than ``long_line_chars`` (minified JSON, log dumps) are
+    shown truncated, followed by a marker; clicking the marker shows more of
+    the line. ``elided`` records the markers in the window as
+    ``(display_offset, hidden_start, hidden_length, marker_length)``, with
+    ``hidden_start`` relative to ``window_start``. The hidden text stays in
+    the document and is saved with it.
+    """
+    MARGIN = 100
+
+    def __init__(self, text_widget, scrollbar, document, long_line_chars=5000):
+        self.text = text_widget
+        self.scrollbar = scrollbar
+        self.document = document
+        self.long_line_chars = max(1, long_line_chars)
+        self.window_first = 0
+        self.window_lines = 1
+        self.window_start = 0
+        self.window_length = 0
+        self.window_text = ''
+        self.elided = []
+        self.expanded = {}
+        self.visible_lines = 40
+        self._rendering = False
+        self._recenter_pending = False
+        self._stale_pending = False
+        self._open_ended = True
+        self.syncing = False
+        self.viewport_listeners = []
+
+        self.document.add_listener(self._on_document_changed)
+        self.text.configure(undo=False, yscrollcommand=self._on_widget_scroll)
+        self.scrollbar.config(command=self.yview)
+        self.text.bind('<<Modified>>', self._on_modified, add='+')
+        self.text.bind('<Configure>', self._on_configure, add='+')
+        for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.text.bind(sequence, self._on_wheel)
+        for sequence in ('<Control-z>', '<Control-Z>'):
+            self.text.bind(sequence, lambda e: self.undo())
+        for sequence in ('<Control-y>', '<Control-Y>'):
+            self.text.bind(sequence, lambda e: self.redo())
+        self.text.tag_configure('long_line', foreground='#ffaa00', background='#2d2d50')
+        self.text.tag_bind('long_line', '<Button-1>', self._on_marker_click)
+        self.render(0)
+
+    # ---------- Window <-> document mapping ----------
+    def index_to_offset(self, index):
+        counted = self.text.count('1.0', index, 'chars')
+        return self._document_offset(counted[0] if counted else 0)
+
+    def offset_to_index(self, offset):
+        return f'1.0 + {self.display_offset(offset)} chars'
+
+    def display_offset(self, offset):
+        """Position of document ``offset`` in the window text; hidden text maps to its marker."""
+        relative = offset - self.window_start
+        shift = 0
+        for display, hidden_start, hidden, marker in self.elided:
+            if relative <= hidden_start:
+                break
+            if relative < hidden_start + hidden:
+                return display
+            shift += marker - hidden
+        return max(0, relative + shift)
+
+    def _document_offset(self, position):
+        shift = 0
+        for display, hidden_start, hidden, marker in self.elided:
+            if position <= display:
+                break
+            if position < display + marker:
+                return self.window_start + hidden_start
+            shift += hidden - marker
+        return self.window_start + position + shift
+
+    def window_end(self):
+        return self.window_start + self.window_length
+
+    def visible_range(self):
+        """Document offsets of the lines on screen (clipped to the window)."""
+        row = self.top_line() - self.window_first
+        start = self.index_to_offset(f'{row + 1}.0')
+        end = self.index_to_offset(f'{row + self.visible_lines + 1}.0')
+        return start, end
+
+    def add_viewport_listener(self, listener):
+        self.viewport_listeners.append(listener)
+
+    def detach(self):
+        """Stop following the document (before the widget is destroyed)."""
+        self.document.remove_listener(self._on_document_changed)
+        self.viewport_listeners = []
+        self._stale_pending = False
+
+    def _notify_viewport(self):
+        for listener in list(self.viewport_listeners):
+            listener()
+
+    def top_line(self):
+        """Document line shown at the top of the viewport."""
+        return self.window_first + int(self.text.index('@0,0').split('.')[0]) - 1
+
+    # ---------- Rendering ----------
+    def render(self, first, keep_offset=None):
+        """Materialise the lines around ``first`` into the widget."""
+        doc = self.document
+        total = doc.line_count()
+        count = self.visible_lines + 2 * self.MARGIN
+        first = max(0, min(first, total - count))
+        last = min(total, first + count)
+        start = doc.line_start(first)
+        end = doc.line_end(last - 1)
+
+        if keep_offset is None:
+            keep_offset = self.index_to_offset('insert')
+        self._rendering = True
+        try:
+            self.window_first = first
+            self.window_lines = last - first
+            self.window_start = start
+            self.window_length = end - start
+            if end - start > self.long_line_chars:
+                self.window_text, self.elided = self._window_with_markers(first, last)
+            else:
+                self.window_text, self.elided = doc.get_text(start, end), []
+            self._open_ended = end >= len(doc)
+            self.text.delete('1.0', 'end')
+            self.text.insert('1.0', self.window_text)
+            if self.elided:
+                self.text.tag_add('long_line', *(f'1.0 + {i} chars' for display, _, _, marker in self.elided
+                                                 for i in (display, display + marker)))
+            if start <= keep_offset <= end:
+                self.text.mark_set('insert', self.offset_to_index(keep_offset))
+            self.text.edit_modified(False)
+        finally:
+            self._rendering = False
+        self._stale_pending = False
+        self._notify_viewport()
+
+    def _window_with_markers(self, first, last):
+        """Text of lines ``first``..``last`` with over-long lines cut short."""
+        doc = self.document
+        start = doc.line_start(first)
+        parts = []
+        elided = []
+        display = 0
+        for line in range(first, last):
+            line_start, line_end = doc.line_start(line), doc.line_end(line)
+            shown = self.expanded.get(line, self.long_line_chars)
+            if line_end - line_start > shown:
+                parts.append(doc.get_text(line_start, line_start + shown))
+                hidden = line_end - line_start - shown
+                marker = f" ... {hidden:,} more characters "
+                elided.append((display + shown, line_start + shown - start, hidden, len(marker)))
+                parts.append(marker)
+                display += shown + len(marker)
+            else:
+                parts.append(doc.get_text(line_start, line_end))
+                display += line_end - line_start
+            parts.append('\n')
+            display += 1
+        parts.pop()
+        return ''.join(parts), elided
+
+    def _on_marker_click(self, event):
+        """Show four times as much of a truncated line."""
+        counted = self.text.count('1.0', self.text.index(f'@{event.x},{event.y}'), 'chars')
+        position = counted[0] if counted else 0
+        for display, hidden_start, hidden, marker in self.elided:
+            if display <= position < display + marker:
+                line = self.document.line_of(self.window_start + hidden_start)
+                self.expanded[line] = 4 * self.expanded.get(line, self.long_line_chars)
+                row = self.top_line() - self.window_first
+                self.sync()
+                self.render(self.window_first)
+                self.text.yview(f'{row + 1}.0')
+                break
+        return 'break'
+
+    def refresh(self):
+        """Pick up text appended to the document, e.g. while a file loads."""
+        full = self.window_lines >= self.visible_lines + 2 * self.MARGIN
+        if full and not self._open_ended:
+            self._update_scrollbar()
+            return
+        row = self.top_line() - self.window_first
+        self.sync()
+        self.render(self.window_first)
+        self.text.yview(f'{row + 1}.0')
+
+    def scroll_to_line(self, top):
+        """Put document line ``top`` at the top of the viewport."""
+        total = self.document.line_count()
+        top = max(0, min(top, total - self.visible_lines))
+        row = top - self.window_first
+        fits = 0 <= row and row + self.visible_lines <= self.window_lines
+        near_edge = ((row < self.MARGIN // 2 and self.window_first > 0) or
+                     (row + self.visible_lines > self.window_lines - self.MARGIN // 2
+                      and self.window_first + self.window_lines < total))
+        if not fits or near_edge:
+            self.sync()
+            self.render(top - self.MARGIN)
+            row = top - self.window_first
+        self.text.yview(f'{row + 1}.0')
+
+    def goto_line(self, line, column=0):
+        """Put the cursor on ``line`` (0-based), ``column`` characters in."""
+        doc = self.document
+        line = max(0, min(line, doc.line_count() - 1))
+        start = doc.line_start(line)
+        self.goto_offset(start + max(0, min(column, doc.line_end(line) - start)))
+
+    def goto_offset(self, offset):
+        self.sync()
+        self.see_offset(max(0, min(offset, len(self.document))))
+
+    def see_offset(self, offset):
+        """Scroll so ``offset`` is visible and put the cursor there."""
+        doc = self.document
+        line = doc.line_of(offset)
+        column = offset - doc.line_start(line)
+        hidden = column > self.expanded.get(line, self.long_line_chars)
+        if hidden:
+            # Show the long line far enough to reach the offset
+            self.expanded[line] = column + self.long_line_chars
+        if hidden or not (self.window_start <= offset <= self.window_end()):
+            self.render(line - self.MARGIN, keep_offset=offset)
+        self.text.mark_set('insert', self.offset_to_index(offset))
+        self.text.see('insert')
+
+    def _on_document_changed(self, offset, removed, inserted):
+        if self.expanded and ('\n' in removed or '\n' in inserted):
+            # Expanded long lines are keyed by line number
+            self.expanded.clear()
+        if self._rendering or self._stale_pending:
+            return
+        self._stale_pending = True
+        self.text.after_idle(self._render_stale)
+
+    def _render_stale(self):
+        if not self._stale_pending:
+            return
+        row = self.top_line() - self.window_first
+        self.render(self.window_first)
+        self.text.yview(f'{row + 1}.0')
+
+    # ---------- Widget -> document ----------
+    def _on_modified(self, event=None):
+        if self._rendering or not self.text.edit_modified():
+            return
+        self.sync()
+
+    def sync(self):
+        """Apply edits made in the widget to the document."""
+        current = self.text.get('1.0', 'end-1c')
+        old = self.window_text
+        if current != old:
+            prefix = _common_prefix_len(old, current)
+            suffix = _common_suffix_len(old, current, prefix)
+            start, end = prefix, len(old) - suffix
+            if not self._keeps_markers(start, end):
+                # Typed into a long-line marker: put the window back
+                self.render(self.window_first)
+                return
+            inserted = current[prefix:len(current) - suffix]
+            offset = self._document_offset(start)
+            length = self._document_offset(end) - offset
+            self.window_text = current
+            self.window_lines = current.count('\n') + 1
+            if self.elided:
+                grow = len(inserted) - (end - start)
+                doc_grow = len(inserted) - length
+                self.elided = [entry if entry[0] + entry[3] <= start else
+                               (entry[0] + grow, entry[1] + doc_grow, entry[2], entry[3])
+                               for entry in self.elided
+                               if entry[0] + entry[3] <= start or entry[0] >= end]
+            self.window_length += len(inserted) - length
+            # Listeners may rely on window_text being current while syncing
+            self._rendering = self.syncing = True
+            try:
+                self.document.replace(offset, length, inserted, coalesce=True)
+            finally:
+                self._rendering = self.syncing = False
+        self.text.edit_modified(False)
+
+    def _keeps_markers(self, start, end):
+        """Whether replacing window text ``start``..``end`` leaves every marker whole or gone."""
+        for display, _, _, marker in self.elided:
+            if start < display + marker and end > display and not (start <= display and end >= display + marker):
+                return False
+        return True
+
+    def undo(self):
+        self.sync()
+        offset = self.document.undo()
+        if offset is not None:
+            self.render(self.document.line_of(offset) - self.MARGIN, keep_offset=offset)
+            self.see_offset(offset)
+        return 'break'
+
+    def redo(self):
+        self.sync()
+        offset = self.document.redo()
+        if offset is not None:
+            self.render(self.document.line_of(offset) - self.MARGIN, keep_offset=offset)
+            self.see_offset(offset)
+        return 'break'
+
+    # ---------- Scrolling ----------
+    def yview(self, *args):
+        """Scrollbar command, in document lines."""
+        total = self.document.line_count()
+        if args[0] == 'moveto':
+            top = int(float(args[1]) * total)
+        else:
+            amount = int(args[1])
+            if args[2] == 'pages':
+                amount *= self.visible_lines
+            top = self.top_line() + amount
+        self.scroll_to_line(top)
+
+    def _on_wheel(self, event):
+        if event.num == 4:
+            delta = -3
+        elif event.num == 5:
+            delta = 3
+        else:
+            delta = -3 if event.delta > 0 else 3
+        self.scroll_to_line(self.top_line() + delta)
+        return 'break'
+
+    def _on_configure(self, event):
+        try:
+            linespace = int(self.text.tk.call('font', 'metrics', self.text.cget('font'), '-linespace'))
+            self.visible_lines = max(1, event.height // max(1, linespace))
+        except Exception:
+            pass
+
+    def _update_scrollbar(self):
+        total = max(1, self.document.line_count())
+        top = self.top_line()
+        self.scrollbar.set(top / total, min(1.0, (top + self.visible_lines) / total))
+        return top, total
+
+    def _on_widget_scroll(self, first, last):
+        top, total = self._update_scrollbar()
+        # Keyboard navigation can walk the widget to the edge of the window
+        row = top - self.window_first
+        near_edge = ((row < self.MARGIN // 4 and self.window_first > 0) or
+                     (row + self.visible_lines > self.window_lines - self.MARGIN // 4
+                      and self.window_first + self.window_lines < total))
+        if near_edge and not self._recenter_pending:
+            self._recenter_pending = True
+            self.text.after_idle(self._recenter)
+        self._notify_viewport()
+
+    def _recenter(self):
+        self._recenter_pending = False
+        self.scroll_to_line(self.top_line())
+
+def _common_prefix_len(a, b):
+    """Length of the common prefix of two strings (binary search on slices)."""
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def _common_suffix_len(a, b, prefix=0):
+    """Length of the common suffix of two strings, not overlapping ``prefix``."""
+    lo, hi = 0, min(len(a), len(b)) - prefix
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:len(a) - lo] == b[len(b) - mid:len(b) - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def _newline_ends(text):
+    """Offsets just after each newline in ``text``."""
+    ends = array('q')
+    if np is not None and len(text) > 4096:
+        # One code point per element, so positions are character offsets
+        codes = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+        ends.frombytes((np.flatnonzero(codes == 10) + 1).astype(np.int64).tobytes())
+        return ends
+    i = text.find('\n')
+    while i != -1:
+        ends.append(i + 1)
+        i = text.find('\n', i + 1)
+    return ends
+
+def _translate_newlines(text):
+    """Universal newlines, as text-mode open() would read them."""
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+def _newline_style(text):
+    """The line ending first used in untranslated ``text``, or None if it has none."""
+    lf = text.find('\n')
+    cr = text.find('\r')
+    if cr == -1:
+        return '\n' if lf != -1 else None
+    if lf != -1 and lf < cr:
+        return '\n'
+    return '\r\n' if lf == cr + 1 else '\r'
+
+def _newline_kinds(text):
+    """Every line ending that occurs in untranslated ``text``."""
+    crlf = text.count('\r\n')
+    counts = {'\r\n': crlf, '\r': text.count('\r') - crlf, '\n': text.count('\n') - crlf}
+    return {newline for newline, count in counts.items() if count}
+
+_NEWLINE_NAMES = {'\n': 'LF', '\r\n': 'CRLF', '\r': 'CR'}
+
+class MappedText:
+    """Read-only text over a byte range of a memory-mapped file.
+
+    The range is split into blocks whose byte and character offsets were
+    recorded while loading; slicing decodes only the blocks it touches and
+    keeps the last few. Usable as a PieceTable buffer.
+    """
+    ENCODING = 'utf-8'
+    CACHE_BLOCKS = 4
+    COPY_BYTES = 16 << 20
+
+    def __init__(self, mapping, byte_offsets, char_offsets, path=None):
+        self.mapping = mapping
+        self.byte_offsets = byte_offsets
+        self.char_offsets = char_offsets
+        self.path = path
+        self.lock = threading.Lock()
+        self._cache = {}
+
+    @classmethod
+    def detach(cls, buffers, path):
+        """Move the segments mapping ``path`` onto a private copy of the bytes.
+
+        Windows refuses to replace a file that is still mapped, so this runs
+        before a save renames its temp file over the original.
+        """
+        target = os.path.normcase(os.path.abspath(path))
+        groups = {}
+        for buffer in buffers:
+            if isinstance(buffer, MappedText) and buffer.path is not None \
+                    and os.path.normcase(os.path.abspath(buffer.path)) == target:
+                groups.setdefault(id(buffer.mapping), []).append(buffer)
+        for segments in groups.values():
+            old = segments[0].mapping
+            with tempfile.TemporaryFile() as copy:
+                for pos in range(0, len(old), cls.COPY_BYTES):
+                    copy.write(old[pos:pos + cls.COPY_BYTES])
+                copy.flush()
+                # The mapping keeps the (already deleted) copy alive
+                mapping = mmap.mmap(copy.fileno(), 0, access=mmap.ACCESS_READ)
+            for segment in segments:
+                with segment.lock:
+                    segment.mapping = mapping
+                    segment.path = None
+            old.close()
+
+    def __len__(self):
+        return self.char_offsets[-1]
+
+    def _block(self, i):
+        text = self._cache.get(i)
+        if text is None:
+            with self.lock:
+                raw = self.mapping[self.byte_offsets[i]:self.byte_offsets[i + 1]]
+            text = _translate_newlines(raw.decode(self.ENCODING, 'replace'))
+            if len(self._cache) >= self.CACHE_BLOCKS:
+                self._cache = {}
+            self._cache[i] = text
+        return text
+
+    def __getitem__(self, key):
+        start, stop, _ = key.indices(len(self))
+        parts = []
+        i = bisect.bisect_right(self.char_offsets, start) - 1
+        while start < stop:
+            base = self.char_offsets[i]
+            parts.append(self._block(i)[start - base:stop - base])
+            start = self.char_offsets[i + 1]
+            i += 1
+        return ''.join(parts)
+
+class FileLoader:
+    """Reads a file into a Document on a worker thread.
+
+    The worker reads ``chunk_size`` byte chunks, decodes them incrementally
+    and queues ``(buffer, line_starts, bytes_done)`` batches; poll() runs on
+    the Tk event loop and appends batches for a bounded time per call. Files
+    of ``mmap_threshold`` bytes or more are memory-mapped and queued as
+    MappedText segments instead of decoded strings.
+    """
+    ENCODING = 'utf-8'
+    SEGMENT_BYTES = 4 << 20
+
+    def __init__(self, path, document, chunk_size=1 << 20, mmap_threshold=64 << 20):
+        self.path = path
+        self.document = document
+        self.chunk_size = max(4096, chunk_size)
+        self.mmap_threshold = mmap_threshold
+        self.size = os.path.getsize(path)
+        self.bytes_done = 0
+        self.newline = None
+        self.newlines = set()
+        self.finished = False
+        self.cancelled = threading.Event()
+        self.batches = queue.Queue(maxsize=8)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def progress(self):
+        return self.bytes_done / self.size if self.size else 1.0
+
+    @property
+    def mapped(self):
+        return self.size >= self.mmap_threshold
+
+    @property
+    def mixed_newlines(self):
+        return len(self.newlines) > 1
+
+    def start(self):
+        self.document.loading = True
+        self.thread.start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def poll(self, budget_ms=10.0):
+        """Apply queued batches; returns True once loading has finished.
+
+        Re-raises an error from the worker.
+        """
+        deadline = time.perf_counter() + budget_ms / 1000.0
+        while not self.finished and not self.cancelled.is_set():
+            try:
+                batch = self.batches.get_nowait()
+            except queue.Empty:
+                break
+            if batch is None:
+                self.finished = True
+                self.document.newline = self.newline or self.document.newline
+                self.document.mixed_newlines = self.mixed_newlines
+            elif isinstance(batch, Exception):
+                self.finished = True
+                self.document.loading = False
+                raise batch
+            else:
+                buffer, line_starts, self.bytes_done = batch
+                self.document.extend(buffer, line_starts)
+            if time.perf_counter() > deadline:
+                break
+        done = self.finished or self.cancelled.is_set()
+        if done:
+            self.document.loading = False
+        return done
+
+    # ---------- Worker ----------
+    def _put(self, batch):
+        while not self.cancelled.is_set():
+            try:
+                self.batches.put(batch, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _run(self):
+        try:
+            with open(self.path, 'rb') as f:
+                if self.mapped:
+                    self._read_mapped(f)
+                else:
+                    self._read_streamed(f)
+        except Exception as e:
+            self._put(e)
+        else:
+            self._put(None)
+
+    def _note_newlines(self, text):
+        if self.newline is None:
+            self.newline = _newline_style(text)
+        if len(self.newlines) < 2:
+            self.newlines |= _newline_kinds(text)
+
+    def _read_streamed(self, f):
+        decoder = codecs.getincrementaldecoder(self.ENCODING)('replace')
+        held = ''
+        done = 0
+        while not self.cancelled.is_set():
+            raw = f.read(self.chunk_size)
+            done += len(raw)
+            final = not raw
+            text = held + decoder.decode(raw, final)
+            held = ''
+            if text.endswith('\r') and not final:
+                # Could be half of a CRLF split across chunks
+                text, held = text[:-1], '\r'
+            self._note_newlines(text)
+            text = _translate_newlines(text)
+            self._put((text, _newline_ends(text), done))
+            if final:
+                break
+
+    def _read_mapped(self, f):
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        decoder = codecs.getincrementaldecoder(self.ENCODING)('replace')
+        pos = 0
+        while pos < self.size and not self.cancelled.is_set():
+            segment_end = min(self.size, pos + self.SEGMENT_BYTES)
+            byte_offsets = array('q', [pos])
+            char_offsets = array('q', [0])
+            line_starts = array('q')
+            chars = 0
+            while pos < segment_end and not self.cancelled.is_set():
+                end = min(self.size, pos + self.chunk_size)
+                final = end >= self.size
+                text = decoder.decode(mapping[pos:end], final)
+                # Blocks end on character boundaries and never inside a CRLF
+                boundary = end - len(decoder.getstate()[0])
+                decoder.reset()
+                if text.endswith('\r') and not final:
+                    text = text[:-1]
+                    boundary -= 1
+                if boundary <= pos:
+                    boundary, text = end, mapping[pos:end].decode(self.ENCODING, 'replace')
+                self._note_newlines(text)
+                text = _translate_newlines(text)
+                line_starts.extend(chars + start for start in _newline_ends(text))
+                chars += len(text)
+                byte_offsets.append(boundary)
+                char_offsets.append(chars)
+                pos = boundary
+            self._put((MappedText(mapping, byte_offsets, char_offsets, self.path), line_starts, pos))
+
+class DocumentSaver:
+    """Writes document snapshots to disk on a worker thread.
+
+    save() snapshots the piece table (pieces are copied, buffers shared) and
+    queues it by path. Only the newest snapshot per path is kept, so saves
+    requested while a write is in progress collapse into a single follow-up
+    write. Each write streams to a temp file next to the target through a
+    buffered writer, is fsynced and then renamed over the target.
+    """
+    ENCODING = 'utf-8'
+
+    def __init__(self, buffer_size=1 << 20):
+        self.buffer_size = max(4096, buffer_size)
+        self.pending = {}
+        self.results = queue.Queue()
+        self.writing = None
+        self.coalesced = 0
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def save(self, document, path):
+        snapshot = document.table.clone()
+        with self.condition:
+            if path in self.pending:
+                self.coalesced += 1
+            self.pending[path] = (document, document.version, snapshot, document.newline)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def busy(self):
+        with self.condition:
+            return bool(self.pending) or self.writing is not None or not self.results.empty()
+
+    def poll(self):
+        """Finished saves as ``(document, path, version, error, seconds)`` tuples."""
+        done = []
+        while True:
+            try:
+                done.append(self.results.get_nowait())
+            except queue.Empty:
+                return done
+
+    def flush(self, timeout=None):
+        """Wait until every queued save has been written."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while self.pending or self.writing is not None:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+                path = next(iter(self.pending))
+                document, version, snapshot, newline = self.pending.pop(path)
+                self.writing = path
+            start = time.perf_counter()
+            error = None
+            try:
+                self.write(snapshot, path, newline)
+            except Exception as e:
+                error = e
+            self.results.put((document, path, version, error, time.perf_counter() - start))
+            with self.condition:
+                self.writing = None
+                self.condition.notify_all()
+
+    def write(self, table, path, newline='\n'):
+        """Atomically replace ``path`` with the text of ``table``, ending lines with ``newline``."""
+        target = Path(path)
+        temp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+        try:
+            with open(temp, 'w', encoding=self.ENCODING, buffering=self.buffer_size, newline=newline) as f:
+                for chunk in table.iter_chunks(size=self.buffer_size):
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            if target.exists():
+                try:
+                    shutil.copymode(target, temp)
+                except OSError:
+                    pass
+            if os.name == 'nt':
+                # A file still memory-mapped by the editor cannot be replaced on Windows
+                MappedText.detach(table.buffers, target)
+            os.replace(temp, target)
+        except BaseException:
+            try:
+                temp.unlink()
+            except OSError:
+                pass
+            raise
+        if hasattr(os, 'O_DIRECTORY'):
+            # Make the rename itself durable
+            try:
+                dir_fd = os.open(target.parent, os.O_RDONLY | os.O_DIRECTORY)
+                try:
+                    os.fsync(dir_fd)
+                finally:
+                    os.close(dir_fd)
+            except OSError:
+                pass
+
+class DocumentSearch:
+    """Finds pattern matches in a document snapshot on a worker thread.
+
+    The scan starts at the line holding ``origin`` (usually the cursor),
+    runs to the end and then wraps around, so the hits nearest the cursor
+    arrive first. Text is searched in line-aligned batches; a match cannot
+    span two batches. poll() merges queued hits into the ``starts``/``ends``
+    arrays, which stay in document order.
+    """
+    BATCH_CHARS = 1 << 18
+
+    def __init__(self, document, pattern, regex=False, case=False, origin=0):
+        self.regex = self.compile(pattern, regex, case)
+        self.table = document.table.clone()
+        self.version = document.version
+        self.origin = max(0, min(origin, len(self.table)))
+        self.starts = array('q')
+        self.ends = array('q')
+        self.wrapped = 0
+        self.finished = False
+        self.cancelled = threading.Event()
+        self.batches = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def compile(pattern, regex=False, case=False):
+        """Compile a find pattern; raises re.error for a bad regex."""
+        flags = re.MULTILINE if case else re.MULTILINE | re.IGNORECASE
+        return re.compile(pattern if regex else re.escape(pattern), flags)
+
+    def start(self):
+        self.thread.start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def poll(self):
+        """Merge queued hits; returns True if any arrived."""
+        changed = False
+        while True:
+            try:
+                batch = self.batches.get_nowait()
+            except queue.Empty:
+                return changed
+            if batch is None:
+                self.finished = True
+                continue
+            wrapped, starts, ends = batch
+            if wrapped:
+                # Hits before the origin line go in front of the ones after it
+                self.starts[self.wrapped:self.wrapped] = starts
+                self.ends[self.wrapped:self.wrapped] = ends
+                self.wrapped += len(starts)
+            else:
+                self.starts.extend(starts)
+                self.ends.extend(ends)
+            changed = True
+
+    def index_after(self, offset):
+        """Index of the first hit starting at or after ``offset`` (wrapping)."""
+        if not self.starts:
+            return None
+        i = bisect.bisect_left(self.starts, offset)
+        return i if i < len(self.starts) else 0
+
+    # ---------- Worker ----------
+    def _run(self):
+        try:
+            head = self.table.get_text(max(0, self.origin - self.BATCH_CHARS), self.origin)
+            split = self.origin - len(head) + head.rfind('\n') + 1
+            if self._scan(split, len(self.table), False):
+                self._scan(0, split, True)
+        except Exception:
+            pass
+        self.batches.put(None)
+
+    @classmethod
+    def line_batches(cls, table, start, end, cancelled=None):
+        """Yield ``(base, text, cut)`` batches of ``table[start:end]``.
+
+        ``text`` starts at offset ``base`` on a line boundary and its first
+        ``cut`` characters end on one; the rest is the start of the next batch.
+        """
+        parts = []
+        size = 0
+        base = start
+        for chunk in table.iter_chunks(start, end, cls.BATCH_CHARS):
+            if cancelled is not None and cancelled.is_set():
+                return
+            parts.append(chunk)
+            size += len(chunk)
+            if size < cls.BATCH_CHARS:
+                continue
+            text = ''.join(parts)
+            cut = text.rfind('\n') + 1
+            if not cut and len(text) < 4 * cls.BATCH_CHARS:
+                parts = [text]
+                continue
+            cut = cut or len(text)
+            yield base, text, cut
+            parts = [text[cut:]]
+            size = len(parts[0])
+            base += cut
+        if parts and not (cancelled is not None and cancelled.is_set()):
+            text = ''.join(parts)
+            yield base, text, len(text)
+
+    def _scan(self, start, end, wrapped):
+        for base, text, cut in self.line_batches(self.table, start, end, self.cancelled):
+            self._search(text, cut, base, wrapped)
+        return not self.cancelled.is_set()
+
+    def _search(self, text, end, base, wrapped):
+        starts = array('q')
+        ends = array('q')
+        for match in self.regex.finditer(text, 0, end):
+            if match.end() > match.start():
+                starts.append(base + match.start())
+                ends.append(base + match.end())
+        if starts:
+            self.batches.put((wrapped, starts, ends))
+
+class FindBar:
+    """Find/replace bar for one editor tab.
+
+    Typing in the find field restarts a DocumentSearch after a short pause;
+    the first hit after the cursor is selected as soon as it arrives while
+    the rest stream in. Only hits inside the viewport are tagged, in one
+    tag_add call per refresh. Replace All runs the substitution on a worker
+    and applies it as a single undoable edit.
+    """
+    DEBOUNCE_MS = 150
+    MAX_TAGGED = 2000
+
+    def __init__(self, parent, view, before=None):
+        self.view = view
+        self.text = view.text
+        self.before = before
+        self.search = None
+        self.current_hit = None
+        self.visible = False
+        self._jump_pending = False
+        self._restart_after = None
+
+        self.frame = tk.Frame(parent, bg='#2d2d50')
+        self.find_var = tk.StringVar()
+        self.replace_var = tk.StringVar()
+        self.regex_var = tk.BooleanVar(value=False)
+        self.case_var = tk.BooleanVar(value=False)
+
+        entry_style = dict(bg='#0f0f1a', fg='#d4d4d4', insertbackground='#00ffff',
+                           relief='flat', font=('Consolas', 11))
+        tk.Label(self.frame, text="Find", bg='#2d2d50', fg='#00ffff',
+                 font=('Segoe UI', 10)).pack(side='left', padx=(10, 4), pady=6)
+        self.find_entry = tk.Entry(self.frame, textvariable=self.find_var, width=28, **entry_style)
+        self.find_entry.pack(side='left', pady=6)
+        tk.Label(self.frame, text="Replace", bg='#2d2d50', fg='#00ffff',
+                 font=('Segoe UI', 10)).pack(side='left', padx=(10, 4))
+        self.replace_entry = tk.Entry(self.frame, textvariable=self.replace_var, width=22, **entry_style)
+        self.replace_entry.pack(side='left')
+        for text, var in (("Regex", self.regex_var), ("Match case", self.case_var)):
+            tk.Checkbutton(self.frame, text=text, variable=var, bg='#2d2d50', fg='#ffffff',
+                           selectcolor='#1a1a2e', activebackground='#2d2d50',
+                           font=('Segoe UI', 9)).pack(side='left', padx=4)
+        buttons = [
+            ("◀", lambda: self.step(-1)),
+            ("▶", lambda: self.step(1)),
+            ("Replace", self.replace_one),
+            ("Replace All", self.replace_all),
+            ("✕", self.hide)
+        ]
+        for text, command in buttons:
+            tk.Button(self.frame, text=text, bg='#2d2d50', fg='#00ffff', bd=0,
+                      font=('Segoe UI', 9, 'bold'), padx=8, activebackground='#00ffff',
+                      activeforeground='#1a1a2e', command=command).pack(side='left', padx=1)
+        self.count_label = tk.Label(self.frame, bg='#2d2d50', fg='#aaaaaa', font=('Segoe UI', 9))
+        self.count_label.pack(side='left', padx=10)
+
+        self.text.tag_configure('search_hit', background='#665500')
+        self.text.tag_configure('search_current', background='#ffaa00', foreground='#1a1a2e')
+        self.text.tag_raise('sel')
+
+        for var in (self.find_var, self.regex_var, self.case_var):
+            var.trace_add('write', lambda *args: self.schedule_restart(jump=True))
+        self.find_entry.bind('<Return>', lambda e: self.step(1))
+        self.find_entry.bind('<Shift-Return>', lambda e: self.step(-1))
+        self.replace_entry.bind('<Return>', lambda e: self.replace_one())
+        for entry in (self.find_entry, self.replace_entry):
+            entry.bind('<Escape>', lambda e: self.hide())
+        for sequence in ('<Control-f>', '<Control-F>'):
+            self.text.bind(sequence, lambda e: self.show() or 'break')
+        view.add_viewport_listener(self.highlight)
+        view.document.add_listener(self._on_document_changed)
+
+    def show(self):
+        if not self.visible:
+            self.visible = True
+            self.frame.pack(fill='x', padx=10, before=self.before)
+        try:
+            selected = self.text.get('sel.first', 'sel.last')
+            if selected and '\n' not in selected:
+                self.find_var.set(selected)
+        except tk.TclError:
+            pass
+        self.find_entry.focus_set()
+        self.find_entry.select_range(0, 'end')
+        self.restart(jump=True)
+
+    def detach(self):
+        self._cancel()
+        self.view.document.remove_listener(self._on_document_changed)
+
+    def hide(self):
+        self.visible = False
+        self._cancel()
+        self.frame.pack_forget()
+        self.highlight()
+        self.text.focus_set()
+
+    # ---------- Searching ----------
+    def _cancel(self):
+        if self._restart_after is not None:
+            self.text.after_cancel(self._restart_after)
+            self._restart_after = None
+        if self.search is not None:
+            self.search.cancel()
+            self.search = None
+        self.current_hit = None
+
+    def schedule_restart(self, jump=False, delay=None):
+        if self._restart_after is not None:
+            self.text.after_cancel(self._restart_after)
+        self._jump_pending = self._jump_pending or jump
+        self._restart_after = self.text.after(delay or self.DEBOUNCE_MS, self.restart)
+
+    def restart(self, jump=None, origin=None):
+        """Start a new search for the current find field."""
+        jump = self._jump_pending if jump is None else jump
+        self._cancel()
+        self._jump_pending = False
+        pattern = self.find_var.get()
+        if not self.visible or not pattern:
+            self.count_label.config(text="", fg='#aaaaaa')
+            self.highlight()
+            return
+        if origin is None:
+            origin = self.view.index_to_offset('insert')
+        try:
+            self.search = DocumentSearch(self.view.document, pattern, self.regex_var.get(),
+                                         self.case_var.get(), origin)
+        except re.error as e:
+            self.count_label.config(text=f"Bad pattern: {e}", fg='#ff4444')
+            self.highlight()
+            return
+        self._jump_pending = jump
+        self.search.start()
+        self._poll(self.search)
+
+    def _poll(self, search):
+        if search is not self.search:
+            return
+        if search.poll():
+            if self._jump_pending:
+                self._jump_pending = False
+                self.select(search.index_after(search.origin))
+            else:
+                self.highlight()
+        self._update_count()
+        if not search.finished:
+            self.text.after(30, self._poll, search)
+
+    def _update_count(self):
+        search = self.search
+        if search is None:
+            return
+        total = len(search.starts)
+        more = "" if search.finished else "+"
+        if not total:
+            text = "Searching..." if more else "No matches"
+        elif self.current_hit is not None:
+            index = bisect.bisect_left(search.starts, self.current_hit[0])
+            text = f"{index + 1} of {total}{more}"
+        else:
+            text = f"{total}{more} matches"
+        self.count_label.config(text=text, fg='#aaaaaa')
+
+    def _on_document_changed(self, offset, removed, inserted):
+        # Hit offsets are stale now; search again once typing pauses
+        if self.visible and self.find_var.get():
+            self._cancel()
+            self.schedule_restart(delay=300)
+
+    # ---------- Navigation ----------
+    def select(self, index):
+        search = self.search
+        if search is None or index is None or not search.starts:
+            return
+        start, end = search.starts[index], search.ends[index]
+        self.current_hit = (start, end)
+        self.view.see_offset(start)
+        self.highlight()
+        self._update_count()
+
+    def step(self, direction):
+        if self._restart_after is not None or self.search is None:
+            self.restart(jump=True)
+            return 'break'
+        starts = self.search.starts
+        if not starts:
+            return 'break'
+        if self.current_hit is None:
+            index = self.search.index_after(self.view.index_to_offset('insert'))
+        elif direction > 0:
+            index = bisect.bisect_right(starts, self.current_hit[0]) % len(starts)
+        else:
+            index = (bisect.bisect_left(starts, self.current_hit[0]) - 1) % len(starts)
+        self.select(index)
+        return 'break'
+
+    def highlight(self):
+        """Tag the hits inside the viewport only."""
+        self.text.tag_remove('search_hit', '1.0', 'end')
+        self.text.tag_remove('search_current', '1.0', 'end')
+        search = self.search
+        if not self.visible or search is None or not search.starts:
+            return
+        view = self.view
+        start, end = view.visible_range()
+        low, high = view.window_start, view.window_end()
+        starts, ends = search.starts, search.ends
+        i = bisect.bisect_right(ends, start)
+        ranges = []
+        while i < len(starts) and starts[i] < end and len(ranges) < 2 * self.MAX_TAGGED:
+            ranges.append(view.offset_to_index(max(starts[i], low)))
+            ranges.append(view.offset_to_index(min(ends[i], high)))
+            i += 1
+        if ranges:
+            self.text.tag_add('search_hit', *ranges)
+        hit = self.current_hit
+        if hit is not None and hit[1] > start and hit[0] < end:
+            self.text.tag_add('search_current', view.offset_to_index(max(hit[0], low)),
+                              view.offset_to_index(min(hit[1], high)))
+
+    # ---------- Replacing ----------
+    def replace_one(self):
+        hit = self.current_hit
+        if hit is None or self.search is None:
+            return self.step(1)
+        self.view.sync()
+        document = self.view.document
+        if document.version != self.search.version:
+            return self.step(1)
+        start, end = hit
+        replacement = self.replace_var.get()
+        if self.regex_var.get():
+            # Match again in place so anchors and lookarounds see the surrounding text
+            head = document.get_text(max(0, start - DocumentSearch.BATCH_CHARS), start)
+            line_start = start - len(head) + head.rfind('\n') + 1
+            context = document.get_text(line_start, min(len(document), end + DocumentSearch.BATCH_CHARS))
+            match = self.search.regex.match(context, start - line_start)
+            if match is None or match.end() != end - line_start:
+                return self.step(1)
+            try:
+                replacement = match.expand(replacement)
+            except re.error as e:
+                self.count_label.config(text=f"Bad replacement: {e}", fg='#ff4444')
+                return 'break'
+        document.replace(start, end - start, replacement)
+        self.restart(jump=True, origin=start + len(replacement))
+        return 'break'
+
+    def replace_all(self):
+        pattern = self.find_var.get()
+        if not pattern:
+            return
+        try:
+            regex = DocumentSearch.compile(pattern, self.regex_var.get(), self.case_var.get())
+        except re.error as e:
+            self.count_label.config(text=f"Bad pattern: {e}", fg='#ff4444')
+            return
+        self.view.sync()
+        document = self.view.document
+        replacement = self.replace_var.get()
+        expand = self.regex_var.get()
+        table = document.table.clone()
+        results = queue.Queue()
+
+        def work():
+            # Line-aligned batches, like DocumentSearch, so the file is never one string
+            try:
+                edits = []
+                resume = 0
+                for base, text, cut in DocumentSearch.line_batches(table, 0, len(table)):
+                    for match in regex.finditer(text, max(0, resume - base)):
+                        if match.start() >= cut:
+                            break
+                        new = match.expand(replacement) if expand else replacement
+                        edits.append((base + match.start(), match.end() - match.start(), new))
+                        resume = base + match.end()
+                results.put(edits)
+            except Exception as e:
+                results.put(e)
+
+        threading.Thread(target=work, daemon=True).start()
+        self.count_label.config(text="Replacing...", fg='#aaaaaa')
+        self._wait_replace(results, document.version)
+
+    def _wait_replace(self, results, version):
+        try:
+            result = results.get_nowait()
+        except queue.Empty:
+            self.text.after(30, self._wait_replace, results, version)
+            return
+        if isinstance(result, Exception):
+            self.count_label.config(text=f"Replace failed: {result}", fg='#ff4444')
+            return
+        document = self.view.document
+        if document.version != version:
+            self.count_label.config(text="Document changed; Replace All cancelled", fg='#ff4444')
+            return
+        # Piece-table replacements, undone as one step
+        document.replace_many(result)
+        self.count_label.config(text=f"Replaced {len(result)}", fg='#aaaaaa')
+
+_PY_KEYWORDS = frozenset(keyword.kwlist)
+# match/case/type are keywords only when they open a statement (never '_')
+_PY_SOFT_KEYWORDS = frozenset(getattr(keyword, 'softkwlist', [])) - {'_'}
+_PY_SOFT_KEYWORD_NEXT = re.compile(r'[ \t]+(?=[\w"\'(\[{~-])')
+_PY_BUILTINS = frozenset(dir(builtins))
+_PY_TOKEN = re.compile(r'''
+    (?P<comment>\#.*)
+  | (?P<triple>[rRbBuUfF]{0,2}(?:\"\"\"|\'\'\'))
+  | (?P<string>[rRbBuUfF]{0,2}(?:"(?:\\.|[^"\\])*"?|'(?:\\.|[^'\\])*'?))
+  | (?P<number>\b(?:0[xXoObB][\da-fA-F_]+|\d[\d_]*(?:\.[\d_]*)?(?:[eE][+-]?\d+)?[jJ]?)\b)
+  | (?P<decorator>^\s*@[\w.]+)
+  | (?P<name>[A-Za-z_]\w*)
+''', re.VERBOSE)
+# Lexer states at a line start: 0 = code, 1 = inside ''' string, 2 = inside """ string
+_PY_TRIPLE = {1: "'''", 2: '"""'}
+_PY_TRIPLE_END = {1: re.compile(r"(?:\\.|[^\\])*?'''"), 2: re.compile(r'(?:\\.|[^\\])*?"""')}
+
+class PythonHighlighter:
+    """Incremental Python syntax highlighting for a DocumentView.
+
+    Keeps the lexer state at the start of every line seen so far. An edit
+    splices that cache at the edited line and marks it dirty; relexing
+    resumes there and stops as soon as a line ends in the state already
+    cached for the next one (so only multi-line strings cascade). Tags are
+    only applied to the lines in the viewport.
+    """
+    EXTENSIONS = ('.py', '.pyw')
+    TAGS = {
+        'syn_keyword': '#c586c0',
+        'syn_builtin': '#4ec9b0',
+        'syn_self': '#9cdcfe',
+        'syn_defname': '#dcdcaa',
+        'syn_decorator': '#dcdcaa',
+        'syn_string': '#ce9178',
+        'syn_number': '#b5cea8',
+        'syn_comment': '#6a9955',
+    }
+    CATCHUP_LINES = 50000
+
+    def __init__(self, view):
+        self.view = view
+        self.text = view.text
+        self.document = view.document
+        self.states = array('b', [0])
+        self.valid = 1
+        self.resume = 1
+        self._pending = False
+        for tag, color in self.TAGS.items():
+            self.text.tag_configure(tag, foreground=color)
+            # Below search/selection tags
+            self.text.tag_lower(tag)
+        view.add_viewport_listener(self.highlight)
+        self.document.add_listener(self._on_document_changed)
+        self.highlight()
+
+    def detach(self):
+        self.document.remove_listener(self._on_document_changed)
+
+    # ---------- Lexing ----------
+    @staticmethod
+    def lex(line, state=0):
+        """Tokens of one line as ``(tag, start, end)`` plus the state at its end."""
+        tokens = []
+        pos = 0
+        if state:
+            end = _PY_TRIPLE_END[state].match(line)
+            if end is None:
+                return [('syn_string', 0, len(line))], state
+            tokens.append(('syn_string', 0, end.end()))
+            pos = end.end()
+        previous = None
+        while True:
+            match = _PY_TOKEN.search(line, pos)
+            if match is None:
+                return tokens, 0
+            kind = match.lastgroup
+            start, pos = match.span()
+            if kind == 'triple':
+                quote = 2 if match.group().endswith('"') else 1
+                end = _PY_TRIPLE_END[quote].match(line, pos)
+                if end is None:
+                    tokens.append(('syn_string', start, len(line)))
+                    return tokens, quote
+                pos = end.end()
+                tokens.append(('syn_string', start, pos))
+                previous = None
+                continue
+            if kind == 'name':
+                word = match.group()
+                if previous in ('def', 'class'):
+                    tag = 'syn_defname'
+                elif word in _PY_KEYWORDS:
+                    tag = 'syn_keyword'
+                elif word in _PY_SOFT_KEYWORDS and not line[:start].strip() \
+                        and _PY_SOFT_KEYWORD_NEXT.match(line, pos):
+                    tag = 'syn_keyword'
+                elif word in ('self', 'cls'):
+                    tag = 'syn_self'
+                elif word in _PY_BUILTINS:
+                    tag = 'syn_builtin'
+                else:
+                    tag = None
+                previous = word
+            else:
+                tag = 'syn_' + kind
+                previous = None
+            if tag:
+                tokens.append((tag, start, pos))
+
+    def _end_state(self, line, state):
+        # Most lines cannot change the state; skip the lexer for them
+        if state == 0:
+            if '"""' not in line and "'''" not in line:
+                return 0
+        elif _PY_TRIPLE[state] not in line:
+            return state
+        return self.lex(line, state)[1]
+
+    def _line_texts(self, first, last):
+        view = self.view
+        if view.window_first <= first and last <= view.window_first + view.window_lines:
+            return view.window_text.split('\n')[first - view.window_first:last - view.window_first]
+        doc = self.document
+        return doc.get_text(doc.line_start(first), doc.line_end(last - 1)).split('\n')
+
+    def _advance(self, upto):
+        """Make line start states valid up to line ``upto``; False if more work remains."""
+        upto = min(upto, self.view.window_first + self.view.window_lines)
+        if self.valid > upto:
+            return True
+        last = min(upto, self.valid + self.CATCHUP_LINES)
+        states = self.states
+        state = states[self.valid - 1]
+        for line in self._line_texts(self.valid - 1, last):
+            state = self._end_state(line, state)
+            k = self.valid
+            if k < len(states):
+                if k >= self.resume and states[k] == state:
+                    # Converged: the cached states below were computed from unchanged text
+                    self.valid = len(states)
+                    return self._advance(upto)
+                states[k] = state
+            else:
+                states.append(state)
+            self.valid = k + 1
+        # Cached states from here on may not follow from the ones just computed
+        self.resume = max(self.resume, self.valid)
+        return self.valid > upto
+
+    # ---------- Document changes ----------
+    def _on_document_changed(self, offset, removed, inserted):
+        view = self.view
+        states = self.states
+        if view.syncing:
+            # Typed into the view: the edited line comes from the window text
+            line = view.window_first + view.window_text.count('\n', 0, view.display_offset(offset))
+            if line < len(states):
+                gone = removed.count('\n')
+                added = inserted.count('\n')
+                del states[line + 1:line + 1 + gone]
+                states[line + 1:line + 1] = array('b', bytes(added))
+                if self.resume > line + 1:
+                    self.resume = max(self.resume + added - gone, line + 1 + added)
+                else:
+                    self.resume = line + 1 + added
+                self.valid = min(self.valid, line + 1)
+        else:
+            # Undo, replace-all, ...: drop everything from the edit on
+            if offset >= view.window_start:
+                line = view.window_first
+            else:
+                line = self.document.line_of(offset)
+            self.valid = min(self.valid, line + 1)
+            del states[self.valid:]
+            self.resume = self.valid
+        if not self._pending:
+            self._pending = True
+            self.text.after_idle(self.highlight)
+
+    # ---------- Tagging ----------
+    def highlight(self):
+        """Retag the lines in the viewport."""
+        self._pending = False
+        view = self.view
+        first_row = view.top_line() - view.window_first
+        last_row = min(view.window_lines, first_row + view.visible_lines + 1)
+        if last_row <= first_row:
+            return
+        top = view.window_first + first_row
+        if not self._advance(view.window_first + last_row):
+            # Far from the lexed region: catch up in slices between events
+            if not self._pending:
+                self._pending = True
+                self.text.after(1, self.highlight)
+            return
+        ranges = {tag: [] for tag in self.TAGS}
+        state = self.states[top]
+        for row, line in enumerate(self._line_texts(top, view.window_first + last_row), first_row + 1):
+            tokens, state = self.lex(line, state)
+            for tag, start, end in tokens:
+                ranges[tag] += (f'{row}.{start}', f'{row}.{end}')
+        for tag, indices in ranges.items():
+            self.text.tag_remove(tag, f'{first_row + 1}.0', f'{last_row + 1}.0')
+            if indices:
+                self.text.tag_add(tag, *indices)
+
+class EditorTab:
+    """One open document and, while it is built, the widgets showing it."""
+    def __init__(self, frame, document):
+        self.frame = frame
+        self.document = document
+        self.view = None
+        self.find_bar = None
+        self.highlighter = None
+        self.last_seen = time.monotonic()
+        self.top_line = 0
+        self.cursor = None
+
+class DocumentManager:
+    """Shared store of the open editor documents.
+
+    Every document stays in memory as its piece table, but a tab is only an
+    empty frame until it is first shown: show() calls ``build(tab)`` to
+    create the editor widgets. release_idle() destroys the widgets of tabs
+    that have been off-screen for ``release_after`` seconds, remembering the
+    scroll position and cursor, and compacts their documents.
+    """
+    def __init__(self, build, release_after=120.0):
+        self.build = build
+        self.release_after = release_after
+        self.tabs = {}
+        self.selected = None
+        self.last_selected = None
+
+    def add(self, frame, document):
+        tab = EditorTab(frame, document)
+        self.tabs[str(frame)] = tab
+        return tab
+
+    def get(self, frame):
+        return self.tabs.get(str(frame))
+
+    def remove(self, frame):
+        tab = self.tabs.pop(str(frame), None)
+        if tab is not None:
+            self.release(tab)
+        return tab
+
+    def show(self, frame):
+        """Record that ``frame`` is the selected tab and build it if needed."""
+        now = time.monotonic()
+        previous = self.tabs.get(self.selected)
+        if previous is not None:
+            previous.last_seen = now
+        self.selected = str(frame)
+        tab = self.tabs.get(self.selected)
+        if tab is not None:
+            self.last_selected = self.selected
+            tab.last_seen = now
+            if tab.view is None:
+                self.build(tab)
+        return tab
+
+    def current(self):
+        """The selected editor tab, else the one shown most recently."""
+        return self.tabs.get(self.selected) or self.tabs.get(self.last_selected)
+
+    def built(self):
+        return [tab for tab in self.tabs.values() if tab.view is not None]
+
+    def release_idle(self):
+        now = time.monotonic()
+        released = 0
+        for name, tab in list(self.tabs.items()):
+            if (tab.view is not None and name != self.selected and
+                    now - tab.last_seen >= self.release_after):
+                self.release(tab)
+                released += 1
+        return released
+
+    def release(self, tab):
+        view = tab.view
+        if view is None:
+            return
+        try:
+            view.sync()
+            tab.top_line = view.top_line()
+            tab.cursor = view.index_to_offset('insert')
+        except Exception:
+            pass
+        for part in (tab.highlighter, tab.find_bar, view):
+            if part is not None:
+                part.detach()
+        for child in tab.frame.winfo_children():
+            child.destroy()
+        tab.view = tab.find_bar = tab.highlighter = None
+        if not tab.document.loading:
+            tab.document.compact()
+
+class EditJournal:
+    """Crash-safe, append-only journals of document edits.
+
+    attach() gives a document its own journal file that starts with a base
+    record (the file on disk, or a snapshot of the text) followed by one
+    ``[offset, removed_length, inserted]`` line per change. The document
+    listener only queues the change; a writer thread appends everything
+    queued every ``flush_ms`` in one write per journal, then fsyncs. After
+    ``compact_ops`` changes a journal is rewritten as a fresh snapshot
+    (documents up to SNAPSHOT_LIMIT characters); saving restarts it from the
+    saved file. Journals left behind by a crash are listed by pending().
+
+    While a journal is attached its ``.lock`` sidecar is held locked (and
+    records the pid where locking is unavailable), so other running copies
+    of the app leave it alone.
+    """
+    SNAPSHOT_LIMIT = 16 << 20
+
+    def __init__(self, directory, flush_ms=1000, compact_ops=5000):
+        self.directory = Path(directory)
+        self.directory.mkdir(exist_ok=True)
+        self.flush_interval = max(0.05, flush_ms / 1000.0)
+        self.compact_ops = compact_ops
+        self.journals = {}
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lost = set()
+
+    # ---------- UI thread ----------
+    def attach(self, document, journal_path=None):
+        """Start journalling ``document``; reuses ``journal_path`` if given."""
+        if document in self.journals:
+            return
+        entry = {'path': journal_path or self.directory / f"{uuid.uuid4().hex}.jnl", 'ops': 0}
+        entry['lock'] = self._lock(entry['path'])
+        if entry['lock'] is None and journal_path is not None:
+            raise ValueError("the journal is in use by another running instance")
+        entry['listener'] = lambda offset, removed, inserted: self._record(document, entry, offset, removed, inserted)
+        self.journals[document] = entry
+        document.add_listener(entry['listener'])
+        if journal_path is None:
+            self._write_base(document, entry)
+
+    def detach(self, document, keep=False):
+        entry = self.journals.pop(document, None)
+        if entry is None:
+            return
+        document.remove_listener(entry['listener'])
+        if not keep:
+            self._put(entry['path'], 'delete', None)
+        # Released by the writer once everything queued for it is on disk
+        self._put(entry['path'], 'release', entry['lock'])
+
+    def begin_save(self, document):
+        """A save of the document's current version was queued; remember edits made meanwhile."""
+        entry = self.journals.get(document)
+        if entry is not None:
+            entry.setdefault('saves', {})[document.version] = len(document)
+            if entry.get('since_save') is None:
+                entry['since_save'] = []
+
+    def rebase(self, document, path, version):
+        """``version`` was written to ``path``: restart the journal from the file."""
+        entry = self.journals.get(document)
+        if entry is None or version not in entry.get('saves', {}):
+            return
+        length = entry['saves'][version]
+        ops = [op for op in entry['since_save'] if op[0] > version]
+        self._end_save(entry, version)
+        entry['ops'] = len(ops)
+        self._put(entry['path'], 'base', ({'base': 'file', 'path': str(path), 'length': length,
+                                           'newline': document.newline}, None))
+        # Edits made while the write was in flight are not in the file
+        for _, offset, removed, inserted in ops:
+            self._put(entry['path'], 'op', (offset, removed, inserted))
+
+    def save_failed(self, document, version):
+        """The file was left as it was, so the journal's base still holds."""
+        entry = self.journals.get(document)
+        if entry is not None and 'saves' in entry:
+            self._end_save(entry, version)
+
+    def _end_save(self, entry, version):
+        # Saves of one path coalesce, so older versions will not report back
+        entry['saves'] = {v: n for v, n in entry['saves'].items() if v > version}
+        if entry['saves']:
+            entry['since_save'] = [op for op in entry['since_save'] if op[0] > version]
+        else:
+            entry['since_save'] = None
+
+    def snapshot(self, document):
+        entry = self.journals.get(document)
+        if entry is not None:
+            entry['ops'] = 0
+            self._write_base(document, entry, force_snapshot=True)
+
+    def close(self, timeout=10):
+        """Write out everything queued; journals of unmodified documents are removed."""
+        for document in list(self.journals):
+            self.detach(document, keep=document.modified)
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout)
+
+    def _write_base(self, document, entry, force_snapshot=False):
+        if document.path and not force_snapshot and not document.modified:
+            header = {'base': 'file', 'path': str(document.path), 'length': len(document),
+                      'newline': document.newline}
+            self._put(entry['path'], 'base', (header, None))
+        elif len(document) <= self.SNAPSHOT_LIMIT:
+            header = {'base': 'snapshot', 'path': str(document.path) if document.path else None,
+                      'newline': document.newline,
+                      'modified': document.modified}
+            self._put(entry['path'], 'base', (header, document.table.clone()))
+
+    def _record(self, document, entry, offset, removed, inserted):
+        if entry.get('since_save') is not None:
+            entry['since_save'].append((document.version, offset, len(removed), inserted))
+        if entry['path'] in self.lost and len(document) <= self.SNAPSHOT_LIMIT:
+            # The journal vanished under us: start it again from the current text
+            self.lost.discard(entry['path'])
+            entry['ops'] = 0
+            self._write_base(document, entry, force_snapshot=True)
+            return
+        self._put(entry['path'], 'op', (offset, len(removed), inserted))
+        entry['ops'] += 1
+        if entry['ops'] >= self.compact_ops and len(document) <= self.SNAPSHOT_LIMIT:
+            entry['ops'] = 0
+            self._write_base(document, entry, force_snapshot=True)
+
+    def _put(self, path, kind, payload):
+        self.queue.put((path, kind, payload))
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    # ---------- Writer thread ----------
+    def _run(self):
+        running = True
+        while running:
+            items = [self.queue.get()]
+            time.sleep(self.flush_interval)
+            while True:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            pending = {}
+            for item in items:
+                if item is None:
+                    running = False
+                    continue
+                path, kind, payload = item
+                if kind == 'op':
+                    pending.setdefault(path, []).append(json.dumps(payload) + '\n')
+                    continue
+                # Ops queued before a rewrite belong to the old journal
+                self._append(path, pending.pop(path, None))
+                try:
+                    if kind == 'base':
+                        self._rewrite(path, *payload)
+                    elif kind == 'delete':
+                        path.unlink()
+                    elif kind == 'release':
+                        self._unlock(path, payload)
+                except OSError:
+                    pass
+            for path, lines in pending.items():
+                self._append(path, lines)
+
+    def _append(self, path, lines):
+        if not lines:
+            return
+        if not path.exists():
+            # Appending would start a journal with no base; have the UI thread rewrite it
+            if path not in self.lost:
+                self.lost.add(path)
+                print(f"Edit journal {path.name} disappeared; it is rewritten on the next edit",
+                      file=sys.stderr)
+            return
+        try:
+            with open(path, 'a', encoding='utf-8', newline='\n') as f:
+                f.write(''.join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            print(f"Edit journal {path.name} write failed: {e}", file=sys.stderr)
+
+    def _rewrite(self, path, header, table):
+        temp = path.with_suffix('.tmp')
+        with open(temp, 'w', encoding='utf-8', newline='\n') as f:
+            if table is not None:
+                header = dict(header, text=table.get_text())
+            f.write(json.dumps(header) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, path)
+
+    # ---------- Ownership ----------
+    @staticmethod
+    def _lock(journal_path):
+        """Lock ``journal_path``'s sidecar for this process; None if another one holds it."""
+        lock_path = Path(journal_path).with_suffix('.lock')
+        try:
+            handle = open(lock_path, 'a+', encoding='utf-8')
+        except OSError:
+            return None
+        try:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            elif msvcrt is not None:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                handle.seek(0)
+                pid = handle.read().strip()
+                if pid.isdigit() and int(pid) != os.getpid() and psutil.pid_exists(int(pid)):
+                    raise OSError("journal owned by a running process")
+            handle.seek(0)
+            handle.truncate()
+            handle.write(str(os.getpid()))
+            handle.flush()
+        except OSError:
+            handle.close()
+            return None
+        return handle
+
+    @staticmethod
+    def _unlock(journal_path, handle):
+        lock_path = Path(journal_path).with_suffix('.lock')
+        if fcntl is None and handle is not None:
+            handle.close()  # Windows cannot remove a file that is still open
+        try:
+            lock_path.unlink()
+        except OSError:
+            pass
+        if handle is not None:
+            handle.close()
+
+    def _owned_elsewhere(self, journal_path):
+        handle = self._lock(journal_path)
+        if handle is None:
+            return True
+        self._unlock(journal_path, handle)
+        return False
+
+    # ---------- Recovery ----------
+    @staticmethod
+    def _read(journal_path):
+        records = []
+        with open(journal_path, 'r', encoding='utf-8', newline='\n') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break  # torn write at the end
+        return records
+
+    def pending(self):
+        """Journals holding unsaved edits, as ``(journal_path, document_path)``."""
+        found = []
+        attached = {entry['path'] for entry in self.journals.values()}
+        for journal_path in sorted(self.directory.glob("*.jnl")):
+            if journal_path in attached or self._owned_elsewhere(journal_path):
+                continue
+            try:
+                records = self._read(journal_path)
+            except OSError:
+                continue
+            if records and isinstance(records[0], dict) and (len(records) > 1 or records[0].get('modified')):
+                found.append((journal_path, records[0].get('path')))
+            else:
+                self.discard(journal_path)
+        return found
+
+    def discard(self, journal_path):
+        if self._owned_elsewhere(journal_path):
+            return
+        try:
+            Path(journal_path).unlink()
+        except OSError:
+            pass
+
+    def recover(self, journal_path):
+        """Rebuild the document recorded in ``journal_path`` and keep journalling it."""
+        if self._owned_elsewhere(journal_path):
+            raise ValueError("the journal is in use by another running instance")
+        records = self._read(journal_path)
+        header = records[0]
+        path = header.get('path')
+        if header.get('base') == 'snapshot':
+            text = header.get('text', '')
+        else:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                text = f.read()
+            if len(text) != header.get('length'):
+                raise ValueError("the file changed on disk since the journal was written")
+        document = Document(text, path=path, newline=header.get('newline', '\n'))
+        table = document.table
+        for offset, removed, inserted in records[1:]:
+            if removed:
+                table.delete(offset, removed)
+            if inserted:
+                table.insert(offset, inserted)
+        document.modified = True
+        self.attach(document, journal_path=Path(journal_path))
+        return document
+
 if __name__ == "__main__":
     root = tk.Tk()
     app = UniversalPluginManager(root)